@@ -0,0 +1,147 @@
+import functools
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+
+from exampleapp.models import Brand, Desk, Document, Documenttopics, Evaluation, Topic
+from flex_abac.checkers import get_filter_for_valid_objects
+from flex_abac.models import (
+    Action, CategoricalAttribute, CategoricalFilter, ModelCategoricalAttribute, ModelNestedCategoricalAttribute,
+    NestedCategoricalAttribute, NestedCategoricalFilter, Policy, Role,
+)
+from flex_abac.utils.scope_filters import (
+    FILTER_STRATEGIES, compile_valid_objects_condition, filter_valid_objects,
+)
+
+
+class Command(BaseCommand):
+    help = "Compares the strategies to apply the filters for the valid objects (see " \
+           "flex_abac.utils.scope_filters.compile_valid_objects_condition) on growing numbers of documents. " \
+           "The data is created in a transaction which is rolled back at the end."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000],
+                            help="Numbers of documents to benchmark (100000 and 1000000 by default)")
+        parser.add_argument("--brands", type=int, default=200, help="Number of brands (200 by default)")
+        parser.add_argument("--allowed-brands", type=int, nargs="+", default=[1, 10, 100],
+                            help="Numbers of brands allowed for the user (1, 10 and 100 by default)")
+        parser.add_argument("--repeat", type=int, default=5,
+                            help="Timed repetitions of each query, after a warm-up run (5 by default)")
+        parser.add_argument("--batch-size", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.benchmark(**options)
+            transaction.set_rollback(True)
+
+    def benchmark(self, rows, brands, allowed_brands, repeat, batch_size, **options):
+        random.seed(0)
+
+        brand_ids = [Brand.objects.create(name=f"Benchmark brand {idx}").pk for idx in range(brands)]
+        desk = Desk.objects.create(name="Benchmark desk")
+        root_topic = Topic.objects.create(name="Benchmark topic")
+        topic_ids = [root_topic.pk] + [
+            Topic.objects.create(name=f"Benchmark topic {idx}", parent=root_topic).pk for idx in range(10)
+        ]
+
+        document_content_type = ContentType.objects.get_for_model(Document)
+        brand_attribute = CategoricalAttribute.objects.create(name="Benchmark brand", field_name="brand__name")
+        ModelCategoricalAttribute.objects.create(attribute_type=brand_attribute,
+                                                 owner_content_object=document_content_type)
+        topic_attribute = NestedCategoricalAttribute.objects.create(
+            name="Benchmark topic", field_type=ContentType.objects.get_for_model(Topic), field_name="topics",
+            nested_field_name="name", parent_field_name="parent"
+        )
+        ModelNestedCategoricalAttribute.objects.create(attribute_type=topic_attribute,
+                                                       owner_content_object=document_content_type)
+
+        action, _ = Action.objects.get_or_create(name="benchmark")
+        created_rows = 0
+        for total_rows in sorted(rows):
+            self.create_documents(total_rows - created_rows, brand_ids, desk, topic_ids, batch_size)
+            created_rows = total_rows
+
+            with connection.cursor() as cursor:
+                if connection.vendor in ("sqlite", "postgresql"):
+                    cursor.execute("ANALYZE")
+
+            for allowed_brands_count in allowed_brands:
+                user = self.create_user(f"benchmark_{total_rows}_{allowed_brands_count}", action, brand_attribute,
+                                        topic_attribute, brands, allowed_brands_count)
+
+                for queryset, base_lookup_name in ((Document.objects.all(), None),
+                                                   (Evaluation.objects.all(), "document")):
+                    get_filter = functools.partial(get_filter_for_valid_objects, user, Document,
+                                                   action_name=action.name)
+                    timings, counts = [], set()
+                    for strategy in FILTER_STRATEGIES:
+                        condition = compile_valid_objects_condition(get_filter, Document,
+                                                                    base_lookup_name=base_lookup_name,
+                                                                    strategy=strategy)
+                        timing, count = self.time_count(filter_valid_objects(queryset, condition), repeat)
+                        timings.append(timing)
+                        counts.add(count)
+
+                    if len(counts) > 1:
+                        raise CommandError(f"The strategies selected different numbers of objects: {counts}")
+
+                    self.stdout.write(
+                        f"rows={total_rows} allowed_brands={allowed_brands_count} "
+                        f"model={queryset.model.__name__} count={counts.pop()} " +
+                        " ".join(f"{strategy}={timing * 1000:.1f}ms"
+                                 for strategy, timing in zip(FILTER_STRATEGIES, timings))
+                    )
+
+    def create_documents(self, count, brand_ids, desk, topic_ids, batch_size):
+        # Primary keys are set explicitly, since not all the backends return them from bulk inserts
+        first_id = (Document.objects.aggregate(max_id=Max("pk"))["max_id"] or 0) + 1
+
+        for start in range(0, count, batch_size):
+            documents = Document.objects.bulk_create([
+                Document(pk=first_id + start + idx, filename=f"benchmark_{start + idx}",
+                         brand_id=random.choice(brand_ids), desk=desk)
+                for idx in range(min(batch_size, count - start))
+            ])
+            Evaluation.objects.bulk_create([
+                Evaluation(name=document.filename, document=document) for document in documents
+            ])
+            Documenttopics.objects.bulk_create([
+                Documenttopics(document=document, topic_id=random.choice(topic_ids)) for document in documents
+            ])
+
+    def create_user(self, username, action, brand_attribute, topic_attribute, brands, allowed_brands_count):
+        user = User.objects.create(username=username)
+        role = Role.objects.create(name=username)
+        role.users.add(user)
+        policy = Policy.objects.create(name=username)
+        role.policies.add(policy)
+        policy.actions.add(action)
+
+        for idx in random.sample(range(brands), allowed_brands_count):
+            value, _ = CategoricalFilter.objects.get_or_create(attribute_type=brand_attribute,
+                                                               value=f"Benchmark brand {idx}")
+            value.add_to_policy(policy)
+        topic_value, _ = NestedCategoricalFilter.objects.get_or_create(attribute_type=topic_attribute,
+                                                                       value="Benchmark topic")
+        topic_value.add_to_policy(policy)
+
+        return user
+
+    @staticmethod
+    def time_count(queryset, repeat):
+        # The first run warms up the caches of the database and is not timed
+        count = queryset.count()
+
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            queryset.count()
+            timings.append(time.perf_counter() - start)
+
+        return statistics.median(timings), count
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:49
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exampleapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProxyDocument',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('exampleapp.document',),
+        ),
+    ]
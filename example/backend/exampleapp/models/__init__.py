@@ -7,4 +7,5 @@ from .region import *
 from .category import *
 from .documenttopics import *
 from .documentegions import *
-from .documentcategories import *
\ No newline at end of file
+from .documentcategories import *
+from .proxy_document import *
\ No newline at end of file
@@ -0,0 +1,7 @@
+from .document import Document
+
+
+class ProxyDocument(Document):
+    class Meta:
+        proxy = True
+        app_label = 'exampleapp'
@@ -1 +1,7 @@
-from .lookups import *
\ No newline at end of file
+import django
+
+from .lookups import *
+
+# Django >= 3.2 detects the app config automatically
+if django.VERSION < (3, 2):
+    default_app_config = 'flex_abac.apps.FlexAbacConfig'
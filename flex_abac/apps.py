@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class FlexAbacConfig(AppConfig):
     default_auto_field = 'django.db.models.AutoField'
     name = 'flex_abac'
+
+    def ready(self):
+        from flex_abac.signals import connect_signals
+        connect_signals()
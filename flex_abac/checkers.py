@@ -1,7 +1,10 @@
-from .models import BaseAttribute
-from django.core.exceptions import ObjectDoesNotExist
+from django.contrib.auth.models import AbstractBaseUser, AnonymousUser
 from django.db.models.query import Q
-from flex_abac.utils.helpers import get_subclasses
+from flex_abac.models import Role
+from flex_abac.registry import get_attribute_metadata, get_attribute_types_for_model
+from flex_abac.snapshot import AuthorizationSnapshot, CompiledPolicy, get_authorization_snapshot, get_role_signature
+from flex_abac.utils.scope_filters import ScopeFilter
+from flex_abac.utils.cache import get_cached_decision, pinned_permissions_generation
 
 
 def is_object_in_scope(policy, obj):
@@ -10,23 +13,25 @@ def is_object_in_scope(policy, obj):
     that the values are valid for all the filters included on the policy for that attribute.
 
     :param policy: The policy to check.
-    :type policy: flex_abac.models.Policy
+    :type policy: flex_abac.models.Policy, flex_abac.snapshot.CompiledPolicy
 
     :param obj: The model object to check.
     :type obj: django.Model
 
     :returns:  bool -- True, if the object matches all the filters or no filter is applied over it. False, otherwise.
     """
-    for attribute_type_model in get_subclasses(BaseAttribute):
-        attribute_types = attribute_type_model.get_all_to_check_for_model(type(obj))
-        for attribute_type in attribute_types:
-            if not attribute_type.does_match(obj, policy):
-                return False
+    if isinstance(policy, CompiledPolicy) and policy.is_unrestricted_for(type(obj)):
+        return True
+
+    for attribute_type in get_attribute_types_for_model(type(obj)):
+        if not attribute_type.does_match(obj, policy):
+            return False
 
     return True
 
 
-def can_user_do(action_name, obj=None, user=None):
+@pinned_permissions_generation()
+def can_user_do(action_name, obj=None, user=None, snapshot=None):
     """
     Given an action name, an object (optional), and a user, this function iterates over the entire set of
     policies associated with that user through the roles and checks the user has permissions.
@@ -40,9 +45,9 @@ def can_user_do(action_name, obj=None, user=None):
     through an OR-like behavior. Therefore for optimization purposes, it is perfectly fine to check directly the
     policies. If one of them is in the scope, that means the user can do such action.
 
-    :param action_name: The name of the action to check. It can be a single value or a string of comma-separated
-           values.
-    :type action_name: str
+    :param action_name: The name of the action to check. It can be a single value or a list of values, in which case
+           the policy should include all of them.
+    :type action_name: str, list<str>
 
     :param obj: The model object type to check. Optional.
     :type obj: django.Model
@@ -50,84 +55,186 @@ def can_user_do(action_name, obj=None, user=None):
     :param user: The user for which the permissions will be checked.
     :type user: django.contrib.auth.models.User
 
+    :param snapshot: Optional. The authorization snapshot of the user, if it was already retrieved.
+    :type snapshot: flex_abac.snapshot.AuthorizationSnapshot
+
     :returns:  bool -- True, if the user can do the provided action. False, otherwise.
     """
 
-    remaining_actions = action_name
-    for policy in user.get_policies():
-        try:
-            if isinstance(action_name, list):
-                for action in policy.actions.filter(name__in=action_name):
-                    remaining_actions.remove(action.name)
-
-                if len(remaining_actions) != 0:
-                    continue
-            else:
-                policy.actions.get(name=action_name)
-            if not obj or is_object_in_scope(policy, obj):
-                return True
-        except ObjectDoesNotExist:
-            pass
+    if obj and obj.pk is None:
+        # Unsaved objects cannot be identified in the decision cache
+        return _can_user_do(action_name, obj, user, snapshot)
+
+    return get_cached_decision(
+        ("can_user_do", _get_user_key(user), _get_action_key(action_name),
+         (obj._meta.label, obj.pk) if obj else None),
+        lambda: _can_user_do(action_name, obj, user, snapshot),
+    )
+
+
+def _can_user_do(action_name, obj, user, snapshot=None):
+    snapshot = snapshot or get_authorization_snapshot(user)
+    if obj and snapshot.has_unrestricted_policy(action_name, type(obj)):
+        return True
+
+    for policy in snapshot.get_policies(action_name):
+        if not obj or is_object_in_scope(policy, obj):
+            return True
 
     return False
 
 
+def _get_user_key(user):
+    # Users with the same roles share their decisions
+    return get_role_signature(user)
+
+
+def _get_action_key(action_name):
+    if isinstance(action_name, (list, tuple, set, frozenset)):
+        return tuple(sorted(action_name))
+    return action_name
+
+
+def _get_policy_scope_filter(policy, model):
+    """
+    Builds a filter selecting the instances of a model in the scope of a policy, or ``None`` if the policy does not
+    restrict the model. Each attribute type is applied on its own subquery, so multi-valued relations are checked as in
+    :meth:`is_object_in_scope`, and attribute types are skipped under the same condition (``is_unrestricted``).
+    """
+    queryset = None
+    for attribute_type in get_attribute_types_for_model(model):
+        if attribute_type.is_unrestricted(policy):
+            continue
+        current_filter, _ = attribute_type.get_filter(policy)
+        queryset = (model.objects if queryset is None else queryset).filter(current_filter)
+
+    return Q(pk__in=queryset.values("pk")) if queryset is not None else None
+
+
+@pinned_permissions_generation()
+def can_user_do_many(action_name, objs, user=None):
+    """
+    Bulk version of :meth:`can_user_do` for a list of objects. Instead of checking the objects one by one, a single
+    query is done per model type, no matter the number of objects.
+
+    :param action_name: The name of the action to check. It can be a single value or a list of values, in which case
+           the policy should include all of them.
+    :type action_name: str, list<str>
+
+    :param objs: The model objects to check. They can belong to different models.
+    :type objs: list<django.Model>
+
+    :param user: The user for which the permissions will be checked.
+    :type user: django.contrib.auth.models.User
+
+    :returns: list<bool> -- For each of the provided objects, in the same order, True if the user can do the provided
+              action on it. False, otherwise.
+    """
+
+    objs = list(objs)
+    snapshot = get_authorization_snapshot(user)
+    policies = snapshot.get_policies(action_name)
+    if not policies:
+        return [False] * len(objs)
+
+    pks_per_model = {}
+    for obj in objs:
+        pks_per_model.setdefault(type(obj), set()).add(obj.pk)
+
+    allowed_pks_per_model = {}
+    for model, pks in pks_per_model.items():
+        if snapshot.has_unrestricted_policy(action_name, model):
+            allowed_pks_per_model[model] = pks
+            continue
+
+        or_filter = Q()
+        for policy in policies:
+            policy_filter = _get_policy_scope_filter(policy, model)
+            if policy_filter is None:
+                # One of the policies allows every object
+                allowed_pks_per_model[model] = pks
+                break
+            or_filter |= policy_filter
+        else:
+            allowed_pks_per_model[model] = set(
+                model.objects.filter(pk__in=pks).filter(or_filter).values_list("pk", flat=True)
+            )
+
+    return [obj.pk in allowed_pks_per_model[type(obj)] for obj in objs]
+
+
 def _are_all_required_attribute_types_in_query(
     query_attribute_values=None,
     target_model=None,
 ):
+    # Values are indexed by attribute type once, and each attribute type takes the values of its lineage (i.e. the
+    # attribute type itself, and its ancestors for hierarchical attribute types)
+    values_per_attribute_type_id = {}
+    for query_attribute_value in query_attribute_values:
+        values_per_attribute_type_id.setdefault(query_attribute_value.attribute_type.pk, []).\
+            append(query_attribute_value)
+
+    attribute_metadata = get_attribute_metadata()
+
     are_all_types_covered = True
     missing_types = []
-    for attribute_type_model in get_subclasses(BaseAttribute):
-        attribute_types = attribute_type_model.get_all_to_check_for_model(
-            target_model
-        )
-        for attribute_type in attribute_types:
-            if not attribute_type.is_represented_in_query_values(
-                [query_attribute_value for query_attribute_value in query_attribute_values
-                 if query_attribute_value.attribute_type == attribute_type]
-            ):
-                are_all_types_covered = False
-                missing_types.append(attribute_type)
+    for attribute_type in get_attribute_types_for_model(target_model):
+        if not attribute_type.is_represented_in_query_values([
+            query_attribute_value
+            for attribute_type_id in attribute_metadata.get_lineage_ids(attribute_type)
+            for query_attribute_value in values_per_attribute_type_id.get(attribute_type_id, ())
+        ]):
+            are_all_types_covered = False
+            missing_types.append(attribute_type)
     return are_all_types_covered, missing_types
 
 
+@pinned_permissions_generation()
 def is_attribute_query_in_scope(
         query_attribute_values=None,
         target_model=None,
-        user=None):
+        user=None,
+        snapshot=None):
     """
     Checks whether the query attributes (e.g. REST api list filters) are allowed for the user, target model
     pair. The goal of this function is to forbid an user further access to resources if parameters used are
     already out of its scope.
 
     :param query_attribute_values: The list of attribute values (filters) to check.
-    :type query_attribute_values: list <flex_abac.models.BaseFilter>
+    :type query_attribute_values: list <flex_abac.utils.query_values.QueryAttributeValue, flex_abac.models.BaseFilter>
 
     :param user: The user for which the permissions will be checked.
     :type user: django.contrib.auth.models.User
 
+    :param snapshot: Optional. The authorization snapshot of the user, if it was already retrieved.
+    :type snapshot: flex_abac.snapshot.AuthorizationSnapshot
+
     :returns: bool -- True, if the user can access the provided attribute values (filters). False,
               otherwise.
     """
 
     # We just need to fulfill one of the policies to ensure this
-    for policy in user.get_policies():
-        are_all_values_in_scope = True
-        for value in query_attribute_values:
-            if not value.is_in_policy_scope(policy):
-                are_all_values_in_scope = False
-                break
-        if are_all_values_in_scope:
-            return True
+    policies = list((snapshot or get_authorization_snapshot(user)).get_policies())
 
-    return False
+    # Values are checked in batch for each attribute type, discarding the policies which do not include them
+    values_per_attribute_type = {}
+    for value in query_attribute_values:
+        attribute_type = value.attribute_type
+        values_per_attribute_type.setdefault((type(attribute_type), attribute_type.pk), (attribute_type, []))[1].\
+            append(value)
+
+    for attribute_type, values in values_per_attribute_type.values():
+        if not policies:
+            break
+        policies = attribute_type.get_policies_with_values_in_scope(values, policies)
+
+    return bool(policies)
 
 
 def get_query_attribute_values_from_mapping(attribute_mapping, target_model):
     """
-    Given an attribute mapping, translates it to attribute values (filters) to be used during permissions
-    checking.
+    Given an attribute mapping, translates it to attribute values to be used during permissions checking. Values are
+    represented as lightweight ``QueryAttributeValue`` objects rather than filter model instances.
 
     :param attribute_mapping: Dictionary where the keys correspond to the field_name in the attribute types, and the
            values are the query params offered to the user.
@@ -136,29 +243,28 @@ def get_query_attribute_values_from_mapping(attribute_mapping, target_model):
     :param target_model: The model object type to check.
     :type target_model: django.Model
 
-    :returns:  list <flex_abac.models.BaseFilter> -- The list of attribute values (filters) to check.
+    :returns:  list <flex_abac.utils.query_values.QueryAttributeValue> -- The list of attribute values to check.
     """
 
     attribute_values = []
-    for attribute_type_model in get_subclasses(BaseAttribute):
-        attribute_types = attribute_type_model.get_all_to_check_for_model(
-            target_model
-        ).filter(field_name__in=attribute_mapping.keys())
+    for attribute_type in get_attribute_types_for_model(target_model):
+        if attribute_type.field_name not in attribute_mapping:
+            continue
 
-        for attribute_type in attribute_types:
-            for value in attribute_mapping[attribute_type.field_name]:
-                attribute_values.append(attribute_type.get_attribute_value(value))
+        attribute_values += attribute_type.get_query_values(attribute_mapping[attribute_type.field_name])
 
     return attribute_values
 
 
-def is_attribute_query_in_scope_from_mapping(user, attribute_mapping, target_model):
+@pinned_permissions_generation()
+def is_attribute_query_in_scope_from_mapping(user, attribute_mapping, target_model, snapshot=None):
     """
     Given an attribute mapping, it checks whether the query attributes (e.g. REST API list filters) are allowed
     for the user, target model pair. The goal of this function is to forbid a user further access to resources
     if the used parameters are already out of his/her scope.
 
-    It first translates the mapping to actual filters and then checks the permissions.
+    It first translates the mapping to actual filters and then checks the permissions. As in :meth:`can_user_do`, the
+    decision can be cached.
 
     :param user: The user for which the permissions will be checked.
     :type user: django.contrib.auth.models.User
@@ -170,15 +276,26 @@ def is_attribute_query_in_scope_from_mapping(user, attribute_mapping, target_mod
     :param target_model: The model object type to check.
     :type target_model: django.Model
 
+    :param snapshot: Optional. The authorization snapshot of the user, if it was already retrieved.
+    :type snapshot: flex_abac.snapshot.AuthorizationSnapshot
+
     :returns: bool -- True, if the user can access the provided attribute values (filters). False,
               otherwise.
     """
 
-    attribute_values = get_query_attribute_values_from_mapping(attribute_mapping, target_model)
+    def compute():
+        attribute_values = get_query_attribute_values_from_mapping(attribute_mapping, target_model)
 
-    return is_attribute_query_in_scope(attribute_values, target_model, user)
+        return is_attribute_query_in_scope(attribute_values, target_model, user, snapshot=snapshot)
 
+    return get_cached_decision(
+        ("is_attribute_query_in_scope_from_mapping", _get_user_key(user), target_model._meta.label,
+         tuple(sorted((field_name, tuple(values)) for field_name, values in attribute_mapping.items()))),
+        compute,
+    )
 
+
+@pinned_permissions_generation()
 def get_filter_for_valid_objects(scope, obj_type, base_lookup_name=None, action_name=None):
     """
     Given a scope and a model type, it provides a Django-ORM filter to be used to filter out just the valid objects
@@ -187,9 +304,14 @@ def get_filter_for_valid_objects(scope, obj_type, base_lookup_name=None, action_
     Additionally, it is possible to provide an action_name to limit the scope, as well as a base_lookup name that
     will be used to nest the filter into a foreign-key field which will be referenced from an outer model.
 
+    The filters of the policies are combined following the filters precedence rules, and simplified (see
+    :class:`flex_abac.utils.scope_filters.ScopeFilter`).
+
     :param scope: The scope from which the filter will be applied. It can be a policy, a role (in which case all the
-                  associated policies will be checked), or a user (which checks all the associated roles).
-    :type scope: django.contrib.auth.models.User, flex_abac.models.Role, flex_abac.models.Policy
+                  associated policies will be checked), a user (which checks all the associated roles), or an
+                  authorization snapshot.
+    :type scope: django.contrib.auth.models.User, flex_abac.models.Role, flex_abac.models.Policy,
+                 flex_abac.snapshot.AuthorizationSnapshot
 
     :param obj_type: The model object type to check.
     :type obj_type: django.Model
@@ -204,39 +326,44 @@ def get_filter_for_valid_objects(scope, obj_type, base_lookup_name=None, action_
     :returns: django.utils.tree.Node -- The tree of filters which represent the applicable filters.
     """
 
-    filter, all_values_fields = scope.get_filter_for_valid_objects(obj_type, action_name)
-    all_values_fields = set(all_values_fields)
+    if isinstance(scope, (AbstractBaseUser, AnonymousUser)):
+        scope = get_authorization_snapshot(scope)
 
-    unrolled_filter = {}
-    def unroll_filter(filter):
-        for child in filter.children:
-            if isinstance(child, Q):
-                unroll_filter(child)
-            else:
-                key, value = child
-                if not key in unrolled_filter.keys():
-                    unrolled_filter[key] = []
+    if isinstance(scope, AuthorizationSnapshot):
+        if scope.has_unrestricted_policy(action_name, obj_type):
+            return Q()
 
-                unrolled_filter[key].append(value)
+        def compile_filter():
+            return _compile_filter_for_valid_objects(scope.get_policies(action_name), obj_type, base_lookup_name)
 
-    unroll_filter(filter)
+        if not all(attribute_type.is_filter_cacheable() for attribute_type in get_attribute_types_for_model(obj_type)):
+            # Some filters depend on data which does not change the snapshot (e.g. the nodes of nested trees)
+            return compile_filter()
+
+        # Otherwise, filters only change along with the snapshot, so they are compiled once per snapshot
+        return scope.get_compiled_filter(
+            ("get_filter_for_valid_objects", obj_type, base_lookup_name, _get_action_key(action_name)),
+            compile_filter,
+        )
+
+    return _compile_filter_for_valid_objects(_get_scope_policies(scope, action_name), obj_type, base_lookup_name)
 
-    final_filter = Q()
-    for key, values in unrolled_filter.items():
-        if key in all_values_fields:
-            continue
 
-        current_filter = Q()
+def _compile_filter_for_valid_objects(policies, obj_type, base_lookup_name=None):
+    scope_filter = ScopeFilter(obj_type)
+    for policy in policies:
+        scope_filter.add_policy(policy)
 
-        if base_lookup_name:
-            key = f"{base_lookup_name}__{key}"
+    return scope_filter.to_q(base_lookup_name)
 
-        for value in values:
-            current_filter |= Q(**{key: value})
 
-        final_filter &= current_filter
+def _get_scope_policies(scope, action_name=None):
+    if isinstance(scope, Role):
+        policies = scope.policies.all()
+        return policies.with_actions(action_name) if action_name else policies
 
-    return final_filter
+    # A single policy
+    return [scope]
 
 
 def list_valid_objects(policy, obj_type):
@@ -0,0 +1,131 @@
+from flex_abac.checkers import can_user_do, get_filter_for_valid_objects, is_attribute_query_in_scope_from_mapping, \
+    _get_action_key
+from flex_abac.snapshot import get_authorization_snapshot
+from flex_abac.utils.cache import PinnedGeneration, get_permissions_generation, pinned_permissions_generation
+from flex_abac.utils.action_names import get_action_name
+from flex_abac.utils.mappings import get_mapping_from_viewset
+
+
+class AuthorizationContext:
+    """
+    Authorization data of a request (snapshot of the user, view actions and mappings, filters), shared by the
+    permission classes and the filtering mixins. See :meth:`get_authorization_context`.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self._generation = None
+        self._snapshot = None
+        self._action_names = {}
+        self._attribute_mappings = {}
+        self._filters = {}
+        self._decisions = {}
+
+    @property
+    def user(self):
+        return self.request.user
+
+    @property
+    def generation(self):
+        """
+        The permissions generation of the request (see :meth:`flex_abac.utils.cache.get_permissions_generation`), read
+        the first time it is needed.
+        """
+        if self._generation is None:
+            self._generation = PinnedGeneration(get_permissions_generation())
+        return self._generation
+
+    @property
+    def snapshot(self):
+        """
+        The authorization snapshot of the user (see :meth:`flex_abac.snapshot.get_authorization_snapshot`), loaded the
+        first time it is needed.
+        """
+        if self._snapshot is None:
+            with pinned_permissions_generation(self.generation):
+                self._snapshot = get_authorization_snapshot(self.user)
+        return self._snapshot
+
+    @staticmethod
+    def _get_view_key(view):
+        # Decorators can change the action name or the mapping of a view during the request, so they are part of the key
+        kwargs = getattr(view, "kwargs", None) or {}
+        return (
+            id(view),
+            getattr(view, "action", None),
+            getattr(view, "flex_abac_action_name", None),
+            kwargs.get("flex_abac_action_name"),
+            id(getattr(view, "attribute_mapping", None)),
+            id(kwargs.get("attribute_mapping")),
+        )
+
+    def get_action_name(self, view):
+        """
+        Returns the action name of a view (see :meth:`flex_abac.utils.action_names.get_action_name`).
+        """
+        key = self._get_view_key(view)
+        if key not in self._action_names:
+            self._action_names[key] = get_action_name(view)
+        return self._action_names[key]
+
+    def get_attribute_mapping(self, view):
+        """
+        Returns the attribute mapping of a view (see :meth:`flex_abac.utils.mappings.get_mapping_from_viewset`).
+        """
+        key = self._get_view_key(view)
+        if key not in self._attribute_mappings:
+            with pinned_permissions_generation(self.generation):
+                self._attribute_mappings[key] = get_mapping_from_viewset(view)
+        return self._attribute_mappings[key]
+
+    def can_user_do(self, action_name, obj=None):
+        """
+        Same as :meth:`flex_abac.checkers.can_user_do` for the user of the request. Only the checks without an object
+        are memoized.
+        """
+        if obj is not None:
+            with pinned_permissions_generation(self.generation):
+                return can_user_do(action_name, obj=obj, user=self.user, snapshot=self.snapshot)
+
+        key = ("can_user_do", _get_action_key(action_name))
+        if key not in self._decisions:
+            with pinned_permissions_generation(self.generation):
+                self._decisions[key] = can_user_do(action_name, user=self.user, snapshot=self.snapshot)
+        return self._decisions[key]
+
+    def is_attribute_query_in_scope_from_mapping(self, attribute_mapping, target_model):
+        """
+        Same as :meth:`flex_abac.checkers.is_attribute_query_in_scope_from_mapping` for the user of the request.
+        """
+        with pinned_permissions_generation(self.generation):
+            return is_attribute_query_in_scope_from_mapping(self.user, attribute_mapping, target_model,
+                                                            snapshot=self.snapshot)
+
+    def get_filter_for_valid_objects(self, obj_type, base_lookup_name=None, action_name=None):
+        """
+        Same as :meth:`flex_abac.checkers.get_filter_for_valid_objects` for the user of the request.
+        """
+        key = (obj_type, base_lookup_name, _get_action_key(action_name))
+        if key not in self._filters:
+            with pinned_permissions_generation(self.generation):
+                self._filters[key] = get_filter_for_valid_objects(self.snapshot, obj_type,
+                                                                  base_lookup_name=base_lookup_name,
+                                                                  action_name=action_name)
+        return self._filters[key]
+
+
+def get_authorization_context(request):
+    """
+    Returns the authorization context of a request, creating it the first time.
+
+    :param request: The request.
+    :type request: rest_framework.request.Request, django.http.HttpRequest
+
+    :returns: flex_abac.context.AuthorizationContext -- The context.
+    """
+    context = getattr(request, "flex_abac_context", None)
+    if context is None:
+        context = AuthorizationContext(request)
+        request.flex_abac_context = context
+
+    return context
@@ -1,3 +1,4 @@
+from django.core.exceptions import EmptyResultSet
 from django.db.models import Lookup, Field
 
 
@@ -45,4 +46,83 @@ class NotSimilar(Lookup):
         lhs, lhs_params = self.process_lhs(compiler, connection)
         rhs, rhs_params = self.process_rhs(compiler, connection)
         params = lhs_params + rhs_params
-        return 'NOT %s SIMILAR TO %s' % (lhs, rhs), params
\ No newline at end of file
+        return 'NOT %s SIMILAR TO %s' % (lhs, rhs), params
+
+
+class MaterializedScope:
+    """
+    Values in the scope of a materialized nested categorical attribute type (see :class:`InMaterializedScope`): the
+    paths of the scope values, and the attribute type, which defines the model of the tagged objects.
+    """
+
+    __slots__ = ("attribute_type_id", "paths")
+
+    def __init__(self, attribute_type_id, paths):
+        self.attribute_type_id = attribute_type_id
+
+        # Paths with an ancestor in the scope are redundant
+        self.paths = []
+        for path in sorted(set(paths)):
+            if not self.paths or not path.startswith(self.paths[-1]):
+                self.paths.append(path)
+
+    def __repr__(self):
+        return '<MaterializedScope:{}:{}>'.format(self.attribute_type_id, self.paths)
+
+
+@Field.register_lookup
+class InMaterializedScope(Lookup):
+    """
+    Checks whether an object (whose primary key is the left-hand side) is tagged with a value in the provided scope or
+    with any of its descendants, matched by path prefix.
+
+    Example:
+
+    .. code-block:: python
+
+        queryset.filter(pk__fbinmaterializedscope=MaterializedScope(attribute_type.pk, ["0001", "0002000A"]))
+
+    """
+
+    lookup_name = 'fbinmaterializedscope'
+    prepare_rhs = False
+
+    def as_sql(self, compiler, connection):
+        from flex_abac.models import (
+            ItemMaterializedNestedCategoricalFilter, MaterializedNestedCategoricalFilter,
+            ModelMaterializedNestedCategoricalAttribute,
+        )
+
+        scope = self.rhs
+        if not scope.paths:
+            raise EmptyResultSet
+
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+
+        quote_name = connection.ops.quote_name
+        item_table = quote_name(ItemMaterializedNestedCategoricalFilter._meta.db_table)
+        value_table = quote_name(MaterializedNestedCategoricalFilter._meta.db_table)
+        model_attribute_table = quote_name(ModelMaterializedNestedCategoricalAttribute._meta.db_table)
+
+        path_column = f"{value_table}.{quote_name(MaterializedNestedCategoricalFilter._meta.get_field('path').column)}"
+        startswith = connection.operators['startswith'] % '%s'
+        path_conditions = " OR ".join(f"{path_column} {startswith}" for _ in scope.paths)
+        path_params = [f"{connection.ops.prep_for_like_query(path)}%" for path in scope.paths]
+
+        def column(model, field_name):
+            return quote_name(model._meta.get_field(field_name).column)
+
+        # Objects are tagged for the model the attribute type is registered for
+        sql = (
+            f"EXISTS (SELECT 1 FROM {item_table} "
+            f"INNER JOIN {value_table} ON {item_table}.{column(ItemMaterializedNestedCategoricalFilter, 'value')} = "
+            f"{value_table}.{quote_name(MaterializedNestedCategoricalFilter._meta.pk.column)} "
+            f"WHERE {item_table}.{column(ItemMaterializedNestedCategoricalFilter, 'owner_object_id')} = {lhs} "
+            f"AND {item_table}.{column(ItemMaterializedNestedCategoricalFilter, 'owner_content_type')} IN ("
+            f"SELECT {column(ModelMaterializedNestedCategoricalAttribute, 'owner_object_id')} "
+            f"FROM {model_attribute_table} "
+            f"WHERE {column(ModelMaterializedNestedCategoricalAttribute, 'attribute_type')} = %s) "
+            f"AND ({path_conditions}))"
+        )
+
+        return sql, lhs_params + [scope.attribute_type_id] + path_params
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from flex_abac.models import NestedCategoricalClosure
+from flex_abac.utils.trees import get_closure_tables
+
+
+class Command(BaseCommand):
+    help = 'Builds the closure tables of the nested models listed in the FLEX_ABAC_CLOSURE_TABLES setting'
+
+    def handle(self, *args, **options):
+        closure_tables = get_closure_tables()
+        if not closure_tables:
+            self.stdout.write("No closure tables configured (see the FLEX_ABAC_CLOSURE_TABLES setting)")
+
+        for model, parent_field_name in closure_tables.items():
+            rows = NestedCategoricalClosure.rebuild(model, parent_field_name)
+            self.stdout.write(f"{model._meta.label}: {rows} rows")
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-18 15:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('flex_abac', '0002_basefilter_name_squashed_0011_auto_20210930_1235'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NestedCategoricalClosure',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ancestor_id', models.PositiveIntegerField()),
+                ('descendant_id', models.PositiveIntegerField()),
+                ('depth', models.PositiveIntegerField()),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'unique_together': {('content_type', 'ancestor_id', 'descendant_id')},
+                'index_together': {('content_type', 'descendant_id', 'depth')},
+            },
+        ),
+    ]
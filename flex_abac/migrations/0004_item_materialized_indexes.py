@@ -0,0 +1,38 @@
+# Generated by Django 3.2.25 on 2026-10-18 15:43
+
+from django.db import migrations, models
+from django.db.models import Min, Count
+
+
+def remove_duplicated_items(apps, schema_editor):
+    ItemMaterializedNestedCategoricalFilter = apps.get_model("flex_abac", "ItemMaterializedNestedCategoricalFilter")
+
+    duplicated = ItemMaterializedNestedCategoricalFilter.objects.\
+        values("owner_content_type", "owner_object_id", "value").\
+        annotate(first_id=Min("id"), count=Count("id")).filter(count__gt=1)
+
+    for item in duplicated:
+        ItemMaterializedNestedCategoricalFilter.objects.filter(
+            owner_content_type=item["owner_content_type"],
+            owner_object_id=item["owner_object_id"],
+            value=item["value"],
+        ).exclude(id=item["first_id"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flex_abac', '0003_nestedcategoricalclosure'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicated_items, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='materializednestedcategoricalfilter',
+            index=models.Index(fields=['path'], name='flex_abac_materialized_path', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddConstraint(
+            model_name='itemmaterializednestedcategoricalfilter',
+            constraint=models.UniqueConstraint(fields=('owner_content_type', 'owner_object_id', 'value'), name='flex_abac_item_materialized_unique'),
+        ),
+    ]
@@ -1,7 +1,7 @@
-from flex_abac.checkers import get_filter_for_valid_objects
+import functools
 
-from flex_abac.utils.mappings import get_mapping_from_viewset
-from flex_abac.utils.action_names import get_action_name
+from flex_abac.context import get_authorization_context
+from flex_abac.utils.scope_filters import compile_valid_objects_condition, filter_valid_objects
 
 from django.db.models.expressions import Q
 
@@ -22,6 +22,9 @@ class ApplyFilterMixin(object):
             @action(detail=False, methods=["GET"])
             def filter(self, request, *args, **kwargs):
                 return Response("example action")
+
+    The way the filter for the valid objects is applied can be selected through the ``filter_strategy`` attribute of
+    the view (see :meth:`flex_abac.utils.scope_filters.compile_valid_objects_condition`).
     """
 
     def get_object(self):
@@ -31,22 +34,30 @@ class ApplyFilterMixin(object):
         return obj
 
     def filter_queryset(self, queryset):
-        attribute_mapping = get_mapping_from_viewset(self)
+        context = get_authorization_context(self.request)
+        attribute_mapping = context.get_attribute_mapping(self)
 
-        action_name = get_action_name(self)
+        action_name = context.get_action_name(self)
         base_model = getattr(self, "base_model", queryset.model)
 
         base_lookup_name = getattr(self, "base_lookup", None)
 
-        valid_filter = get_filter_for_valid_objects(self.request.user, base_model,
-                                                    base_lookup_name=base_lookup_name,
-                                                    action_name=action_name)
+        valid_condition = compile_valid_objects_condition(
+            functools.partial(context.get_filter_for_valid_objects, base_model, action_name=action_name),
+            base_model,
+            base_lookup_name=base_lookup_name,
+            strategy=getattr(self, "filter_strategy", None),
+        )
 
+        mapping_filter = Q()
         if attribute_mapping and queryset.model in attribute_mapping.keys():
             for attribute_name, attribute_filters in attribute_mapping[queryset.model].items():
                 additional_filter = Q()
                 for attribute_filter in attribute_filters:
                     additional_filter |= Q(**{attribute_name: attribute_filter})
-                valid_filter &= additional_filter
+                mapping_filter &= additional_filter
+
+        if isinstance(valid_condition, Q):
+            return queryset.filter(valid_condition & mapping_filter)
 
-        return queryset.filter(valid_filter)
+        return filter_valid_objects(queryset, valid_condition).filter(mapping_filter)
@@ -13,6 +13,7 @@ from .model_categorical_attribute import *
 from .model_nested_categorical_attribute import *
 from .nested_categorical_attribute import *
 from .nested_categorical_filter import *
+from .nested_categorical_closure import *
 from .model_materialized_nested_categorical_attribute import *
 from .materialized_nested_categorical_attribute import *
 from .materialized_nested_categorical_filter import *
@@ -7,6 +7,11 @@ from flex_abac.models.base_filter import BaseFilter
 from django.core.exceptions import FieldDoesNotExist
 from jsonfield import JSONField
 from django.contrib.auth.models import User
+from django.db.models import Exists, OuterRef
+
+from flex_abac.constants import SUPERADMIN_ROLE, GLOBAL_VIEWER_ROLE
+from flex_abac.registry import get_attribute_metadata
+from flex_abac.utils.query_values import QueryAttributeValue
 
 
 class BaseAttribute(PolymorphicModel):
@@ -22,6 +27,16 @@ class BaseAttribute(PolymorphicModel):
 
     extra_fields = JSONField(null=True)
 
+    # Filter model holding the values of this attribute type, and the model relating those values with the policies
+    filter_model = None
+    policy_filter_model = None
+
+    # Model relating the attribute types of this class with the models they apply to
+    model_attribute_model = None
+
+    # Fields (from the point of view of the policy filter model) which represent a scope value
+    scope_value_fields = ("value__value",)
+
     class Meta:
         verbose_name = 'Attribute'
         verbose_name_plural = 'Attributes'
@@ -49,6 +64,155 @@ class BaseAttribute(PolymorphicModel):
         """
         raise NotImplementedError
 
+    @classmethod
+    def get_model_attributes_to_check(cls):
+        """
+        Returns the links between the attribute types of this class and the models they apply to, for the attribute
+        types which should be checked (see ``get_all_to_check_for_model``). The attribute types are loaded in the same
+        query.
+
+        :returns: django.db.models.QuerySet -- The links (instances of ``model_attribute_model``).
+        """
+        if cls.model_attribute_model is None:
+            return []
+
+        return cls.model_attribute_model.objects.select_related("attribute_type").order_by("attribute_type_id")
+
+    @classmethod
+    def load_lineages(cls):
+        """
+        Loads the lineages of the attribute types of this class which are organized in a hierarchy (i.e. the attribute
+        types whose query values also cover a given attribute type). By default, attribute types have no hierarchy.
+
+        :returns: dict -- ``{attribute_type_id: (ancestor_id, ..., attribute_type_id)}``, from the root down to each
+                  attribute type.
+        """
+        return {}
+
+    @classmethod
+    def load_policy_scopes(cls, policy_ids, attribute_type_ids=None):
+        """
+        Loads, in a single query, the scope values assigned to a set of policies for the attribute types of this class.
+
+        :param policy_ids: The ids of the policies to load.
+        :type policy_ids: list<int>
+
+        :param attribute_type_ids: Optional. Limits the scopes to these attribute types.
+        :type attribute_type_ids: list<int>
+
+        :returns: dict -- ``{policy_id: {attribute_type_id: [scope_value, ...]}}``. A scope value is the value of the
+                  single field in ``scope_value_fields``, or a tuple if there are several of them.
+        """
+        if cls.policy_filter_model is None:
+            return {}
+
+        policy_filters = cls.policy_filter_model.objects.filter(policy_id__in=policy_ids)
+        if attribute_type_ids is not None:
+            policy_filters = policy_filters.filter(value__attribute_type_id__in=attribute_type_ids)
+
+        scopes = {}
+        for policy_id, attribute_type_id, *scope_value in policy_filters.\
+                values_list("policy_id", "value__attribute_type_id", *cls.scope_value_fields).order_by("pk"):
+            scope_value = scope_value[0] if len(scope_value) == 1 else tuple(scope_value)
+            scopes.setdefault(policy_id, {}).setdefault(attribute_type_id, []).append(scope_value)
+
+        return scopes
+
+    @classmethod
+    def load_policy_filters(cls, policy_ids, attribute_type_ids):
+        """
+        Loads, in a single query, the filters (values) assigned to a set of policies for some attribute types of this
+        class.
+
+        :param policy_ids: The ids of the policies to load.
+        :type policy_ids: list<int>
+
+        :param attribute_type_ids: The ids of the attribute types to load.
+        :type attribute_type_ids: list<int>
+
+        :returns: dict -- ``{attribute_type_id: {policy_id: [filter, ...]}}``, where filters are instances of
+                  ``filter_model``.
+        """
+        if cls.policy_filter_model is None:
+            return {}
+
+        policy_filters = {}
+        for policy_filter in cls.policy_filter_model.objects.filter(
+                policy_id__in=policy_ids, value__attribute_type_id__in=attribute_type_ids
+        ).select_related("value").order_by("pk"):
+            policy_filters.setdefault(policy_filter.value.attribute_type_id, {}).\
+                setdefault(policy_filter.policy_id, []).append(policy_filter.value)
+
+        return policy_filters
+
+    def get_scope_values(self, policy):
+        """
+        Returns the values of this attribute type included in the scope of a policy. An empty list means the policy does
+        not restrict this attribute type.
+
+        :param policy: The policy (or compiled policy, see ``flex_abac.snapshot.CompiledPolicy``) to check.
+        :type policy: flex_abac.models.Policy, flex_abac.snapshot.CompiledPolicy
+
+        :returns: list -- The scope values, as described in ``load_policy_scopes``.
+        """
+        return policy.get_scope_values(self)
+
+    def is_unrestricted(self, policy):
+        """
+        Checks whether a policy allows all the values of this attribute type, so it does not need to be evaluated for
+        that policy (i.e. ``does_match`` always matches and ``get_filter`` does not filter anything).
+
+        :param policy: The policy (or compiled policy, see ``flex_abac.snapshot.CompiledPolicy``) to check.
+        :type policy: flex_abac.models.Policy, flex_abac.snapshot.CompiledPolicy
+
+        :returns: bool -- True, if the policy does not restrict this attribute type. False, otherwise.
+        """
+        return not self.get_scope_values(policy)
+
+    def is_filter_cacheable(self):
+        """
+        Checks whether the filters built by ``get_filter`` only depend on the scope values of the policies, so they can
+        be reused until the permission graph changes. Filters resolving other data when they are built (e.g. the nodes
+        of a tree) should be built again each time, since changes in that data do not invalidate them.
+
+        :returns: bool -- True, if the filters can be cached. False, otherwise.
+        """
+        return True
+
+    def get_policies_with_values_in_scope(self, values, policies):
+        """
+        Batched version of ``is_in_policy_scope``: returns the policies whose scope includes all the provided values
+        (filters) of this attribute type. By default, each value is checked against each policy.
+
+        :param values: The values to check (instances of ``filter_model``).
+        :type values: list<flex_abac.models.BaseFilter>
+
+        :param policies: The policies (or compiled policies, see ``flex_abac.snapshot.CompiledPolicy``) to check.
+        :type policies: list<flex_abac.models.Policy, flex_abac.snapshot.CompiledPolicy>
+
+        :returns: list -- The policies including all the values, in the same order.
+        """
+        return [policy for policy in policies if all(value.is_in_policy_scope(policy) for value in values)]
+
+    def _filter_policies_by_scope_values(self, candidates_per_value, policies, empty_scope_matches=False):
+        """
+        Returns the policies whose scope values include, for each value, any of its candidates (e.g. the value itself
+        or one of its ancestors). The scope values of each policy are loaded once, from the policy itself.
+        """
+        matching_policies = []
+        for policy in policies:
+            scope_values = self.get_scope_values(policy)
+            if not scope_values:
+                if empty_scope_matches:
+                    matching_policies.append(policy)
+                continue
+
+            scope_values = _as_lookup_container(scope_values)
+            if all(any(candidate in scope_values for candidate in candidates) for candidates in candidates_per_value):
+                matching_policies.append(policy)
+
+        return matching_policies
+
     # TODO: Add comments
     def get_filter(self, policy):
         raise NotImplementedError
@@ -57,6 +221,18 @@ class BaseAttribute(PolymorphicModel):
     def get_attribute_value(self, value):
         raise NotImplementedError
 
+    def get_query_values(self, values):
+        """
+        Represents the values of this attribute type used in a query (e.g. a REST API list filter) to be checked
+        against the scope of the policies.
+
+        :param values: The values, as provided in the query.
+        :type values: list
+
+        :returns: list<flex_abac.utils.query_values.QueryAttributeValue> -- The query values, in the same order.
+        """
+        return [QueryAttributeValue(self, value) for value in values]
+
     def is_represented_in_query_values(self, query_attribute_values):
         """
         Returns a boolean indicating whether the attribute type is referenced
@@ -100,19 +276,46 @@ class BaseAttribute(PolymorphicModel):
         return False
 
 
-    # TODO: Add comments
     def get_content_type(self):
-        raise NotImplementedError
+        """
+        Returns the content type of the model this attribute type applies to. It is resolved from the attribute
+        metadata table (see :meth:`flex_abac.registry.get_attribute_metadata`), so it does not query the database.
+
+        :returns: django.contrib.contenttypes.models.ContentType -- The content type.
+        """
+        if self.model_attribute_model is None:
+            raise NotImplementedError
+
+        return get_attribute_metadata().get_content_type(self)
 
-    # TODO: Add comments
     def get_model(self):
-        content_type = self.get_content_type()
-        return content_type.model_class()
+        """
+        Returns the model this attribute type applies to (see :meth:`get_content_type`).
 
+        :returns: django.Model -- The model.
+        """
+        if self.model_attribute_model is None:
+            raise NotImplementedError
 
-    # TODO: Add comments
-    def find_field_in_model(self, as_path=True):
-        model = self.get_model()
+        return get_attribute_metadata().get_model(self)
+
+    def find_field_in_model(self, as_path=True, model=None):
+        """
+        Resolves the field of this attribute type in a model.
+
+        :param as_path: Whether to return the path of the field (otherwise, its internal type).
+        :type as_path: bool
+
+        :param model: Optional. The model. By default, the one this attribute type applies to, in which case the
+                      result is memoized in the attribute metadata table.
+        :type model: django.Model
+
+        :returns: str -- The path or internal type of the field.
+        """
+        if model is None and self.model_attribute_model is not None:
+            return get_attribute_metadata().find_field_in_model(self, as_path=as_path)
+
+        model = model or self.get_model()
 
         lookups = list(reversed(self.field_name.split("__")))
         field = None
@@ -138,22 +341,87 @@ class BaseAttribute(PolymorphicModel):
         raise NotImplementedError
 
     def is_scope_empty_for_user(self, FilterClass, user, action_name=None):
-        if not isinstance(user, User):
-            user = User.objects.get(pk=user)
+        """
+        Looks for a policy of the user, including the provided action, without values (filters) for this attribute
+        type, i.e. allowing all its values. Policies of the super admin and global viewer roles are not taken into
+        account. It is checked in a single query.
+
+        :param FilterClass: The filter model holding the values of this attribute type.
+        :type FilterClass: flex_abac.models.BaseFilter
+
+        :param user: The user (or its id).
+        :type user: django.contrib.auth.models.User, int
 
-        user_policies = user.get_policies(). \
-            filter(action__name=action_name). \
-            exclude(role__name__in=(SUPERADMIN_ROLE, "flex-abac Viewer Role"))
+        :param action_name: The name of the action.
+        :type action_name: str
 
-        for user_policy in user_policies:
-            policy_filters = FilterClass.objects.filter(attribute_type=self, policies=user_policy)
-            if not policy_filters.exists():
-                return user_policy
+        :returns: flex_abac.models.Policy -- The first policy with an empty scope, or None.
+        """
+        return _get_candidate_policies(user, action_name). \
+            annotate(has_filters=Exists(FilterClass.objects.filter(attribute_type=self.pk, policies=OuterRef("pk")))). \
+            filter(has_filters=False). \
+            order_by("pk"). \
+            first()
+
+    @staticmethod
+    def get_policies_with_empty_scope_for_user(attribute_types, user, action_name=None):
+        """
+        Batched version of :meth:`is_scope_empty_for_user` for many attribute types, in a single query.
+
+        :param attribute_types: The attribute types to check.
+        :type attribute_types: list<flex_abac.models.BaseAttribute>
 
-        return None
+        :param user: The user (or its id).
+        :type user: django.contrib.auth.models.User, int
+
+        :param action_name: The name of the action.
+        :type action_name: str
+
+        :returns: dict -- ``{attribute_type_id: policy}``, where policy is the first policy with an empty scope for
+                  that attribute type, or None.
+        """
+        attribute_types = list(attribute_types)
+        if not attribute_types:
+            return {}
+
+        # One flag per attribute type, telling whether the policy has values for it
+        flags = {
+            f"has_filters_{attribute_type.pk}": Exists(type(attribute_type).policy_filter_model.objects.filter(
+                policy_id=OuterRef("pk"), value__attribute_type_id=attribute_type.pk
+            ))
+            for attribute_type in attribute_types
+            if type(attribute_type).policy_filter_model is not None
+        }
+
+        policies_with_empty_scope = dict.fromkeys((attribute_type.pk for attribute_type in attribute_types))
+        for user_policy in _get_candidate_policies(user, action_name).annotate(**flags).order_by("pk"):
+            for attribute_type_id, policy in policies_with_empty_scope.items():
+                if policy is None and not getattr(user_policy, f"has_filters_{attribute_type_id}", False):
+                    policies_with_empty_scope[attribute_type_id] = user_policy
+
+        return policies_with_empty_scope
 
     def get_all_values_for_user(self, user):
         return BaseFilter.objects.filter(policies__roles__users=user, attribute_type=self)
 
     def __str__(self):
         return '<BaseAttribute:{}>'.format(self.name)
+
+
+def _as_lookup_container(values):
+    # Sets allow constant time lookups, but scope values are not always hashable (e.g. pickled lists)
+    try:
+        return frozenset(values)
+    except TypeError:
+        return list(values)
+
+
+def _get_candidate_policies(user, action_name=None):
+    # Policies of the user, including the action, which could allow all the values of an attribute type
+    if not isinstance(user, User) and not getattr(user, "is_anonymous", False):
+        user = User.objects.get(pk=user)
+
+    return user.get_policies(). \
+        filter(action__name=action_name). \
+        exclude(role__name__in=(SUPERADMIN_ROLE, GLOBAL_VIEWER_ROLE))
+
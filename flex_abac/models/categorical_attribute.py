@@ -7,6 +7,7 @@ from .model_categorical_attribute import ModelCategoricalAttribute
 from .policy_categorical_filter import PolicyCategoricalFilter
 
 from django.db.models.query import Q
+from flex_abac.utils.evaluators import does_object_match, UnsupportedLookup
 
 from rest_framework.exceptions import ValidationError
 
@@ -46,6 +47,10 @@ class CategoricalAttribute(BaseAttribute):
         )
     """
 
+    filter_model = CategoricalFilter
+    policy_filter_model = PolicyCategoricalFilter
+    model_attribute_model = ModelCategoricalAttribute
+
     def __init__(self, *args, **kwargs):
         self._meta.get_field('serializer').default = "flex_abac.serializers.default.CategoricalSerializer"
         super(CategoricalAttribute, self).__init__(*args, **kwargs)
@@ -131,18 +136,17 @@ class CategoricalAttribute(BaseAttribute):
         return is_covered
 
     def get_filter(self, policy):
-        scope_items = policy.get_attribute_values(CategoricalFilter, PolicyCategoricalFilter).\
-            filter(attribute_type__field_name=self.field_name, attribute_type=self)
+        scope_values = self.get_scope_values(policy)
 
         all_values_fields = []
-        if not scope_items.exists():
+        if not scope_values:
             all_values_fields = [self.field_name]
 
         # Caution: If more than one field with the same field name (including lookup) is provided, it will perform as
         # an OR (that is, if it is accepted by one of them, it will be accepted even if it is not fulfilled for others)
         or_filter = Q()
 
-        for scope in scope_items.values_list("value", flat=True):
+        for scope in scope_values:
             match_filter = {
                 self.field_name: scope
             }
@@ -151,11 +155,22 @@ class CategoricalAttribute(BaseAttribute):
         return or_filter, all_values_fields
 
     def does_match(self, obj, policy):
-        queryset = type(obj).objects.filter(pk=obj.pk)
+        scope_values = self.get_scope_values(policy)
+
+        try:
+            return not scope_values or does_object_match(obj, self.field_name, scope_values)
+        except UnsupportedLookup:
+            # Falling back to the database
+            queryset = type(obj).objects.filter(pk=obj.pk)
+
+            or_filter, _ = self.get_filter(policy)
 
-        or_filter, _ = self.get_filter(policy)
+            return queryset.filter(or_filter).exists()
 
-        return queryset.filter(or_filter).exists()
+    def get_policies_with_values_in_scope(self, values, policies):
+        # Policies without values for this attribute type allow all its values
+        return self._filter_policies_by_scope_values([[value.value] for value in values], policies,
+                                                     empty_scope_matches=True)
 
     def get_attribute_value(self, value):
         return CategoricalFilter(
@@ -163,16 +178,6 @@ class CategoricalAttribute(BaseAttribute):
             attribute_type=self,
         )
 
-    def get_model(self):
-        model_categorical_attribute = ModelCategoricalAttribute.objects.get(attribute_type=self)
-
-        content_type = ContentType.objects.get(pk=model_categorical_attribute.owner_content_object.id)
-        return content_type.model_class()
-
-    def get_content_type(self):
-        model_categorical_attribute = ModelCategoricalAttribute.objects.get(attribute_type=self)
-        return ContentType.objects.get(pk=model_categorical_attribute.owner_content_object.id)
-
     def get_values(self):
         field = self.find_field_in_model(as_path=True)
         model = self.get_model()
@@ -1,7 +1,11 @@
+from itertools import islice
+
 from django.db import models
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 
+from flex_abac.utils.cache import invalidate_permissions_cache
+
 
 class ItemBaseFilter(models.Model):
     value = models.ForeignKey(
@@ -24,6 +28,103 @@ class ItemBaseFilter(models.Model):
     class Meta:
         abstract = True
 
+    @staticmethod
+    def _get_value_id(value):
+        return value.pk if isinstance(value, models.Model) else value
+
+    @staticmethod
+    def _iter_pairs(values_by_object):
+        # Accepts both {obj: [value, ...]} and [(obj, value), ...]
+        items = values_by_object.items() if hasattr(values_by_object, "items") else \
+            ((obj, [value]) for obj, value in values_by_object)
+        for obj, values in items:
+            for value in values:
+                yield obj, value
+
+    @classmethod
+    def tag_objects(cls, values_by_object, batch_size=1000):
+        """
+        Tags objects with values in bulk, by using chunks of ``bulk_create``. Tags which already exist are ignored. Since
+        ``bulk_create`` sends no signals, the permissions cache is invalidated once if any tag was processed.
+
+        Example:
+
+        .. code-block:: python
+
+            ItemMaterializedNestedCategoricalFilter.tag_objects({
+                document_1: [paris_office, lyon_office],
+                document_2: [lyon_office],
+            })
+
+        :param values_by_object: Dictionary with the objects as keys and the list of values (instances or ids) as
+                                 values, or an iterable of (object, value) pairs.
+        :type values_by_object: dict, iterable
+
+        :param batch_size: Number of tags inserted per query.
+        :type batch_size: int
+
+        :returns: int -- The number of tags processed (including the ones which already existed).
+        """
+        items = (
+            cls(
+                value_id=cls._get_value_id(value),
+                owner_content_type=ContentType.objects.get_for_model(type(obj)),
+                owner_object_id=obj.pk,
+            )
+            for obj, value in cls._iter_pairs(values_by_object)
+        )
+
+        count = 0
+        while True:
+            batch = list(islice(items, batch_size))
+            if not batch:
+                break
+            cls.objects.bulk_create(batch, ignore_conflicts=True)
+            count += len(batch)
+
+        if count:
+            invalidate_permissions_cache()
+
+        return count
+
+    @classmethod
+    def untag_objects(cls, objs, values=None, batch_size=1000):
+        """
+        Removes the tags of objects in bulk, deleting them in chunks of ``batch_size`` objects. The permissions cache is
+        invalidated once if any tag was removed.
+
+        :param objs: The objects to untag. They can belong to different models.
+        :type objs: iterable<django.Model>
+
+        :param values: Optional. If provided, only the tags with these values (instances or ids) are removed.
+                       Otherwise, all the tags of the objects are removed.
+        :type values: list
+
+        :param batch_size: Number of objects untagged per query.
+        :type batch_size: int
+
+        :returns: int -- The number of tags removed.
+        """
+        value_ids = [cls._get_value_id(value) for value in values] if values is not None else None
+
+        ids_per_content_type = {}
+        for obj in objs:
+            ids_per_content_type.setdefault(ContentType.objects.get_for_model(type(obj)), []).append(obj.pk)
+
+        count = 0
+        for content_type, object_ids in ids_per_content_type.items():
+            for start in range(0, len(object_ids), batch_size):
+                items = cls.objects.filter(owner_content_type=content_type,
+                                           owner_object_id__in=object_ids[start:start + batch_size])
+                if value_ids is not None:
+                    items = items.filter(value_id__in=value_ids)
+                count += items.delete()[0]
+
+        if count:
+            invalidate_permissions_cache()
+
+        return count
+
     def __str(self):
         return '<{} % {}:{}>'.format(
             self.value,
@@ -8,27 +8,9 @@ class ItemMaterializedNestedCategoricalFilter(ItemBaseFilter):
         on_delete=models.CASCADE
     )
 
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+    class Meta:
+        constraints = [
+            # Also used by the checkers to find the values of an object
+            models.UniqueConstraint(fields=["owner_content_type", "owner_object_id", "value"],
+                                    name="flex_abac_item_materialized_unique"),
+        ]
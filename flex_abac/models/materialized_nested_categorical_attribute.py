@@ -8,8 +8,10 @@ from .item_materialized_nested_categorical_filter import ItemMaterializedNestedC
 from .materialized_nested_categorical_filter import MaterializedNestedCategoricalFilter
 from .policy_materialized_nested_categorical_filter import PolicyMaterializedNestedCategoricalFilter
 from django.contrib.contenttypes.models import ContentType
-from django.apps import apps
 from django.db.models.query import Q
+from flex_abac.lookups import MaterializedScope
+from flex_abac.registry import get_attribute_metadata
+from flex_abac.utils.query_values import QueryAttributeValue
 
 from django.core.exceptions import FieldDoesNotExist
 
@@ -123,19 +125,25 @@ class MaterializedNestedCategoricalAttribute(BaseAttribute, MP_Node):
                             attribute_type=attribute_region_levels[depth]
                         )
 
-                    # We need to create an additional ItemMaterializedNestedCategoricalFilter
+                    # We need to tag the documents with the value (an ItemMaterializedNestedCategoricalFilter per
+                    # document). Tagging is done in bulk, which is recommended when there are many objects.
                     related_documents = Documentregions.objects.filter(region=region.pk)
-                    for documentregion in related_documents:
-                        ItemMaterializedNestedCategoricalFilter.objects.create(
-                            value=region_values[region.pk],
-                            owner_content_object=documentregion.document,
-                        )
+                    ItemMaterializedNestedCategoricalFilter.tag_objects(
+                        (documentregion.document, region_values[region.pk]) for documentregion in related_documents
+                    )
 
                 last_level = Region.objects.filter(parent__in=last_level)
                 depth += 1
 
     """
 
+    filter_model = MaterializedNestedCategoricalFilter
+    policy_filter_model = PolicyMaterializedNestedCategoricalFilter
+    model_attribute_model = ModelMaterializedNestedCategoricalAttribute
+
+    # Scope values are (id, path) pairs of the nodes in the values tree
+    scope_value_fields = ("value_id", "value__path")
+
     def __init__(self, *args, **kwargs):
         self._meta.get_field('serializer').default = "flex_abac.serializers.default.MaterializedNestedCategoricalSerializer"
         super(MaterializedNestedCategoricalAttribute, self).__init__(*args, **kwargs)
@@ -217,6 +225,11 @@ class MaterializedNestedCategoricalAttribute(BaseAttribute, MP_Node):
         )
 
 
+    @classmethod
+    def get_model_attributes_to_check(cls):
+        # Checking leaf attributes only, non-leaf attributes will be handled by their leaf descendants
+        return super().get_model_attributes_to_check().filter(attribute_type__numchild=0)
+
     @classmethod
     def get_all_attributes_from_content_types(cls, content_types):
         return cls.objects.filter(
@@ -228,87 +241,105 @@ class MaterializedNestedCategoricalAttribute(BaseAttribute, MP_Node):
         )
 
     def is_represented_in_query_values(self, query_attribute_values):
-        query_attribute_types = [v.attribute_type for v in query_attribute_values]
-        is_covered = False
-        for query_attribute_type in query_attribute_types:
-            try:
-                _ = query_attribute_type.depth
-                if query_attribute_type == self or self in query_attribute_type.get_descendants():
-                    is_covered = True
-                    break
-                else:
-                    pass
-            except AttributeError:
-                # query attribute type is not nested, ignoring
-                pass
+        # Values of this attribute type or of any of its ancestors cover it
+        lineage_ids = get_attribute_metadata().get_lineage_ids(self)
 
-        return is_covered
+        return any(
+            query_attribute_value.attribute_type.pk in lineage_ids for query_attribute_value in query_attribute_values
+        )
 
     def get_filter(self, policy):
-        scope_items = policy.get_attribute_values(MaterializedNestedCategoricalFilter, PolicyMaterializedNestedCategoricalFilter).\
-            filter(attribute_type__field_name=self.field_name, attribute_type=self)
+        scope_paths = self.get_scope_paths(policy)
 
         all_values_fields = []
-        if not scope_items.exists():
+        if not scope_paths:
             all_values_fields = [self.field_name]
 
-        return Q(**{"pk__in": ItemMaterializedNestedCategoricalFilter.objects.filter(value__in=scope_items.values("id")).
-                 values("owner_object_id")}), all_values_fields
+        # Objects tagged with a value in the scope or any of its descendants
+        return Q(pk__fbinmaterializedscope=MaterializedScope(self.pk, scope_paths)), all_values_fields
 
-    def does_match(self, obj, policy):
-        MaterializedNestedCategoricalFilter = apps.get_model(
-            "flex_abac",
-            "materializednestedcategoricalFilter"
-        )
-        object_values = MaterializedNestedCategoricalFilter.objects.filter(
-            attribute_type=self,
-            id__in=Subquery(
-                ItemMaterializedNestedCategoricalFilter.objects.filter(
-                    owner_content_type=ContentType.objects.get_for_model(type(obj)),
-                    owner_object_id=obj.id
-                ).values('value_id')
+    @classmethod
+    def load_lineages(cls):
+        # Ancestors of a node are the ones whose path is a prefix of the node path, so all of them come from one query
+        ids_per_path = dict(cls.objects.values_list("path", "pk"))
+
+        return {
+            attribute_type_id: tuple(
+                ids_per_path[path[:length]] for length in range(cls.steplen, len(path) + 1, cls.steplen)
+                if path[:length] in ids_per_path
             )
+            for path, attribute_type_id in ids_per_path.items()
+        }
+
+    def get_lineage(self):
+        """
+        Returns this attribute type and its ancestors, from the root down to this one. Since values in the tree of an
+        object value belong to the same attribute type or to one of its ancestors, these are the attribute types whose
+        scope values should be taken into account for this one. It is loaded once per instance.
+
+        :returns: list<flex_abac.models.MaterializedNestedCategoricalAttribute> -- The attribute types.
+        """
+        if "_lineage" not in self.__dict__:
+            self.__dict__["_lineage"] = list(self.get_ancestors()) + [self]
+        return self.__dict__["_lineage"]
+
+    def get_scope_paths(self, policy):
+        """
+        Returns the paths of the values in the scope of a policy for this attribute type and its ancestors. A value is
+        in the scope of the policy if any of these paths is a prefix of its path (i.e. it is the value itself or one of
+        its ancestors).
+
+        :param policy: The policy (or compiled policy, see ``flex_abac.snapshot.CompiledPolicy``) to check.
+        :type policy: flex_abac.models.Policy, flex_abac.snapshot.CompiledPolicy
+
+        :returns: tuple<str> -- The paths.
+        """
+        return tuple(
+            path for attribute_type in self.get_lineage() for _, path in attribute_type.get_scope_values(policy)
         )
-        if not object_values.count():
-            return False
 
-        PolicyMaterializedNestedCategoricalFilter = apps.get_model(
-            "flex_abac",
-            "policymaterializednestedcategoricalFilter"
+    def get_attribute_value(self, value):
+        # The node of the tree, so its path is known. Values not in the tree have no path, and are not in any scope
+        return self.values.filter(value=value).first() or MaterializedNestedCategoricalFilter(
+            value=value,
+            attribute_type=self,
         )
 
-        nested_categorical_values = policy.get_attribute_values(
-            MaterializedNestedCategoricalFilter,
-            PolicyMaterializedNestedCategoricalFilter
-        )
+    def get_query_values(self, values):
+        # The paths of all the values are retrieved at once, since scopes are checked by path
+        paths = dict(self.values.filter(value__in=values).values_list("value", "path"))
 
-        matching_scope_values = nested_categorical_values.filter(
-            id__in=Subquery(object_values.values('id'))
-        )
+        return [QueryAttributeValue(self, value, paths.get(value, "")) for value in values]
 
-        direct_match = matching_scope_values.count() > 0
+    def get_policies_with_values_in_scope(self, values, policies):
+        # Scope paths are computed once per policy
+        paths = [value.path for value in values]
+        matching_policies = []
+        for policy in policies:
+            scope_paths = self.get_scope_paths(policy)
+            if all(path.startswith(scope_paths) for path in paths):
+                matching_policies.append(policy)
 
-        ancestor_match = False
+        return matching_policies
 
-        if not direct_match:
-            for object_value in object_values:
-                matching_ancestor_scope_values = nested_categorical_values.filter(
-                    id__in=Subquery(object_value.get_ancestors().values('id'))
-                )
-                if matching_ancestor_scope_values.count() > 0:
-                    ancestor_match = True
-                    break
+    def is_unrestricted(self, policy):
+        # Objects are only matched by values in the scope, so an empty scope does not match any object
+        return False
 
-        if not direct_match and not ancestor_match:
+    def does_match(self, obj, policy):
+        scope_paths = self.get_scope_paths(policy)
+        if not scope_paths:
             return False
 
-        return True
+        object_paths = ItemMaterializedNestedCategoricalFilter.objects.filter(
+            owner_content_type=ContentType.objects.get_for_model(type(obj)),
+            owner_object_id=obj.pk,
+            value__attribute_type=self,
+        ).values_list("value__path", flat=True)
 
-    def get_content_type(self):
-        model_generic_attribute = ModelMaterializedNestedCategoricalAttribute.objects.get(attribute_type=self)
-        return ContentType.objects.get(pk=model_generic_attribute.owner_content_object.id)
+        return any(object_path.startswith(scope_paths) for object_path in object_paths)
 
-    def find_field_in_model(self, as_path=True):
+    def find_field_in_model(self, as_path=True, model=None):
         if as_path:
             return self.field_name
         else:
@@ -1,11 +1,9 @@
 from django.db import models
-from django.db.models import Subquery
 from treebeard.mp_tree import MP_Node
 from django.core.validators import ValidationError
 from django.core.exceptions import NON_FIELD_ERRORS
 from flex_abac.utils.treebeard import print_node
 from .base_filter import BaseFilter
-from django.apps import apps
 
 from .policy_materialized_nested_categorical_filter import PolicyMaterializedNestedCategoricalFilter
 
@@ -33,6 +31,11 @@ class MaterializedNestedCategoricalFilter(MP_Node, BaseFilter):
 
         unique_together = ("value", "attribute_type")
 
+        indexes = [
+            # Allows using the index for prefix matching (LIKE 'prefix%') in PostgreSQL, whatever the collation
+            models.Index(fields=["path"], name="flex_abac_materialized_path", opclasses=["varchar_pattern_ops"]),
+        ]
+
     @classmethod
     def print_all(cls):
         for attr in PolicyMaterializedNestedCategoricalFilter.objects.filter(depth=1):
@@ -64,33 +67,5 @@ class MaterializedNestedCategoricalFilter(MP_Node, BaseFilter):
         )
 
     def is_in_policy_scope(self, policy):
-        MaterializedNestedCategoricalAttribute = apps.get_model(
-            'flex_abac',
-            'materializednestedcategoricalattribute'
-        )
-
-        self_and_ancestor_attribute_types = MaterializedNestedCategoricalAttribute.objects.filter(
-                                                        id=self.attribute_type.id
-                                                    ) \
-                                                    | self.attribute_type.get_ancestors()
-
-        policy_values_of_matching_types = PolicyMaterializedNestedCategoricalFilter.objects.filter(
-            policy_id=policy.id,
-            value_id__in=Subquery(
-                MaterializedNestedCategoricalFilter.objects.filter(
-                    attribute_type__in=self_and_ancestor_attribute_types
-                ).values('id')
-            )
-        )
-        values_of_matching_types = MaterializedNestedCategoricalFilter.objects.filter(
-            id__in=policy_values_of_matching_types.values('value_id')
-        )
-
-        self_ancestors = self.get_ancestors()
-
-        if self in values_of_matching_types:
-            return True
-        else:
-            if any([self == v or v in self_ancestors for v in values_of_matching_types]):
-                return True
-        return False
\ No newline at end of file
+        # Ancestors of a node (and the node itself) are the ones whose path is a prefix of the node path
+        return self.path.startswith(self.attribute_type.get_scope_paths(policy))
@@ -1,10 +1,14 @@
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
-from django.db.models import Subquery
+from django.db.models import Exists, OuterRef, Subquery
+from django.db.models.functions import Length, Substr
 from django.db.models.query import Q
 from flex_abac.utils.treebeard import print_node
+from flex_abac.utils.trees import get_descendants_subquery, get_closure_descendants_subquery, has_closure_table, \
+    get_closure_ancestors, supports_recursive_queries
 from rest_framework.exceptions import ValidationError
 from treebeard.models import Node as TreebeardNode
+from treebeard.mp_tree import MP_Node
 
 from .base_attribute import BaseAttribute
 from .model_nested_categorical_attribute import ModelNestedCategoricalAttribute
@@ -92,6 +96,10 @@ class NestedCategoricalAttribute(BaseAttribute):
     parent_field_name = models.CharField(max_length=512, null=False)
     field_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
 
+    filter_model = NestedCategoricalFilter
+    policy_filter_model = PolicyNestedCategoricalFilter
+    model_attribute_model = ModelNestedCategoricalAttribute
+
     def __init__(self, *args, **kwargs):
         self._meta.get_field('serializer').default = "flex_abac.serializers.default.NestedCategoricalSerializer"
         super(NestedCategoricalAttribute, self).__init__(*args, **kwargs)
@@ -165,39 +173,70 @@ class NestedCategoricalAttribute(BaseAttribute):
         return is_covered
 
     def get_filter(self, policy):
-        scope_items = policy.get_attribute_values(NestedCategoricalFilter, PolicyNestedCategoricalFilter).\
-                filter(attribute_type__field_name=self.field_name,
-                       attribute_type__nested_field_name=self.nested_field_name,
-                       attribute_type__parent_field_name=self.parent_field_name,
-                       attribute_type=self
-                       )
+        scope_values = self.get_scope_values(policy)
 
         all_values_fields = []
-        if not scope_items.exists():
+        if not scope_values:
             all_values_fields = [self.field_name]
 
         # Special case: Treebeard node (including Materialized path, nested sets of adjacency lists)
-        if issubclass(self.field_type.model_class(), TreebeardNode):
+        if scope_values and issubclass(self.field_type.model_class(), MP_Node):
+            # The nodes whose path starts with the path of a node in the scope, found when the filter is applied
+            model = self.field_type.model_class()
+            scope_nodes = model.objects.filter(
+                **{f"{self.nested_field_name}__in": list(scope_values)},
+                path=Substr(OuterRef("path"), 1, Length("path")),
+            )
+            descendants = model.objects.annotate(flex_abac_in_scope=Exists(scope_nodes)).\
+                filter(flex_abac_in_scope=True).values("pk")
+            return Q(**{f"{self.field_name}__in": descendants}), all_values_fields
+        elif issubclass(self.field_type.model_class(), TreebeardNode):
             or_filter = Q()
-            for item in scope_items.values_list("value", flat=True):
+            for item in scope_values:
                 item_obj = self.field_type.model_class().objects.filter(**{self.nested_field_name: item}).first()
                 or_filter |= Q(**{f"{self.field_name}__in": self.field_type.model_class().get_tree(item_obj)})
 
             return or_filter, all_values_fields
+        elif not scope_values:
+            or_filter = Q()
         else:
-            queryset = self.field_type.model_class().objects
+            model = self.field_type.model_class()
+
+            if has_closure_table(model, self.parent_field_name):
+                descendants = get_closure_descendants_subquery(model, self.nested_field_name, list(scope_values))
+                return Q(**{f"{self.field_name}__pk__in": descendants}), all_values_fields
+
+            # The scope values and all their descendants, in a single recursive query when supported
+            descendants = get_descendants_subquery(model, self.parent_field_name, self.nested_field_name,
+                                                   list(scope_values))
+            if descendants is not None:
+                return Q(**{f"{self.field_name}__pk__in": descendants}), all_values_fields
 
-            last_level = queryset.filter(**{f"{self.nested_field_name}__in": list(scope_items.values_list("value", flat=True))})
+            queryset = model.objects
+
+            last_level = queryset.filter(**{f"{self.nested_field_name}__in": list(scope_values)})
 
             # Caution: If more than one field with the same field name (including lookup) is provided, it will perform as
             # an OR (that is, if it is accepted by one of them, it will be accepted even if it is not fulfilled for others)
-            or_filter = Q()
+            or_filter = Q(**{f"{self.field_name}__pk__in": []})
             while last_level.exists():
                 or_filter |= Q(**{f"{self.field_name}__pk__in": last_level})
                 last_level = queryset.filter(**{f"{self.parent_field_name}__in": last_level})
 
         return or_filter, all_values_fields
 
+    def is_filter_cacheable(self):
+        # Materialized paths, closure tables and recursive queries find the descendants when the filter is applied,
+        # while other treebeard nodes and the levels of the tree are resolved when it is built
+        model = ContentType.objects.get_for_id(self.field_type_id).model_class()
+        if issubclass(model, MP_Node):
+            return True
+        if issubclass(model, TreebeardNode):
+            return False
+
+        return has_closure_table(model, self.parent_field_name) or \
+            supports_recursive_queries(model, self.parent_field_name, self.nested_field_name)
+
     def does_match(self, obj, policy):
         queryset = type(obj).objects.filter(pk=obj.pk)
 
@@ -205,17 +244,46 @@ class NestedCategoricalAttribute(BaseAttribute):
 
         return queryset.filter(or_filter).exists()
 
+    def get_value_ancestors(self, value):
+        """
+        Returns a value of this attribute type and the values of all its ancestors in the tree, from the value itself
+        up to the root.
+
+        :param value: The value (i.e. the ``nested_field_name`` of a node).
+
+        :returns: list -- The values.
+        """
+        nested_model = self.field_type.model_class()
+
+        if issubclass(nested_model, TreebeardNode):
+            current_obj = nested_model.objects.get(**{f"{self.nested_field_name}": value})
+            ancestors = [getattr(current_obj, self.nested_field_name)] + \
+                        list(current_obj.get_ancestors().values_list(self.nested_field_name, flat=True))
+
+            return ancestors
+        elif has_closure_table(nested_model, self.parent_field_name):
+            return get_closure_ancestors(nested_model, self.nested_field_name, value)
+        else:
+            current_obj = nested_model.objects.get(**{f"{self.nested_field_name}": value})
+            ancestors_list = []
+            while current_obj:
+                ancestors_list.append(getattr(current_obj, self.nested_field_name))
+                current_obj = current_obj.parent
+
+            return ancestors_list
+
+    def get_policies_with_values_in_scope(self, values, policies):
+        # A value is in the scope of a policy if the value itself or any of its ancestors is, and ancestors are only
+        # loaded once per value
+        return self._filter_policies_by_scope_values([self.get_value_ancestors(value.value) for value in values],
+                                                     policies)
+
     def get_attribute_value(self, value):
         return NestedCategoricalFilter(
             value=value,
             attribute_type=self,
         )
 
-    def get_content_type(self):
-        model_generic_attribute = ModelNestedCategoricalAttribute.objects.get(attribute_type=self)
-        return ContentType.objects.get(pk=model_generic_attribute.owner_content_object.id)
-
-
     def get_values(self):
         field_path = self.find_field_in_model(as_path=True)
         model = self.get_model()
@@ -0,0 +1,109 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import models, transaction
+
+
+class NestedCategoricalClosure(models.Model):
+    """
+    Closure table of the nested categorical trees: one row per (ancestor, descendant) pair of nodes, including each
+    node as its own ancestor at depth 0.
+    """
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    ancestor_id = models.PositiveIntegerField()
+    descendant_id = models.PositiveIntegerField()
+    depth = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ("content_type", "ancestor_id", "descendant_id")
+        index_together = [("content_type", "descendant_id", "depth")]
+
+    def __str__(self):
+        return '<NestedCategoricalClosure:{}:{}-{}>'.format(self.content_type_id, self.ancestor_id, self.descendant_id)
+
+    @classmethod
+    def for_model(cls, model):
+        return cls.objects.filter(content_type=ContentType.objects.get_for_model(model))
+
+    @classmethod
+    def rebuild(cls, model, parent_field_name, batch_size=1000):
+        """
+        Rebuilds the closure table of a nested model from scratch.
+
+        :param model: The nested model.
+        :type model: django.Model
+
+        :param parent_field_name: The name of the foreign key to the parent node.
+        :type parent_field_name: str
+
+        :returns: int -- The number of rows in the closure table for that model.
+        """
+        content_type = ContentType.objects.get_for_model(model)
+        parents = dict(model.objects.values_list("pk", model._meta.get_field(parent_field_name).attname))
+
+        rows = []
+        for node_id in parents:
+            ancestor_id, depth, visited = node_id, 0, set()
+            while ancestor_id is not None and ancestor_id not in visited:
+                visited.add(ancestor_id)
+                rows.append(cls(content_type=content_type, ancestor_id=ancestor_id, descendant_id=node_id, depth=depth))
+                ancestor_id, depth = parents.get(ancestor_id), depth + 1
+
+        with transaction.atomic():
+            cls.objects.filter(content_type=content_type).delete()
+            cls.objects.bulk_create(rows, batch_size=batch_size)
+
+        return len(rows)
+
+    @classmethod
+    def add_node(cls, model, node_id, parent_id):
+        """
+        Adds a new leaf node to the closure table of a nested model.
+        """
+        content_type = ContentType.objects.get_for_model(model)
+
+        rows = [cls(content_type=content_type, ancestor_id=node_id, descendant_id=node_id, depth=0)]
+        if parent_id is not None:
+            rows += [
+                cls(content_type=content_type, ancestor_id=ancestor_id, descendant_id=node_id, depth=depth + 1)
+                for ancestor_id, depth in cls.objects.filter(content_type=content_type, descendant_id=parent_id).
+                values_list("ancestor_id", "depth")
+            ]
+
+        cls.objects.bulk_create(rows, ignore_conflicts=True)
+
+    @classmethod
+    def move_node(cls, model, node_id, parent_id):
+        """
+        Updates the closure table of a nested model after changing the parent of a node (and so, of its whole
+        subtree). Nothing is done if the parent did not change.
+        """
+        content_type = ContentType.objects.get_for_model(model)
+        closure = cls.objects.filter(content_type=content_type)
+
+        current_parent_ids = list(closure.filter(descendant_id=node_id, depth=1).values_list("ancestor_id", flat=True))
+        if current_parent_ids == ([parent_id] if parent_id is not None else []) and \
+                closure.filter(descendant_id=node_id, depth=0).exists():
+            return
+
+        subtree = dict(closure.filter(ancestor_id=node_id).values_list("descendant_id", "depth"))
+        subtree.setdefault(node_id, 0)
+        new_ancestors = list(closure.filter(descendant_id=parent_id).values_list("ancestor_id", "depth")) \
+            if parent_id is not None else []
+
+        with transaction.atomic():
+            # Paths from the previous ancestors to the subtree
+            closure.filter(descendant_id__in=subtree.keys()).exclude(ancestor_id__in=subtree.keys()).delete()
+            cls.objects.bulk_create([
+                cls(content_type=content_type, ancestor_id=ancestor_id, descendant_id=descendant_id,
+                    depth=ancestor_depth + descendant_depth + 1)
+                for ancestor_id, ancestor_depth in new_ancestors
+                for descendant_id, descendant_depth in subtree.items()
+            ] + [cls(content_type=content_type, ancestor_id=node_id, descendant_id=node_id, depth=0)],
+                ignore_conflicts=True)
+
+    @classmethod
+    def remove_node(cls, model, node_id):
+        """
+        Removes a node from the closure table of a nested model.
+        """
+        cls.for_model(model).filter(models.Q(ancestor_id=node_id) | models.Q(descendant_id=node_id)).delete()
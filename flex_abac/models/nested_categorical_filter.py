@@ -1,6 +1,5 @@
 from django.db import models
 from django.db.models import Subquery
-from treebeard.models import Node as TreebeardNode
 from flex_abac.utils.treebeard import print_node
 from .base_filter import BaseFilter
 
@@ -36,22 +35,7 @@ class NestedCategoricalFilter(BaseFilter):
 
 
     def get_ancestors(self):
-        if issubclass(self.attribute_type.field_type.model_class(), TreebeardNode):
-            queryset = self.attribute_type.field_type.model_class().objects
-            current_obj = queryset.get(**{f"{self.attribute_type.nested_field_name}": self.value})
-            ancestors = [getattr(current_obj, self.attribute_type.nested_field_name)] + \
-                        list(current_obj.get_ancestors().values_list(self.attribute_type.nested_field_name, flat=True))
-
-            return ancestors
-        else:
-            queryset = self.attribute_type.field_type.model_class().objects
-            current_obj = queryset.get(**{f"{self.attribute_type.nested_field_name}": self.value})
-            ancestors_list = []
-            while current_obj:
-                ancestors_list.append(getattr(current_obj, self.attribute_type.nested_field_name))
-                current_obj = current_obj.parent
-
-            return ancestors_list
+        return self.attribute_type.get_value_ancestors(self.value)
 
     def add_to_policy(self, policy):
         """
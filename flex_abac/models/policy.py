@@ -1,8 +1,29 @@
 from django.db import models
-from . import BaseAttribute
-from django.db.models import Subquery
+from django.db.models import Count, Subquery
 from django.db.models.query import Q
-from flex_abac.utils.helpers import get_subclasses
+
+from flex_abac.registry import get_attribute_types_for_model
+
+
+class PolicyQuerySet(models.QuerySet):
+    def with_actions(self, action_name):
+        """
+        Filters the policies including the provided action(s), through a single aggregated query: policies are joined
+        to their actions, grouped by policy, and kept only if all the requested actions are found.
+
+        :param action_name: The name of the action, or a list of names (in which case the policies should include all
+                            of them).
+        :type action_name: str, list<str>
+
+        :returns: django.db.models.QuerySet -- The matching policies.
+        """
+        action_names = set(action_name) if isinstance(action_name, (list, tuple, set, frozenset)) else {action_name}
+        if not action_names:
+            return self.all()
+
+        return self.filter(actions__name__in=action_names).\
+            annotate(matching_actions_count=Count("actions__name", distinct=True)).\
+            filter(matching_actions_count=len(action_names))
 
 
 class Policy(models.Model):
@@ -21,6 +42,8 @@ class Policy(models.Model):
         through='flex_abac.RolePolicy'
     )
 
+    objects = PolicyQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Policy'
         verbose_name_plural = 'Policies'
@@ -37,15 +60,17 @@ class Policy(models.Model):
             )
         )
 
+    def get_scope_values(self, attribute_type):
+        scopes = type(attribute_type).load_policy_scopes([self.pk], [attribute_type.pk])
+        return scopes.get(self.pk, {}).get(attribute_type.pk, [])
+
     def get_filter_for_valid_objects(self, obj_type, *args, **kwargs):
         and_filter = Q()
         all_values_fields = []
-        for attribute_type_model in get_subclasses(BaseAttribute):
-            attribute_types = attribute_type_model.get_all_to_check_for_model(obj_type)
-            for attribute_type in attribute_types:
-                current_filter, current_all_values_fields = attribute_type.get_filter(self)
-                and_filter &= current_filter
-                all_values_fields += current_all_values_fields
+        for attribute_type in get_attribute_types_for_model(obj_type):
+            current_filter, current_all_values_fields = attribute_type.get_filter(self)
+            and_filter &= current_filter
+            all_values_fields += current_all_values_fields
 
         return and_filter, all_values_fields
 
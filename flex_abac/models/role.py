@@ -22,12 +22,11 @@ class Role(models.Model):
     def get_filter_for_valid_objects(self, obj_type, action_name=None):
         or_filter = Q()
         all_values_fields = []
-        policies = self.policies
+        policies = self.policies.all()
         if action_name:
-            policies = policies.filter(action__name=action_name)
+            policies = policies.with_actions(action_name)
 
-
-        for policy in policies.all():
+        for policy in policies:
             current_filter, current_all_values_fields = policy.get_filter_for_valid_objects(obj_type)
             or_filter |= current_filter
             all_values_fields += current_all_values_fields
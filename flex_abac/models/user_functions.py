@@ -1,41 +1,48 @@
 from django.contrib.auth.models import User, AnonymousUser
-from . import UserRole, Role, Policy, Action
-from django.db.models.query import Q
+from . import Role, Policy, Action
 
+import flex_abac.snapshot
 
-def get_filter_for_valid_objects(self, obj_type, action_name=None):
-    or_filter = Q()
-    all_values_fields = []
 
-    if self.is_anonymous:
-        user_roles = UserRole.objects.exclude(user__isnull=False)
-    else:
-        user_roles = UserRole.objects.filter(user=self)
+def _get_anonymous_snapshot():
+    return flex_abac.snapshot.get_anonymous_snapshot()
 
-    for user_role in user_roles:
-        current_filter, current_all_values_fields = user_role.role.get_filter_for_valid_objects(obj_type, action_name)
-        or_filter |= current_filter
-        all_values_fields += current_all_values_fields
 
-    return or_filter, all_values_fields
+def get_filter_for_valid_objects(self, obj_type, action_name=None):
+    action_key = frozenset(action_name) if isinstance(action_name, (list, tuple, set, frozenset)) else action_name
+
+    snapshot = flex_abac.snapshot.get_authorization_snapshot(self)
+    return snapshot.get_compiled_filter(
+        ("User.get_filter_for_valid_objects", obj_type, action_key),
+        lambda: snapshot.get_filter_for_valid_objects(obj_type, action_name),
+    )
 
 
 def get_roles(self):
     if self.is_anonymous:
-        return Role.objects.filter(id__in=UserRole.objects.exclude(user__isnull=False).values("role"))
+        # The roles of the anonymous user are already known, so no subquery is needed
+        return Role.objects.filter(id__in=sorted(_get_anonymous_snapshot().role_ids))
     else:
         return Role.objects.filter(users=self)
 
 
-def get_policies(self):
+def get_policies(self, action_name=None):
     if self.is_anonymous:
-        return Policy.objects.filter(roles__in=UserRole.objects.exclude(user__isnull=False).values("role"))
+        policies = Policy.objects.filter(id__in=[policy.id for policy in _get_anonymous_snapshot().policies])
     else:
-        return Policy.objects.filter(roles__users=self)
+        policies = Policy.objects.filter(roles__users=self)
+
+    if action_name:
+        # Policies reached through several roles are repeated, so they are deduplicated before aggregating the actions
+        policies = Policy.objects.filter(pk__in=policies.values("pk")).with_actions(action_name)
+
+    return policies
 
 def get_actions(self):
     if self.is_anonymous:
-        return Action.objects.filter(policies__roles__in=UserRole.objects.exclude(user__isnull=False).values("role"))
+        return Action.objects.filter(name__in=sorted(set().union(
+            *(policy.actions for policy in _get_anonymous_snapshot().policies)
+        )))
     else:
         return Action.objects.filter(policies__roles__users=self)
 
@@ -1,8 +1,6 @@
-from flex_abac.checkers import can_user_do, is_attribute_query_in_scope_from_mapping
 from rest_framework.permissions import BasePermission
 
-from flex_abac.utils.mappings import get_mapping_from_viewset
-from flex_abac.utils.action_names import get_action_name
+from flex_abac.context import get_authorization_context
 
 from django.core.validators import ValidationError
 
@@ -28,12 +26,16 @@ class CanExecuteMethodPermission(BasePermission):
         if getattr(view, "base_lookup", None):
             obj = getattr(obj, view.base_lookup, obj)
 
+        context = get_authorization_context(request)
+        action_name = context.get_action_name(view)
+
         self.custom_error_message = f"User is not allowed access object {obj.id}!. User: {request.user}, " \
-                                    f"action_name: {get_action_name(view)}"
-        return can_user_do(get_action_name(view), obj=obj, user=request.user)
+                                    f"action_name: {action_name}"
+        return context.can_user_do(action_name, obj=obj)
 
     def has_permission(self, request, view):
-        attribute_mapping = get_mapping_from_viewset(view)
+        context = get_authorization_context(request)
+        attribute_mapping = context.get_attribute_mapping(view)
 
         try:
             # Does mapping
@@ -41,16 +43,15 @@ class CanExecuteMethodPermission(BasePermission):
                 # Checking for all the additional objects, not just the queryset
                 attribute_query_in_scope_from_mapping = True
                 for target_model in attribute_mapping.keys():
-                    if not is_attribute_query_in_scope_from_mapping(attribute_mapping=attribute_mapping[target_model],
-                                                               target_model=target_model,
-                                                               user=request.user):
+                    if not context.is_attribute_query_in_scope_from_mapping(
+                            attribute_mapping=attribute_mapping[target_model], target_model=target_model):
 
                         attribute_query_in_scope_from_mapping = False
 
                 if attribute_query_in_scope_from_mapping:
                     self.custom_error_message = f"User is not allowed to do so!. User: {request.user}, " \
-                                                f"action_name: {get_action_name(view)}"
-                    return can_user_do(get_action_name(view), user=request.user)
+                                                f"action_name: {context.get_action_name(view)}"
+                    return context.can_user_do(context.get_action_name(view))
                 else:
                     self.custom_error_message = f"Attribute query is not in the scope for the given parameters! " \
                                                 f"User: {request.user}, attribute mapping: {attribute_mapping}"
@@ -58,8 +59,8 @@ class CanExecuteMethodPermission(BasePermission):
 
             else:   # No get_attribute_mapping() provided or returns None
                 self.custom_error_message = f"User is not allowed to do so!. User: {request.user}, " \
-                                            f"action_name: {get_action_name(view)}"
-                return can_user_do(get_action_name(view), user=request.user)
+                                            f"action_name: {context.get_action_name(view)}"
+                return context.can_user_do(context.get_action_name(view))
 
         except ValidationError as ve:
             logger.warning(f"Validation error: {repr(ve)}")
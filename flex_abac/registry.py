@@ -0,0 +1,245 @@
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import FieldDoesNotExist
+
+from flex_abac.utils.cache import LRUCache, get_generation_data
+from flex_abac.utils.helpers import get_subclasses
+
+
+def _get_attribute_type_models():
+    # Resolved through the app registry, so the models can import this module
+    return get_subclasses(apps.get_model("flex_abac", "BaseAttribute"))
+
+
+class RegisteredAttribute:
+    """
+    An attribute type registered for a model, together with the path of its field in that model (as returned by
+    ``find_field_in_model``), resolved when the registry is built.
+    """
+
+    __slots__ = ("attribute_type", "model", "field_path")
+
+    def __init__(self, attribute_type, model, field_path):
+        self.attribute_type = attribute_type
+        self.model = model
+        self.field_path = field_path
+
+
+class AttributeRegistry:
+    """
+    Maps each model to the attribute types which should be checked for it, for all the attribute type classes at once.
+    """
+
+    def __init__(self, generation, attributes_per_model):
+        self.generation = generation
+        self.attributes_per_model = {
+            model: tuple(registered_attributes) for model, registered_attributes in attributes_per_model.items()
+        }
+
+    @classmethod
+    def build(cls, generation=None):
+        """
+        Loads the registry from the database.
+
+        :param generation: The permissions generation at the moment of loading the data.
+        :type generation: int
+
+        :returns: flex_abac.registry.AttributeRegistry -- The registry.
+        """
+        attributes_per_model = {}
+        for attribute_type_model in _get_attribute_type_models():
+            for model_attribute in attribute_type_model.get_model_attributes_to_check():
+                model = ContentType.objects.get_for_id(model_attribute.owner_object_id).model_class()
+                if model is None:
+                    # Stale content type
+                    continue
+                model = model._meta.concrete_model
+
+                attribute_type = model_attribute.attribute_type
+                try:
+                    field_path = attribute_type.find_field_in_model(as_path=True, model=model)
+                except FieldDoesNotExist:
+                    field_path = None
+
+                attributes_per_model.setdefault(model, []).append(
+                    RegisteredAttribute(attribute_type, model, field_path)
+                )
+
+        return cls(generation, attributes_per_model)
+
+    def get_registered_attributes(self, model):
+        """
+        Returns the attribute types registered for a model, with their resolved field paths. Proxy models share the
+        attribute types of their concrete model, as their content types do by default.
+
+        :param model: The model to check.
+        :type model: django.Model
+
+        :returns: tuple<flex_abac.registry.RegisteredAttribute> -- The registered attributes.
+        """
+        return self.attributes_per_model.get(model._meta.concrete_model, ())
+
+    def get_attribute_types(self, model):
+        """
+        Returns the attribute types which should be checked for a model.
+
+        :param model: The model to check.
+        :type model: django.Model
+
+        :returns: list<flex_abac.models.BaseAttribute> -- The attribute types.
+        """
+        return [registered_attribute.attribute_type for registered_attribute in self.get_registered_attributes(model)]
+
+
+_registry = LRUCache(maxsize=1)
+
+
+def get_attribute_registry():
+    """
+    Returns the attribute registry. It is cached in-process and rebuilt when the permission graph changes (including
+    the registration of attribute types for models, see :meth:`flex_abac.utils.cache.get_generation_data`).
+
+    :returns: flex_abac.registry.AttributeRegistry -- The registry.
+    """
+    return get_generation_data(_registry, None, AttributeRegistry.build)
+
+
+def get_attribute_types_for_model(model):
+    """
+    Shortcut to get the attribute types which should be checked for a model from the attribute registry.
+
+    :param model: The model to check.
+    :type model: django.Model
+
+    :returns: list<flex_abac.models.BaseAttribute> -- The attribute types.
+    """
+    return get_attribute_registry().get_attribute_types(model)
+
+
+class AttributeMetadata:
+    """
+    The model an attribute type applies to, together with the path and internal type of its field in that model (as
+    returned by ``find_field_in_model``), which are resolved the first time they are needed.
+    """
+
+    __slots__ = ("content_type_id", "model", "field_name", "field_path", "internal_type")
+
+    def __init__(self, content_type_id, model):
+        self.content_type_id = content_type_id
+        self.model = model
+        self.field_name = None
+        self.field_path = None
+        self.internal_type = None
+
+
+class AttributeMetadataTable:
+    """
+    Maps each attribute type (by id) to the model it applies to, loaded in a single query.
+    """
+
+    def __init__(self, generation, content_type_ids):
+        self.generation = generation
+        self.lineages = None
+        self.attributes = {}
+        for attribute_type_id, content_type_id in content_type_ids:
+            if attribute_type_id not in self.attributes:
+                model = ContentType.objects.get_for_id(content_type_id).model_class()
+                self.attributes[attribute_type_id] = AttributeMetadata(content_type_id, model)
+
+    @classmethod
+    def build(cls, generation=None):
+        """
+        Loads the table from the database.
+
+        :param generation: The permissions generation at the moment of loading the data.
+        :type generation: int
+
+        :returns: flex_abac.registry.AttributeMetadataTable -- The table.
+        """
+        links = [
+            attribute_type_model.model_attribute_model.objects.values_list("attribute_type_id", "owner_object_id")
+            for attribute_type_model in _get_attribute_type_models()
+            if attribute_type_model.model_attribute_model is not None
+        ]
+        if not links:
+            return cls(generation, [])
+
+        return cls(generation, list(links[0].union(*links[1:], all=True)))
+
+    def get_metadata(self, attribute_type):
+        """
+        Returns the metadata of an attribute type.
+
+        :param attribute_type: The attribute type.
+        :type attribute_type: flex_abac.models.BaseAttribute
+
+        :returns: flex_abac.registry.AttributeMetadata -- The metadata.
+        """
+        metadata = self.attributes.get(attribute_type.pk)
+        if metadata is None:
+            model_attribute_model = type(attribute_type).model_attribute_model or type(attribute_type)
+            raise model_attribute_model.DoesNotExist(f"{attribute_type} is not registered for any model")
+
+        return metadata
+
+    def get_content_type(self, attribute_type):
+        """
+        Returns the content type of the model an attribute type applies to.
+        """
+        return ContentType.objects.get_for_id(self.get_metadata(attribute_type).content_type_id)
+
+    def get_model(self, attribute_type):
+        """
+        Returns the model an attribute type applies to.
+        """
+        return self.get_metadata(attribute_type).model
+
+    def find_field_in_model(self, attribute_type, as_path=True):
+        """
+        Returns the path (or internal type) of the field of an attribute type in the model it applies to.
+        """
+        metadata = self.get_metadata(attribute_type)
+        if metadata.model is None:
+            # Stale content type
+            raise FieldDoesNotExist(attribute_type.field_name)
+
+        if metadata.field_name != attribute_type.field_name:
+            # Resolved again if the field name of the attribute type has changed since the last time
+            field_path = attribute_type.find_field_in_model(as_path=True, model=metadata.model)
+            internal_type = attribute_type.find_field_in_model(as_path=False, model=metadata.model)
+            metadata.field_path, metadata.internal_type = field_path, internal_type
+            metadata.field_name = attribute_type.field_name
+
+        return metadata.field_path if as_path else metadata.internal_type
+
+    def get_lineage_ids(self, attribute_type):
+        """
+        Returns the ids of the attribute types whose query values cover an attribute type: the attribute type itself
+        and, for hierarchical attribute types, its ancestors (see ``load_lineages`` in the attribute types). The
+        lineages of all the attribute types are loaded the first time they are needed.
+
+        :param attribute_type: The attribute type.
+        :type attribute_type: flex_abac.models.BaseAttribute
+
+        :returns: tuple<int> -- The ids, from the root down to the attribute type.
+        """
+        if self.lineages is None:
+            lineages = {}
+            for attribute_type_model in _get_attribute_type_models():
+                lineages.update(attribute_type_model.load_lineages())
+            self.lineages = lineages
+
+        return self.lineages.get(attribute_type.pk, (attribute_type.pk,))
+
+
+_attribute_metadata = LRUCache(maxsize=1)
+
+
+def get_attribute_metadata():
+    """
+    Returns the attribute metadata table. Like the attribute registry, it is cached in-process and rebuilt when the
+    permission graph changes.
+
+    :returns: flex_abac.registry.AttributeMetadataTable -- The table.
+    """
+    return get_generation_data(_attribute_metadata, None, AttributeMetadataTable.build)
@@ -0,0 +1,66 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+
+from flex_abac.models import (
+    Role, Policy, Action, ActionModel, UserRole, RolePolicy, PolicyAction,
+    BaseAttribute, BaseFilter,
+    PolicyGenericFilter, PolicyCategoricalFilter, PolicyNestedCategoricalFilter,
+    PolicyMaterializedNestedCategoricalFilter,
+    ModelGenericAttribute, ModelCategoricalAttribute, ModelNestedCategoricalAttribute,
+    ModelMaterializedNestedCategoricalAttribute, NestedCategoricalClosure,
+)
+from flex_abac.utils.cache import invalidate_permissions_cache
+from flex_abac.utils.helpers import get_subclasses
+from flex_abac.utils.trees import get_closure_tables
+
+
+def get_permission_graph_models():
+    """
+    Returns the models whose changes affect the effective permissions of the users.
+    """
+    return [
+        Role, Policy, Action, ActionModel, UserRole, RolePolicy, PolicyAction,
+        PolicyGenericFilter, PolicyCategoricalFilter, PolicyNestedCategoricalFilter,
+        PolicyMaterializedNestedCategoricalFilter,
+        ModelGenericAttribute, ModelCategoricalAttribute, ModelNestedCategoricalAttribute,
+        ModelMaterializedNestedCategoricalAttribute,
+        BaseAttribute, *get_subclasses(BaseAttribute),
+        BaseFilter, *get_subclasses(BaseFilter),
+    ]
+
+
+def update_closure_table(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        # Loading fixtures, closure tables should be rebuilt afterwards
+        return
+
+    parent_field_name = get_closure_tables().get(sender)
+    if parent_field_name is None:
+        return
+
+    parent_id = getattr(instance, sender._meta.get_field(parent_field_name).attname)
+    if created:
+        NestedCategoricalClosure.add_node(sender, instance.pk, parent_id)
+    else:
+        NestedCategoricalClosure.move_node(sender, instance.pk, parent_id)
+
+
+def remove_from_closure_table(sender, instance, **kwargs):
+    if sender in get_closure_tables():
+        NestedCategoricalClosure.remove_node(sender, instance.pk)
+
+
+def connect_signals():
+    for model in get_permission_graph_models():
+        post_save.connect(invalidate_permissions_cache, sender=model,
+                          dispatch_uid=f"flex_abac_post_save_{model.__name__}")
+        post_delete.connect(invalidate_permissions_cache, sender=model,
+                            dispatch_uid=f"flex_abac_post_delete_{model.__name__}")
+        # Adding/removing items through a many-to-many manager does not send post_save for the intermediate model
+        m2m_changed.connect(invalidate_permissions_cache, sender=model,
+                            dispatch_uid=f"flex_abac_m2m_changed_{model.__name__}")
+
+    for model in get_closure_tables():
+        post_save.connect(update_closure_table, sender=model,
+                          dispatch_uid=f"flex_abac_closure_post_save_{model._meta.label}")
+        post_delete.connect(remove_from_closure_table, sender=model,
+                            dispatch_uid=f"flex_abac_closure_post_delete_{model._meta.label}")
@@ -0,0 +1,265 @@
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db.models.query import Q
+
+from flex_abac.models import BaseAttribute, UserRole, RolePolicy, PolicyAction
+from flex_abac.registry import get_attribute_types_for_model
+from flex_abac.utils.cache import LRUCache, get_generation_data
+from flex_abac.utils.helpers import get_subclasses
+
+
+class CompiledPolicy:
+    """
+    In-memory representation of a policy, usable wherever the checkers expect a ``flex_abac.models.Policy``.
+    """
+
+    __slots__ = ("id", "name", "actions", "scopes", "unrestricted_models")
+
+    def __init__(self, id, name, actions, scopes):
+        self.id = id
+        self.name = name
+        self.actions = frozenset(actions)
+        self.scopes = scopes
+        self.unrestricted_models = {}
+
+    @property
+    def pk(self):
+        return self.id
+
+    def has_actions(self, action_names):
+        return self.actions.issuperset(action_names)
+
+    def get_scope_values(self, attribute_type):
+        return self.scopes.get(attribute_type.pk, [])
+
+    def is_unrestricted_for(self, model):
+        """
+        Checks whether the policy does not restrict any of the attribute types of a model (see
+        ``flex_abac.models.BaseAttribute.is_unrestricted``), in which case every instance of the model is in its scope.
+        It is computed once per model.
+
+        :param model: The model to check.
+        :type model: django.Model
+
+        :returns: bool -- True, if all the instances of the model are in the scope of the policy. False, otherwise.
+        """
+        try:
+            return self.unrestricted_models[model]
+        except KeyError:
+            unrestricted = self.unrestricted_models[model] = all(
+                attribute_type.is_unrestricted(self) for attribute_type in get_attribute_types_for_model(model)
+            )
+            return unrestricted
+
+    def get_filter_for_valid_objects(self, obj_type, *args, **kwargs):
+        and_filter = Q()
+        all_values_fields = []
+        for attribute_type in get_attribute_types_for_model(obj_type):
+            current_filter, current_all_values_fields = attribute_type.get_filter(self)
+            and_filter &= current_filter
+            all_values_fields += current_all_values_fields
+
+        return and_filter, all_values_fields
+
+    def __str__(self):
+        return '<CompiledPolicy: {}>'.format(self.name)
+
+
+class AuthorizationSnapshot:
+    """
+    Immutable view of the policies of a set of roles, including their actions and scope values.
+    """
+
+    def __init__(self, generation, role_ids, role_names, policies):
+        self.generation = generation
+        self.role_ids = frozenset(role_ids)
+        self.role_names = frozenset(role_names)
+        self.policies = tuple(policies)
+        self.compiled_filters = {}
+
+    @classmethod
+    def build(cls, user, generation=None):
+        """
+        Loads the snapshot for the provided user from the database.
+
+        :param user: The user for which the snapshot will be built.
+        :type user: django.contrib.auth.models.User, django.contrib.auth.models.AnonymousUser
+
+        :param generation: The permissions generation at the moment of loading the data.
+        :type generation: int
+
+        :returns: flex_abac.snapshot.AuthorizationSnapshot -- The snapshot.
+        """
+        return cls.build_for_roles(_load_user_roles(user), generation)
+
+    @classmethod
+    def build_for_roles(cls, roles, generation=None):
+        """
+        Loads the snapshot for a set of roles from the database.
+
+        :param roles: The names of the roles, by role id.
+        :type roles: dict<int, str>
+
+        :param generation: The permissions generation at the moment of loading the data.
+        :type generation: int
+
+        :returns: flex_abac.snapshot.AuthorizationSnapshot -- The snapshot.
+        """
+        policy_names = dict(RolePolicy.objects.filter(role_id__in=list(roles.keys())).
+                            values_list("policy_id", "policy__name"))
+        policy_ids = sorted(policy_names.keys())
+
+        policy_actions = {}
+        for policy_id, action_name in PolicyAction.objects.filter(policy_id__in=policy_ids).\
+                values_list("policy_id", "action__name"):
+            policy_actions.setdefault(policy_id, []).append(action_name)
+
+        policy_scopes = {}
+        for attribute_type_model in get_subclasses(BaseAttribute):
+            for policy_id, scopes in attribute_type_model.load_policy_scopes(policy_ids).items():
+                policy_scopes.setdefault(policy_id, {}).update(scopes)
+
+        policies = [
+            CompiledPolicy(
+                id=policy_id,
+                name=policy_names[policy_id],
+                actions=policy_actions.get(policy_id, []),
+                scopes=policy_scopes.get(policy_id, {}),
+            )
+            for policy_id in policy_ids
+        ]
+
+        return cls(generation, roles.keys(), roles.values(), policies)
+
+    def get_policies(self, action_name=None):
+        """
+        Returns the policies in the snapshot which include the provided action(s).
+
+        :param action_name: Optional. The name of the action, or a list of names (in which case the policies should
+                            include all of them). If not provided, all the policies are returned.
+        :type action_name: str, list<str>
+
+        :returns: tuple<flex_abac.snapshot.CompiledPolicy> -- The matching policies.
+        """
+        if action_name is None:
+            return self.policies
+
+        action_names = set(action_name) if isinstance(action_name, (list, tuple, set, frozenset)) else {action_name}
+        return tuple(policy for policy in self.policies if policy.has_actions(action_names))
+
+    def get_compiled_filter(self, key, compile_filter):
+        """
+        Returns a filter compiled from the policies in the snapshot (e.g. by
+        :meth:`flex_abac.checkers.get_filter_for_valid_objects`), compiling it only the first time it is requested.
+        Compiled filters live as long as the snapshot, so they are discarded when the permission graph changes.
+
+        The cache can be disabled through the ``FLEX_ABAC_FILTER_CACHE`` setting.
+
+        :param key: The key identifying the filter (e.g. the model, the action names and the base lookup).
+        :type key: tuple
+
+        :param compile_filter: Function compiling the filter.
+        :type compile_filter: callable
+
+        :returns: django.db.models.Q -- The filter. It is shared, so it should not be modified.
+        """
+        if not getattr(settings, "FLEX_ABAC_FILTER_CACHE", True):
+            return compile_filter()
+
+        try:
+            return self.compiled_filters[key]
+        except KeyError:
+            compiled_filter = self.compiled_filters[key] = compile_filter()
+            return compiled_filter
+
+    def has_unrestricted_policy(self, action_name, model):
+        """
+        Checks whether any of the policies including the provided action(s) allows every instance of a model (e.g. the
+        policies of super admins, which have no filters), so the objects do not need to be checked at all.
+
+        :param action_name: The name of the action, or a list of names.
+        :type action_name: str, list<str>
+
+        :param model: The model to check.
+        :type model: django.Model
+
+        :returns: bool -- True, if the action(s) can be done over all the instances of the model. False, otherwise.
+        """
+        return any(policy.is_unrestricted_for(model) for policy in self.get_policies(action_name))
+
+    def get_filter_for_valid_objects(self, obj_type, action_name=None):
+        or_filter = Q()
+        all_values_fields = []
+
+        for policy in self.get_policies(action_name):
+            current_filter, current_all_values_fields = policy.get_filter_for_valid_objects(obj_type)
+            or_filter |= current_filter
+            all_values_fields += current_all_values_fields
+
+        return or_filter, all_values_fields
+
+
+def _load_user_roles(user):
+    if user.is_anonymous:
+        user_roles = UserRole.objects.filter(user__isnull=True)
+    else:
+        user_roles = UserRole.objects.filter(user=user)
+    return dict(user_roles.values_list("role_id", "role__name"))
+
+
+_role_signatures = LRUCache(maxsize=getattr(settings, "FLEX_ABAC_ROLE_SIGNATURE_CACHE_SIZE", 10000))
+_snapshots = LRUCache(maxsize=getattr(settings, "FLEX_ABAC_SNAPSHOT_CACHE_SIZE", 1000))
+
+
+def _build_user_roles(user):
+    roles = _load_user_roles(user)
+    return tuple(sorted(roles)), roles
+
+
+def _get_user_roles(user):
+    return get_generation_data(_role_signatures, user.pk, lambda generation: _build_user_roles(user))
+
+
+_anonymous_snapshot = LRUCache(maxsize=1)
+
+
+def get_anonymous_snapshot():
+    """
+    Returns the authorization snapshot of the anonymous user (i.e. of the roles assigned without a user).
+
+    :returns: flex_abac.snapshot.AuthorizationSnapshot -- The snapshot.
+    """
+    return get_generation_data(_anonymous_snapshot, None,
+                               lambda generation: AuthorizationSnapshot.build(AnonymousUser(), generation))
+
+
+def get_role_signature(user):
+    """
+    Returns the role signature of a user: the sorted ids of its roles, shared by users with the same permissions.
+
+    :param user: The user.
+    :type user: django.contrib.auth.models.User, django.contrib.auth.models.AnonymousUser
+
+    :returns: tuple<int> -- The role signature.
+    """
+    if user.is_anonymous:
+        return tuple(sorted(get_anonymous_snapshot().role_ids))
+
+    return _get_user_roles(user)[0]
+
+
+def get_authorization_snapshot(user):
+    """
+    Returns the authorization snapshot of a user, shared among the users with the same role signature.
+
+    :param user: The user for which the snapshot is requested.
+    :type user: django.contrib.auth.models.User, django.contrib.auth.models.AnonymousUser
+
+    :returns: flex_abac.snapshot.AuthorizationSnapshot -- The snapshot.
+    """
+    if user.is_anonymous:
+        return get_anonymous_snapshot()
+
+    role_signature, roles = _get_user_roles(user)
+    return get_generation_data(_snapshots, role_signature,
+                               lambda generation: AuthorizationSnapshot.build_for_roles(roles, generation))
@@ -0,0 +1,255 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase, override_settings
+
+from exampleapp.models import Brand, Category, Desk, Document, Topic
+from exampleapp.tests.utils.build_category_tree import build_category_tree
+from flex_abac.factories.actionfactory import ActionFactory
+from flex_abac.factories.policyactionfactory import PolicyActionFactory
+from flex_abac.factories.policyfactory import PolicyFactory
+from flex_abac.factories.rolefactory import RoleFactory
+from flex_abac.factories.rolepolicyfactory import RolePolicyFactory
+from flex_abac.factories.userrolefactory import UserRoleFactory
+from flex_abac.models import CategoricalAttribute, CategoricalFilter, GenericAttribute, GenericFilter, \
+    ModelCategoricalAttribute, ModelGenericAttribute, ModelNestedCategoricalAttribute, NestedCategoricalAttribute, \
+    NestedCategoricalFilter, PolicyCategoricalFilter, PolicyGenericFilter, PolicyNestedCategoricalFilter
+
+
+def add_policy_to_role(role, name, scope_values=(), action_name="view"):
+    """
+    Creates a policy of the role, allowing an action over the provided scope values (filters).
+    """
+    policy = PolicyFactory.create(name=name)
+    RolePolicyFactory.create(role=role, policy=policy)
+    PolicyActionFactory.create(policy=policy, action=ActionFactory.create(name=action_name))
+    for value in scope_values:
+        value.add_to_policy(policy)
+
+    return policy
+
+
+def create_user_with_role(username):
+    """
+    Creates a user with a role of its own.
+    """
+    user = User.objects.create(username=username)
+    role = RoleFactory.create(name=username)
+    UserRoleFactory.create(user=user, role=role)
+
+    return user, role
+
+
+def create_user_with_policy(username, scope_values=(), action_name="view"):
+    """
+    Creates a user with a single policy, allowing an action over the provided scope values (filters).
+    """
+    user, role = create_user_with_role(username)
+    add_policy_to_role(role, username, scope_values, action_name=action_name)
+
+    return user
+
+
+@override_settings(FLEX_ABAC_PROCESS_CACHE=True)
+class ExampleAppTestCase(TestCase):
+    """
+    Loads the example app documents, with attributes over them and policies for a default and an admin user.
+    """
+    fixtures = ['exampleapp']
+
+    def setUp(self):
+        # Retrieving users
+        self.user_default = User.objects.get(id=1)
+        self.user_admin = User.objects.get(id=2)
+
+        # Just creates the categories by using treebeard, since it is not possible to do so directly from fixtures
+        build_category_tree()
+
+        # We create several roles (In the end, collections of policies).
+        self.role_default = RoleFactory.create(name="default")
+        self.role_default2 = RoleFactory.create(name="default2")
+        self.role_admin = RoleFactory.create(name="admin")
+
+        UserRoleFactory.create(user=self.user_default, role=self.role_default)
+        UserRoleFactory.create(user=self.user_default, role=self.role_default2)
+        UserRoleFactory.create(user=self.user_admin, role=self.role_admin)
+
+        # We create several policies (In the end, collections of actions and the associated scopes)
+        self.policy_default = PolicyFactory.create(name="default")
+        self.policy_default11 = PolicyFactory.create(name="default1.1")
+        self.policy_default12 = PolicyFactory.create(name="default1.2")
+        self.policy_default21 = PolicyFactory.create(name="default2.1")
+        self.policy_default22 = PolicyFactory.create(name="default2.2")
+        self.policy_admin = PolicyFactory.create(name="admin")
+
+        RolePolicyFactory.create(role=self.role_default, policy=self.policy_default)
+        RolePolicyFactory.create(role=self.role_default, policy=self.policy_default11)
+        RolePolicyFactory.create(role=self.role_default, policy=self.policy_default12)
+        RolePolicyFactory.create(role=self.role_default, policy=self.policy_default21)
+        RolePolicyFactory.create(role=self.role_default, policy=self.policy_default22)
+        RolePolicyFactory.create(role=self.role_admin, policy=self.policy_admin)
+
+        # Actions (defines which can be done by the user associated to a policy)
+        self.action_view = ActionFactory.create(name="view")
+        self.action_edit = ActionFactory.create(name="edit")
+
+        # Default policy can view; admin policy can view and edit
+        PolicyActionFactory.create(policy=self.policy_default, action=self.action_view)
+        PolicyActionFactory.create(policy=self.policy_admin, action=self.action_view)
+        PolicyActionFactory.create(policy=self.policy_admin, action=self.action_edit)
+
+        # Attributes. One per each class we will be using for checking (in our case, just the documents model)
+        self.brand_attribute = CategoricalAttribute.objects.create(name="Brand name", field_name="brand__name")
+        self.desk_attribute = GenericAttribute.objects.create(name="Desk name", field_name="desk__name")
+        self.datetime_attribute = GenericAttribute.objects.create(name="Document date", field_name="document_datetime__range")
+        # TODO: Try adding name__contains
+        self.topic_attribute = NestedCategoricalAttribute.objects.create(name="Topic name",
+                                                                         field_type=ContentType.objects.get_for_model(Topic),
+                                                                         field_name="topics",
+                                                                         nested_field_name="name",
+                                                                         parent_field_name="parent")
+        #  For materialized trees maintained by user:
+        self.category_attribute = NestedCategoricalAttribute.objects.create(name="Category name",
+                                                                             field_type=ContentType.objects.get_for_model(Category),
+                                                                             field_name="categories",
+                                                                             nested_field_name="name",
+                                                                             parent_field_name="parent")
+
+
+        # # For materialized trees things are slightly different. First, we need to define the relation between different levels
+        # get_subtree_attr = lambda node_id: MaterializedNestedCategoricalAttribute.objects.get(pk=node_id)
+        #
+        # region_country = MaterializedNestedCategoricalAttribute.add_root(name='Country')
+        # region_province = get_subtree_attr(region_country.pk).add_child(name='Province')
+        # region_city = get_subtree_attr(region_province.pk).add_child(name='City')
+        #
+        # self.attribute_region_levels = [region_country, region_province, region_city]
+
+
+
+        # Document content type
+        document_content_type = ContentType.objects.get_for_model(Document)
+
+        # We need to register the new attribute so it can be found later by the checkers
+        ModelCategoricalAttribute.objects.create(
+            attribute_type=self.brand_attribute,  # The attribute type (brand__name field in this case)
+            owner_content_object=document_content_type  # the content type for the Document model
+        )
+        ModelGenericAttribute.objects.create(
+            attribute_type=self.desk_attribute,  # The attribute type (desk__name field in this case)
+            owner_content_object=document_content_type  # the content type for the Document model
+        )
+        ModelGenericAttribute.objects.create(
+            attribute_type=self.datetime_attribute,  # The attribute type (document_date field in this case)
+            owner_content_object=document_content_type  # the content type for the Document model
+        )
+        ModelNestedCategoricalAttribute.objects.create(
+            attribute_type=self.topic_attribute,  # The attribute type (topic field in this case)
+            owner_content_object=document_content_type  # the content type for the Document model
+        )
+        ModelNestedCategoricalAttribute.objects.create(
+            attribute_type=self.category_attribute,  # The attribute type (category field in this case)
+            owner_content_object=document_content_type  # the content type for the Document model
+        )
+        # for tree_level in self.attribute_region_levels:
+        #     ModelMaterializedNestedCategoricalAttribute.objects.create(
+        #         attribute_type=tree_level,  # The attribute type (tree_levl field in this case)
+        #         owner_content_object=document_content_type  # the content type for the Document model
+        #     )
+
+        ##############################
+        # Attribute values definition
+        ##############################
+
+        # Values for brands (one per each of the brands we want to store)
+        # Since brands are categories without a hierarchy we are using generic values
+        # Then, there will be as many items as documents with this brand
+        self.brand_values = {}
+        for brand in Brand.objects.all():
+            self.brand_values[brand.id] = CategoricalFilter.objects.create(
+                value=brand.name,
+                attribute_type=self.brand_attribute,
+            )
+
+        # Values for desks (one per each of the desks we want to store)
+        # Since desk are categories without a hierarchy we are using generic values
+        # Then, there will be as many items as documents with this desk
+        self.desk_values = {}
+        for desk in Desk.objects.all():
+            self.desk_values[desk.id] = GenericFilter.objects.create(
+                value=desk.name,
+                attribute_type=self.desk_attribute,
+            )
+
+        # Values for document_datetime (one per each unique value on documents)
+        # We are using generic values for this
+        self.datetime_values = {}
+        for idx, document_datetime in enumerate(Document.objects.values("document_datetime").order_by("document_datetime").distinct()):
+            self.datetime_values[idx] = GenericFilter.objects.create(
+                value=(document_datetime["document_datetime"], document_datetime["document_datetime"] + timedelta(days=2)),
+                attribute_type=self.datetime_attribute,
+            )
+
+        # Values for topics (one per each of the topics in database)
+        # We are using nested categorical values for this
+        self.topic_values = {}
+        for topic in Topic.objects.all():
+            self.topic_values[topic.id] = NestedCategoricalFilter.objects.create(
+                value=topic.name,
+                attribute_type=self.topic_attribute,
+            )
+
+        # Values for categories (one per each of the categories in database)
+        # We are using nested categorical values for this
+        self.category_values = {}
+        for category in Category.objects.all():
+            self.category_values[category.name] = NestedCategoricalFilter.objects.create(
+                value=category.name,
+                attribute_type=self.category_attribute,
+            )
+
+        # Values for regions (one per each of the regions in database)
+        # We are using materialized nested categorical values for this
+        # First, we need to create the materialized tree on treebeard (which we will need to maintain when
+        # an update occurs)
+        # self.add_values_for_regions()
+
+
+        # We want default policy to have access to:
+        # - brands (1,3)
+        # - desk: 1
+        # - datetime: 0 (2021-08-04, 2021-08-06)
+        # - topics: (1.1 [2], 1.2.1 [6]) and descendants
+        # - categories: (1.1 [2], 1.2.1 [6]) and descendants
+        # - regions: (1.1 [2], 1.2.1 [6]) and descendants
+        PolicyCategoricalFilter.objects.create(policy=self.policy_default, value=self.brand_values[1])
+        PolicyCategoricalFilter.objects.create(policy=self.policy_default, value=self.brand_values[3])
+        PolicyGenericFilter.objects.create(policy=self.policy_default, value=self.desk_values[1])
+        PolicyGenericFilter.objects.create(policy=self.policy_default, value=self.datetime_values[0])
+        PolicyNestedCategoricalFilter.objects.create(policy=self.policy_default, value=self.topic_values[2])
+        PolicyNestedCategoricalFilter.objects.create(policy=self.policy_default, value=self.topic_values[6])
+        PolicyNestedCategoricalFilter.objects.create(policy=self.policy_default, value=self.category_values["Category 1.1"])
+        PolicyNestedCategoricalFilter.objects.create(policy=self.policy_default, value=self.category_values["Category 1.2.1"])
+        # TODO: Recover these after checking the get_attribute_value function
+        # PolicyMaterializedNestedCategoricalFilter.objects.create(policy=self.policy_default, value=self.region_values[2])
+        # PolicyMaterializedNestedCategoricalFilter.objects.create(policy=self.policy_default, value=self.region_values[6])
+
+        # We want admin policy to have access to:
+        # - brands (2,3)
+        # - desks (2,3)
+        # - datetime: 3 (2021-08-07 - 2021-08-09)
+        # - topics: (1.2 [5], 2.2 [7]) and descendants
+        # - categories(1.2 [5], 2.2 [7]) and descendants
+        # - regions: (1.1.2 [5], 1.2.2 [7]) and descendants
+        PolicyCategoricalFilter.objects.create(policy=self.policy_admin, value=self.brand_values[2])
+        PolicyCategoricalFilter.objects.create(policy=self.policy_admin, value=self.brand_values[3])
+        PolicyGenericFilter.objects.create(policy=self.policy_admin, value=self.desk_values[2])
+        PolicyGenericFilter.objects.create(policy=self.policy_admin, value=self.desk_values[3])
+        PolicyGenericFilter.objects.create(policy=self.policy_admin, value=self.datetime_values[3])
+        PolicyNestedCategoricalFilter.objects.create(policy=self.policy_admin, value=self.topic_values[5])
+        PolicyNestedCategoricalFilter.objects.create(policy=self.policy_admin, value=self.topic_values[7])
+        PolicyNestedCategoricalFilter.objects.create(policy=self.policy_admin, value=self.category_values["Category 1.1.2"])
+        PolicyNestedCategoricalFilter.objects.create(policy=self.policy_admin, value=self.category_values["Category 1.2.2"])
+        # PolicyMaterializedNestedCategoricalFilter.objects.create(policy=self.policy_admin, value=self.region_values[5])
+        # PolicyMaterializedNestedCategoricalFilter.objects.create(policy=self.policy_admin, value=self.region_values[7])
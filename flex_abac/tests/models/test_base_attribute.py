@@ -0,0 +1,29 @@
+from flex_abac.models import BaseAttribute, CategoricalFilter
+from flex_abac.tests.helpers import ExampleAppTestCase, add_policy_to_role, create_user_with_role
+
+
+class BaseAttributeTestCase(ExampleAppTestCase):
+    def test_empty_scopes_are_checked_in_a_single_query(self):
+        user, role = create_user_with_role("empty_scopes")
+        policy_with_brands = add_policy_to_role(role, "empty scopes with brands",
+                                                [self.topic_values[1], self.brand_values[1]])
+        policy_without_brands = add_policy_to_role(role, "empty scopes without brands", [self.topic_values[1]])
+
+        attribute_types = [self.brand_attribute, self.topic_attribute, self.desk_attribute]
+        with self.assertNumQueries(1):
+            policies_with_empty_scope = BaseAttribute.get_policies_with_empty_scope_for_user(attribute_types, user,
+                                                                                             action_name="view")
+        self.assertEqual(policies_with_empty_scope, {
+            self.brand_attribute.pk: policy_without_brands,
+            self.topic_attribute.pk: None,
+            self.desk_attribute.pk: policy_with_brands,
+        })
+
+        for attribute_type in attribute_types:
+            with self.assertNumQueries(1):
+                policy_with_empty_scope = attribute_type.is_scope_empty_for_user(type(attribute_type).policy_filter_model._meta.get_field("value").related_model,
+                                                                                 user, action_name="view")
+            self.assertEqual(policy_with_empty_scope, policies_with_empty_scope[attribute_type.pk])
+
+        # Policies of other actions are not taken into account
+        self.assertIsNone(self.brand_attribute.is_scope_empty_for_user(CategoricalFilter, user.pk, action_name="edit"))
@@ -1,10 +1,14 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from flex_abac.models import MaterializedNestedCategoricalAttribute,\
     ModelMaterializedNestedCategoricalAttribute
 from exampleapp.models import Document
 from django.contrib.contenttypes.models import ContentType
+from flex_abac.checkers import _are_all_required_attribute_types_in_query
+from flex_abac.registry import get_attribute_metadata
+from flex_abac.utils.query_values import QueryAttributeValue
 
 
+@override_settings(FLEX_ABAC_PROCESS_CACHE=True)
 class MaterializedNestedCategoricalAttributeTestCase(TestCase):
     def setUp(self):
         doc_content_type = ContentType.objects.get_for_model(Document)
@@ -56,3 +60,22 @@ class MaterializedNestedCategoricalAttributeTestCase(TestCase):
             ).values('attribute_type_id')
         )
         self.assertEqual(nested_categories.count(), 3)
+
+    def test_query_values_of_ancestors_cover_the_attribute(self):
+        region = QueryAttributeValue(self.region, "Europe")
+        office = QueryAttributeValue(self.office, "Paris")
+        # Loading the attribute registry and the lineages
+        _are_all_required_attribute_types_in_query([], Document)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_attribute_metadata().get_lineage_ids(self.employee),
+                             (self.region.pk, self.office.pk, self.employee.pk))
+            self.assertTrue(self.employee.is_represented_in_query_values([region]))
+            self.assertTrue(self.employee.is_represented_in_query_values([office]))
+            self.assertFalse(self.office.is_represented_in_query_values([QueryAttributeValue(self.employee, "Ann")]))
+
+            # Only the leaf attribute type is checked for documents
+            are_all_types_covered, missing_types = _are_all_required_attribute_types_in_query([office], Document)
+            self.assertTrue(are_all_types_covered)
+            are_all_types_covered, missing_types = _are_all_required_attribute_types_in_query([], Document)
+            self.assertEqual(missing_types, [self.employee])
@@ -1,15 +1,21 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from flex_abac.models import MaterializedNestedCategoricalFilter,\
     MaterializedNestedCategoricalAttribute, ModelMaterializedNestedCategoricalAttribute,\
     ItemMaterializedNestedCategoricalFilter
+from flex_abac.models import Policy
+from flex_abac.checkers import can_user_do, can_user_do_many, get_filter_for_valid_objects, \
+    get_query_attribute_values_from_mapping, is_attribute_query_in_scope
+from flex_abac.registry import get_attribute_registry
+from flex_abac.tests.helpers import create_user_with_policy
 from exampleapp.models import Document, Brand, Desk
 # from flex_abac.factories.documentfactory import DocumentFactory
 from django.contrib.contenttypes.models import ContentType
 from django.core.validators import ValidationError
 
-from django.db.models import Subquery
+from django.db.models import Q, Subquery
 
 
+@override_settings(FLEX_ABAC_PROCESS_CACHE=True)
 class MaterializedNestedCategoricalFilterTestCase(TestCase):
     def setUp(self):
         brand = Brand.objects.create(name="brand1")
@@ -101,3 +107,139 @@ class MaterializedNestedCategoricalFilterTestCase(TestCase):
 
 
 
+
+    def test_values_are_in_scope_of_policies_including_them_or_their_ancestors(self):
+        policy_france = Policy.objects.create(name="France")
+        self.france.add_to_policy(policy_france)
+        policy_lyon = Policy.objects.create(name="Lyon")
+        self.lyon_office.add_to_policy(policy_lyon)
+
+        # Paths change when adding sorted nodes (see node_order_by), so reloading them
+        for value in (self.france, self.portugal, self.employee_1_paris):
+            value.refresh_from_db()
+
+        self.assertTrue(self.france.is_in_policy_scope(policy_france))
+        self.assertTrue(self.employee_1_paris.is_in_policy_scope(policy_france))
+        self.assertFalse(self.portugal.is_in_policy_scope(policy_france))
+        self.assertFalse(self.france.is_in_policy_scope(policy_lyon))
+        self.assertFalse(self.employee_1_paris.is_in_policy_scope(policy_lyon))
+
+    def test_objects_match_policies_including_their_values_or_ancestors(self):
+        policy_paris = Policy.objects.create(name="Paris")
+        self.paris_office.add_to_policy(policy_paris)
+        policy_portugal = Policy.objects.create(name="Portugal")
+        self.portugal.add_to_policy(policy_portugal)
+
+        ItemMaterializedNestedCategoricalFilter.objects.create(value=self.employee_2_paris,
+                                                               owner_content_object=self.doc1)
+
+        self.assertTrue(self.employee.does_match(self.doc1, policy_paris))
+        self.assertFalse(self.employee.does_match(self.doc1, policy_portugal))
+
+        # Scope values are retrieved once per attribute type in the tree, then a single query per object is needed
+        self.employee.get_lineage()
+        with self.assertNumQueries(4):
+            self.employee.does_match(self.doc1, policy_paris)
+
+    def test_filter_selects_objects_tagged_with_values_in_scope_or_their_descendants(self):
+        policy_paris = Policy.objects.create(name="Paris")
+        self.paris_office.add_to_policy(policy_paris)
+        policy_portugal = Policy.objects.create(name="Portugal")
+        self.portugal.add_to_policy(policy_portugal)
+
+        doc2 = Document.objects.create(filename="doc2", brand=self.doc1.brand, desk=self.doc1.desk)
+        ItemMaterializedNestedCategoricalFilter.objects.create(value=self.employee_2_paris,
+                                                               owner_content_object=self.doc1)
+        # Items of other models are ignored, even if they have the same object id
+        ItemMaterializedNestedCategoricalFilter.objects.create(value=self.employee_1_paris,
+                                                               owner_content_object=self.doc1.brand)
+
+        paris_filter, all_values_fields = self.employee.get_filter(policy_paris)
+        self.assertEqual(all_values_fields, [])
+        self.assertEqual(list(Document.objects.filter(paris_filter)), [self.doc1])
+
+        portugal_filter, _ = self.employee.get_filter(policy_portugal)
+        self.assertEqual(list(Document.objects.filter(portugal_filter)), [])
+
+        self.assertEqual(list(Document.objects.filter(paris_filter | Q(pk=doc2.pk)).order_by("pk")),
+                         [self.doc1, doc2])
+
+    def test_objects_are_tagged_and_untagged_in_bulk(self):
+        doc2 = Document.objects.create(filename="doc2", brand=self.doc1.brand, desk=self.doc1.desk)
+        items = ItemMaterializedNestedCategoricalFilter.objects
+
+        with self.assertNumQueries(2):
+            ItemMaterializedNestedCategoricalFilter.tag_objects({
+                self.doc1: [self.employee_1_paris, self.employee_2_paris],
+                doc2: [self.employee_1_paris.pk],
+            }, batch_size=2)
+        self.assertEqual(items.count(), 3)
+
+        # Existing tags are ignored
+        ItemMaterializedNestedCategoricalFilter.tag_objects([(self.doc1, self.employee_1_paris)])
+        self.assertEqual(items.count(), 3)
+
+        self.assertEqual(ItemMaterializedNestedCategoricalFilter.untag_objects([self.doc1, doc2],
+                                                                               values=[self.employee_1_paris]), 2)
+        self.assertEqual(list(items.values_list("owner_object_id", "value_id")),
+                         [(self.doc1.pk, self.employee_2_paris.pk)])
+
+        self.assertEqual(ItemMaterializedNestedCategoricalFilter.untag_objects([self.doc1]), 1)
+        self.assertFalse(items.exists())
+
+    @override_settings(FLEX_ABAC_DECISION_CACHE=True)
+    def test_tagging_in_bulk_invalidates_cached_decisions(self):
+        user = create_user_with_policy("paris", [self.paris_office])
+        ItemMaterializedNestedCategoricalFilter.untag_objects([self.doc1])
+        self.assertFalse(can_user_do("view", self.doc1, user))
+
+        ItemMaterializedNestedCategoricalFilter.tag_objects([(self.doc1, self.employee_1_paris)])
+        self.assertTrue(can_user_do("view", self.doc1, user))
+
+        ItemMaterializedNestedCategoricalFilter.untag_objects([self.doc1])
+        self.assertFalse(can_user_do("view", self.doc1, user))
+
+    def test_query_values_are_checked_by_path(self):
+        self.employee.field_name = "employee"
+        self.employee.save()
+        user = create_user_with_policy("paris", [self.paris_office])
+        self.employee_1_paris.refresh_from_db()
+        get_attribute_registry()
+
+        # A single query retrieves the paths of all the values
+        with self.assertNumQueries(1):
+            query_values = get_query_attribute_values_from_mapping(
+                {"employee": ["Employee 1 (Paris)", "Unknown employee"]}, Document
+            )
+        self.assertEqual([query_value.path for query_value in query_values], [self.employee_1_paris.path, ""])
+
+        self.assertTrue(is_attribute_query_in_scope(query_values[:1], Document, user))
+        self.assertFalse(is_attribute_query_in_scope(query_values, Document, user))
+        self.assertTrue(query_values[0].is_in_policy_scope(Policy.objects.get(name="paris")))
+        self.assertFalse(query_values[1].is_in_policy_scope(Policy.objects.get(name="paris")))
+
+    def test_bulk_checks_match_single_object_checks(self):
+        doc2 = Document.objects.create(filename="doc2", brand=self.doc1.brand, desk=self.doc1.desk)
+        doc3 = Document.objects.create(filename="doc3", brand=self.doc1.brand, desk=self.doc1.desk)
+        employee_lyon = MaterializedNestedCategoricalFilter.objects.get(pk=self.lyon_office.pk).add_child(
+            value="Employee 1 (Lyon)",
+            attribute_type=self.employee
+        )
+        ItemMaterializedNestedCategoricalFilter.tag_objects([(self.doc1, self.employee_2_paris),
+                                                             (doc2, employee_lyon)])
+        documents = [self.doc1, doc2, doc3]
+
+        users_and_expected_decisions = [
+            (create_user_with_policy("empty", []), [False, False, False]),
+            (create_user_with_policy("paris", [self.paris_office]), [True, False, False]),
+            (create_user_with_policy("france", [self.france]), [True, True, False]),
+        ]
+
+        for user, expected_decisions in users_and_expected_decisions:
+            self.assertEqual([can_user_do("view", obj=document, user=user) for document in documents],
+                             expected_decisions)
+            self.assertEqual(can_user_do_many("view", documents, user=user), expected_decisions)
+            self.assertEqual(
+                list(Document.objects.filter(get_filter_for_valid_objects(user, Document)).order_by("pk")),
+                [document for document, decision in zip(documents, expected_decisions) if decision]
+            )
@@ -0,0 +1,107 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from exampleapp.models import Category, Document, Documentcategories, Documenttopics, Topic
+from flex_abac.checkers import get_filter_for_valid_objects
+from flex_abac.factories.policyfactory import PolicyFactory
+from flex_abac.models import NestedCategoricalFilter, PolicyNestedCategoricalFilter
+from flex_abac.tests.helpers import ExampleAppTestCase
+from flex_abac.utils.trees import get_descendants_subquery
+
+
+class NestedCategoricalAttributeTestCase(ExampleAppTestCase):
+    def test_nested_attribute_filter_is_the_same_with_recursive_queries(self):
+        for policy in (self.policy_default, self.policy_admin):
+            with CaptureQueriesContext(connection) as recursive_queries:
+                recursive_filter, _ = self.topic_attribute.get_filter(policy)
+            recursive_documents = set(Document.objects.filter(recursive_filter).values_list("pk", flat=True))
+
+            with self.settings(FLEX_ABAC_USE_RECURSIVE_QUERIES=False):
+                iterative_filter, _ = self.topic_attribute.get_filter(policy)
+            iterative_documents = set(Document.objects.filter(iterative_filter).values_list("pk", flat=True))
+
+            # Just retrieving the scope values, the descendants are found by the recursive subquery
+            self.assertEqual(len(recursive_queries), 1)
+            self.assertTrue(recursive_documents)
+            self.assertEqual(recursive_documents, iterative_documents)
+
+    def test_nested_attribute_filter_is_the_same_with_closure_tables(self):
+        with self.settings(FLEX_ABAC_CLOSURE_TABLES={"exampleapp.Topic": "parent"}):
+            call_command("build_closure_tables", stdout=StringIO())
+
+            for policy in (self.policy_default, self.policy_admin):
+                closure_filter, _ = self.topic_attribute.get_filter(policy)
+                self.assertEqual(
+                    set(Document.objects.filter(closure_filter)),
+                    set(Document.objects.filter(
+                        topics__pk__in=get_descendants_subquery(Topic, "parent", "name",
+                                                                self.topic_attribute.get_scope_values(policy))
+                    )),
+                )
+
+            self.assertEqual(self.topic_values[6].get_ancestors(), ["Topic 1.2.1", "Topic 1.2", "Topic 1"])
+
+    def test_nested_attribute_filter_does_not_match_unknown_values(self):
+        policy = PolicyFactory.create(name="unknown topic")
+        PolicyNestedCategoricalFilter.objects.create(
+            policy=policy,
+            value=NestedCategoricalFilter.objects.create(value="Unknown topic", attribute_type=self.topic_attribute),
+        )
+
+        for use_recursive_queries in (True, False):
+            with self.settings(FLEX_ABAC_USE_RECURSIVE_QUERIES=use_recursive_queries):
+                scope_filter, _ = self.topic_attribute.get_filter(policy)
+                self.assertFalse(Document.objects.filter(scope_filter).exists())
+
+    def test_materialized_path_nodes_are_matched_by_path_prefix(self):
+        for policy in (self.policy_default, self.policy_admin):
+            scope_filter, _ = self.category_attribute.get_filter(policy)
+            scope_categories = [Category.objects.get(name=name)
+                                for name in self.category_attribute.get_scope_values(policy)]
+            self.assertEqual(
+                set(Document.objects.filter(scope_filter)),
+                set(Document.objects.filter(categories__in=[descendant for category in scope_categories
+                                                            for descendant in Category.get_tree(category)])),
+            )
+
+        # Nodes are found when the filter is applied, so it includes the nodes added afterwards
+        scope_filter, _ = self.category_attribute.get_filter(self.policy_admin)
+        new_category = Category.objects.get(name="Category 1.1.2").add_child(name="Category 1.1.2.1")
+        document = Document.objects.exclude(scope_filter).first()
+        Documentcategories.objects.create(document=document, category=new_category)
+        self.assertIn(document, Document.objects.filter(scope_filter))
+
+        # Scope values without a node do not match any object (instead of the whole tree)
+        policy = PolicyFactory.create(name="unknown category")
+        PolicyNestedCategoricalFilter.objects.create(
+            policy=policy,
+            value=NestedCategoricalFilter.objects.create(value="Unknown category",
+                                                         attribute_type=self.category_attribute),
+        )
+        scope_filter, _ = self.category_attribute.get_filter(policy)
+        self.assertFalse(Document.objects.filter(scope_filter).exists())
+
+    def test_filter_for_valid_objects_follows_changes_in_nested_trees(self):
+        self.assertTrue(self.category_attribute.is_filter_cacheable())
+        self.assertTrue(self.topic_attribute.is_filter_cacheable())
+
+        with self.settings(FLEX_ABAC_USE_RECURSIVE_QUERIES=False):
+            # Levels of the tree are resolved when building the filter
+            self.assertFalse(self.topic_attribute.is_filter_cacheable())
+
+            valid_documents = Document.objects.filter(get_filter_for_valid_objects(self.user_admin, Document))
+            document = valid_documents.first()
+            self.assertIsNotNone(document)
+
+            # New levels below "Topic 1.1.2" and "Category 1.1.2", which are in the scope of the admin policy
+            new_topic = Topic.objects.create(name="Topic 1.1.2.1", parent_id=5)
+            Documenttopics.objects.filter(document=document).delete()
+            Documenttopics.objects.create(document=document, topic=new_topic)
+            new_category = Category.objects.get(name="Category 1.1.2").add_child(name="Category 1.1.2.1")
+            Documentcategories.objects.filter(document=document).delete()
+            Documentcategories.objects.create(document=document, category=new_category)
+
+            self.assertIn(document, Document.objects.filter(get_filter_for_valid_objects(self.user_admin, Document)))
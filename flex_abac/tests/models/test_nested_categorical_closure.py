@@ -0,0 +1,65 @@
+from io import StringIO
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.test import TestCase
+from exampleapp.models import Topic
+
+from flex_abac.models import NestedCategoricalClosure
+from flex_abac.signals import connect_signals
+from flex_abac.utils.trees import get_closure_descendants_subquery, get_closure_ancestors, get_descendants_subquery
+
+
+CLOSURE_TABLES = {"exampleapp.Topic": "parent"}
+
+
+class NestedCategoricalClosureTestCase(TestCase):
+    fixtures = ['exampleapp']
+
+    def setUp(self):
+        with self.settings(FLEX_ABAC_CLOSURE_TABLES=CLOSURE_TABLES):
+            connect_signals()
+            call_command("build_closure_tables", stdout=StringIO())
+
+    def assertClosureIsConsistent(self):
+        for topic in Topic.objects.all():
+            self.assertEqual(
+                set(Topic.objects.filter(pk__in=get_closure_descendants_subquery(Topic, "name", [topic.name]))),
+                set(Topic.objects.filter(pk__in=get_descendants_subquery(Topic, "parent", "name", [topic.name]))),
+            )
+
+            ancestors = []
+            current_topic = topic
+            while current_topic:
+                ancestors.append(current_topic.name)
+                current_topic = current_topic.parent
+            with self.assertNumQueries(1):
+                self.assertEqual(get_closure_ancestors(Topic, "name", topic.name), ancestors)
+
+    def test_closure_table_is_built(self):
+        self.assertTrue(NestedCategoricalClosure.for_model(Topic).filter(depth__gt=0).exists())
+        self.assertEqual(NestedCategoricalClosure.for_model(Topic).filter(depth=0).count(), Topic.objects.count())
+        self.assertClosureIsConsistent()
+
+    def test_closure_table_is_maintained(self):
+        with self.settings(FLEX_ABAC_CLOSURE_TABLES=CLOSURE_TABLES):
+            root = Topic.objects.filter(parent__isnull=True).first()
+            new_topic = Topic.objects.create(name="New topic", parent=root)
+            Topic.objects.create(name="New subtopic", parent=new_topic)
+            self.assertClosureIsConsistent()
+
+            # Moving a subtree
+            new_topic.parent = Topic.objects.filter(parent__isnull=False).exclude(pk=new_topic.pk).first()
+            new_topic.save()
+            self.assertClosureIsConsistent()
+
+            new_topic.parent = None
+            new_topic.save()
+            self.assertClosureIsConsistent()
+
+            root_id = root.pk
+            root.delete()
+            self.assertClosureIsConsistent()
+            self.assertFalse(NestedCategoricalClosure.objects.filter(
+                content_type=ContentType.objects.get_for_model(Topic), ancestor_id=root_id
+            ).exists())
@@ -0,0 +1,20 @@
+from flex_abac.checkers import can_user_do
+from flex_abac.models import Policy
+from flex_abac.tests.helpers import ExampleAppTestCase
+
+
+class PolicyTestCase(ExampleAppTestCase):
+    def test_multiple_actions_are_checked_with_a_single_aggregated_query(self):
+        action_names = ["view", "edit"]
+
+        with self.assertNumQueries(1):
+            self.assertEqual(list(Policy.objects.with_actions(action_names)), [self.policy_admin])
+        with self.assertNumQueries(1):
+            self.assertEqual(list(self.user_admin.get_policies(action_names)), [self.policy_admin])
+        self.assertFalse(self.user_default.get_policies(action_names).exists())
+
+        # The list provided by the caller is not modified, so repeated checks give the same answer
+        for _ in range(2):
+            self.assertTrue(can_user_do(action_names, user=self.user_admin))
+            self.assertFalse(can_user_do(action_names, user=self.user_default))
+        self.assertEqual(action_names, ["view", "edit"])
@@ -1,5 +1,7 @@
 import os
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from exampleapp.models import (
     Brand, Document, Documenttopics, Desk, Topic, Region, Category, Documentregions
 )
@@ -24,209 +26,13 @@ from flex_abac.models import UserRole, Policy, RolePolicy, \
     PolicyNestedCategoricalFilter, PolicyMaterializedNestedCategoricalFilter,\
     ModelNestedCategoricalAttribute, ModelMaterializedNestedCategoricalAttribute, \
     ItemMaterializedNestedCategoricalFilter
-from flex_abac.checkers import is_object_in_scope, can_user_do, \
+from flex_abac.checkers import is_object_in_scope, can_user_do, can_user_do_many, \
     is_attribute_query_in_scope, list_valid_objects, get_filter_for_valid_objects
-from exampleapp.tests.utils.build_category_tree import build_category_tree
-
-class CheckersTestCase(TestCase):
-    fixtures = ['exampleapp']
-
-    def setUp(self):
-        # Retrieving users
-        self.user_default = User.objects.get(id=1)
-        self.user_admin = User.objects.get(id=2)
-
-        # Just creates the categories by using treebeard, since it is not possible to do so directly from fixtures
-        build_category_tree()
-
-        # We create several roles (In the end, collections of policies).
-        self.role_default = RoleFactory.create(name="default")
-        self.role_default2 = RoleFactory.create(name="default2")
-        self.role_admin = RoleFactory.create(name="admin")
-
-        UserRoleFactory.create(user=self.user_default, role=self.role_default)
-        UserRoleFactory.create(user=self.user_default, role=self.role_default2)
-        UserRoleFactory.create(user=self.user_admin, role=self.role_admin)
-
-        # We create several policies (In the end, collections of actions and the associated scopes)
-        self.policy_default = PolicyFactory.create(name="default")
-        self.policy_default11 = PolicyFactory.create(name="default1.1")
-        self.policy_default12 = PolicyFactory.create(name="default1.2")
-        self.policy_default21 = PolicyFactory.create(name="default2.1")
-        self.policy_default22 = PolicyFactory.create(name="default2.2")
-        self.policy_admin = PolicyFactory.create(name="admin")
-
-        RolePolicyFactory.create(role=self.role_default, policy=self.policy_default)
-        RolePolicyFactory.create(role=self.role_default, policy=self.policy_default11)
-        RolePolicyFactory.create(role=self.role_default, policy=self.policy_default12)
-        RolePolicyFactory.create(role=self.role_default, policy=self.policy_default21)
-        RolePolicyFactory.create(role=self.role_default, policy=self.policy_default22)
-        RolePolicyFactory.create(role=self.role_admin, policy=self.policy_admin)
-
-        # Actions (defines which can be done by the user associated to a policy)
-        self.action_view = ActionFactory.create(name="view")
-        self.action_edit = ActionFactory.create(name="edit")
-
-        # Default policy can view; admin policy can view and edit
-        PolicyActionFactory.create(policy=self.policy_default, action=self.action_view)
-        PolicyActionFactory.create(policy=self.policy_admin, action=self.action_view)
-        PolicyActionFactory.create(policy=self.policy_admin, action=self.action_edit)
-
-        # Attributes. One per each class we will be using for checking (in our case, just the documents model)
-        self.brand_attribute = CategoricalAttribute.objects.create(name="Brand name", field_name="brand__name")
-        self.desk_attribute = GenericAttribute.objects.create(name="Desk name", field_name="desk__name")
-        self.datetime_attribute = GenericAttribute.objects.create(name="Document date", field_name="document_datetime__range")
-        # TODO: Try adding name__contains
-        self.topic_attribute = NestedCategoricalAttribute.objects.create(name="Topic name",
-                                                                         field_type=ContentType.objects.get_for_model(Topic),
-                                                                         field_name="topics",
-                                                                         nested_field_name="name",
-                                                                         parent_field_name="parent")
-        #  For materialized trees maintained by user:
-        self.category_attribute = NestedCategoricalAttribute.objects.create(name="Category name",
-                                                                             field_type=ContentType.objects.get_for_model(Category),
-                                                                             field_name="categories",
-                                                                             nested_field_name="name",
-                                                                             parent_field_name="parent")
-
-
-        # # For materialized trees things are slightly different. First, we need to define the relation between different levels
-        # get_subtree_attr = lambda node_id: MaterializedNestedCategoricalAttribute.objects.get(pk=node_id)
-        #
-        # region_country = MaterializedNestedCategoricalAttribute.add_root(name='Country')
-        # region_province = get_subtree_attr(region_country.pk).add_child(name='Province')
-        # region_city = get_subtree_attr(region_province.pk).add_child(name='City')
-        #
-        # self.attribute_region_levels = [region_country, region_province, region_city]
-
-
-
-        # Document content type
-        document_content_type = ContentType.objects.get_for_model(Document)
-
-        # We need to register the new attribute so it can be found later by the checkers
-        ModelCategoricalAttribute.objects.create(
-            attribute_type=self.brand_attribute,  # The attribute type (brand__name field in this case)
-            owner_content_object=document_content_type  # the content type for the Document model
-        )
-        ModelGenericAttribute.objects.create(
-            attribute_type=self.desk_attribute,  # The attribute type (desk__name field in this case)
-            owner_content_object=document_content_type  # the content type for the Document model
-        )
-        ModelGenericAttribute.objects.create(
-            attribute_type=self.datetime_attribute,  # The attribute type (document_date field in this case)
-            owner_content_object=document_content_type  # the content type for the Document model
-        )
-        ModelNestedCategoricalAttribute.objects.create(
-            attribute_type=self.topic_attribute,  # The attribute type (topic field in this case)
-            owner_content_object=document_content_type  # the content type for the Document model
-        )
-        ModelNestedCategoricalAttribute.objects.create(
-            attribute_type=self.category_attribute,  # The attribute type (category field in this case)
-            owner_content_object=document_content_type  # the content type for the Document model
-        )
-        # for tree_level in self.attribute_region_levels:
-        #     ModelMaterializedNestedCategoricalAttribute.objects.create(
-        #         attribute_type=tree_level,  # The attribute type (tree_levl field in this case)
-        #         owner_content_object=document_content_type  # the content type for the Document model
-        #     )
-
-        ##############################
-        # Attribute values definition
-        ##############################
-
-        # Values for brands (one per each of the brands we want to store)
-        # Since brands are categories without a hierarchy we are using generic values
-        # Then, there will be as many items as documents with this brand
-        self.brand_values = {}
-        for brand in Brand.objects.all():
-            self.brand_values[brand.id] = CategoricalFilter.objects.create(
-                value=brand.name,
-                attribute_type=self.brand_attribute,
-            )
-
-        # Values for desks (one per each of the desks we want to store)
-        # Since desk are categories without a hierarchy we are using generic values
-        # Then, there will be as many items as documents with this desk
-        self.desk_values = {}
-        for desk in Desk.objects.all():
-            self.desk_values[desk.id] = GenericFilter.objects.create(
-                value=desk.name,
-                attribute_type=self.desk_attribute,
-            )
-
-        # Values for document_datetime (one per each unique value on documents)
-        # We are using generic values for this
-        self.datetime_values = {}
-        for idx, document_datetime in enumerate(Document.objects.values("document_datetime").order_by("document_datetime").distinct()):
-            self.datetime_values[idx] = GenericFilter.objects.create(
-                value=(document_datetime["document_datetime"], document_datetime["document_datetime"] + timedelta(days=2)),
-                attribute_type=self.datetime_attribute,
-            )
+from flex_abac.snapshot import get_authorization_snapshot
+from flex_abac.tests.helpers import ExampleAppTestCase
 
-        # Values for topics (one per each of the topics in database)
-        # We are using nested categorical values for this
-        self.topic_values = {}
-        for topic in Topic.objects.all():
-            self.topic_values[topic.id] = NestedCategoricalFilter.objects.create(
-                value=topic.name,
-                attribute_type=self.topic_attribute,
-            )
-
-        # Values for categories (one per each of the categories in database)
-        # We are using nested categorical values for this
-        self.category_values = {}
-        for category in Category.objects.all():
-            self.category_values[category.name] = NestedCategoricalFilter.objects.create(
-                value=category.name,
-                attribute_type=self.category_attribute,
-            )
-
-        # Values for regions (one per each of the regions in database)
-        # We are using materialized nested categorical values for this
-        # First, we need to create the materialized tree on treebeard (which we will need to maintain when
-        # an update occurs)
-        # self.add_values_for_regions()
-
-
-        # We want default policy to have access to:
-        # - brands (1,3)
-        # - desk: 1
-        # - datetime: 0 (2021-08-04, 2021-08-06)
-        # - topics: (1.1 [2], 1.2.1 [6]) and descendants
-        # - categories: (1.1 [2], 1.2.1 [6]) and descendants
-        # - regions: (1.1 [2], 1.2.1 [6]) and descendants
-        PolicyCategoricalFilter.objects.create(policy=self.policy_default, value=self.brand_values[1])
-        PolicyCategoricalFilter.objects.create(policy=self.policy_default, value=self.brand_values[3])
-        PolicyGenericFilter.objects.create(policy=self.policy_default, value=self.desk_values[1])
-        PolicyGenericFilter.objects.create(policy=self.policy_default, value=self.datetime_values[0])
-        PolicyNestedCategoricalFilter.objects.create(policy=self.policy_default, value=self.topic_values[2])
-        PolicyNestedCategoricalFilter.objects.create(policy=self.policy_default, value=self.topic_values[6])
-        PolicyNestedCategoricalFilter.objects.create(policy=self.policy_default, value=self.category_values["Category 1.1"])
-        PolicyNestedCategoricalFilter.objects.create(policy=self.policy_default, value=self.category_values["Category 1.2.1"])
-        # TODO: Recover these after checking the get_attribute_value function
-        # PolicyMaterializedNestedCategoricalFilter.objects.create(policy=self.policy_default, value=self.region_values[2])
-        # PolicyMaterializedNestedCategoricalFilter.objects.create(policy=self.policy_default, value=self.region_values[6])
-
-        # We want admin policy to have access to:
-        # - brands (2,3)
-        # - desks (2,3)
-        # - datetime: 3 (2021-08-07 - 2021-08-09)
-        # - topics: (1.2 [5], 2.2 [7]) and descendants
-        # - categories(1.2 [5], 2.2 [7]) and descendants
-        # - regions: (1.1.2 [5], 1.2.2 [7]) and descendants
-        PolicyCategoricalFilter.objects.create(policy=self.policy_admin, value=self.brand_values[2])
-        PolicyCategoricalFilter.objects.create(policy=self.policy_admin, value=self.brand_values[3])
-        PolicyGenericFilter.objects.create(policy=self.policy_admin, value=self.desk_values[2])
-        PolicyGenericFilter.objects.create(policy=self.policy_admin, value=self.desk_values[3])
-        PolicyGenericFilter.objects.create(policy=self.policy_admin, value=self.datetime_values[3])
-        PolicyNestedCategoricalFilter.objects.create(policy=self.policy_admin, value=self.topic_values[5])
-        PolicyNestedCategoricalFilter.objects.create(policy=self.policy_admin, value=self.topic_values[7])
-        PolicyNestedCategoricalFilter.objects.create(policy=self.policy_admin, value=self.category_values["Category 1.1.2"])
-        PolicyNestedCategoricalFilter.objects.create(policy=self.policy_admin, value=self.category_values["Category 1.2.2"])
-        # PolicyMaterializedNestedCategoricalFilter.objects.create(policy=self.policy_admin, value=self.region_values[5])
-        # PolicyMaterializedNestedCategoricalFilter.objects.create(policy=self.policy_admin, value=self.region_values[7])
 
+class CheckersTestCase(ExampleAppTestCase):
     def add_values_for_regions(self):
         """
         Constructs the list of values per region from the TreeBeard table (materialized)
@@ -480,4 +286,76 @@ class CheckersTestCase(TestCase):
             )
             assert True
         except ValidationError: # how to be more specific, we only want to check for missing_attrs validationerror
-            assert False
\ No newline at end of file
+            assert False
+
+    def test_can_user_do_many_matches_can_user_do(self):
+        documents = list(Document.objects.all())
+
+        for user in (self.user_default, self.user_admin):
+            for action_name in ("view", "edit"):
+                self.assertEqual(can_user_do_many(action_name, documents, user=user),
+                                 [can_user_do(action_name, obj=document, user=user) for document in documents])
+
+    def test_can_user_do_many_query_count_does_not_depend_on_the_number_of_objects(self):
+        documents = list(Document.objects.all())
+        # Loading the cached permissions and attribute registry
+        can_user_do_many("view", documents[:1], user=self.user_admin)
+
+        with CaptureQueriesContext(connection) as few_objects_queries:
+            can_user_do_many("view", documents[:2], user=self.user_admin)
+        with CaptureQueriesContext(connection) as all_objects_queries:
+            can_user_do_many("view", documents, user=self.user_admin)
+
+        self.assertEqual(len(few_objects_queries), len(all_objects_queries))
+
+    def test_filter_for_valid_objects_is_compiled_once_until_permissions_change(self):
+        valid_filter = get_filter_for_valid_objects(self.user_default, Document, action_name="view")
+
+        with self.assertNumQueries(0):
+            self.assertIs(get_filter_for_valid_objects(self.user_default, Document, action_name="view"), valid_filter)
+        self.assertIsNot(get_filter_for_valid_objects(self.user_default, Document, base_lookup_name="document",
+                                                      action_name="view"), valid_filter)
+
+        with self.settings(FLEX_ABAC_FILTER_CACHE=False):
+            self.assertIsNot(get_filter_for_valid_objects(self.user_default, Document, action_name="view"),
+                             valid_filter)
+
+        PolicyCategoricalFilter.objects.create(policy=self.policy_default, value=self.brand_values[2])
+
+        new_valid_filter = get_filter_for_valid_objects(self.user_default, Document, action_name="view")
+        self.assertNotEqual(new_valid_filter, valid_filter)
+        self.assertEqual(
+            set(Document.objects.filter(new_valid_filter)),
+            set(Document.objects.filter(get_filter_for_valid_objects(self.policy_default, Document))),
+        )
+
+    def test_attribute_query_is_checked_in_batch(self):
+        snapshot = get_authorization_snapshot(self.user_default)
+        policies = list(snapshot.get_policies())
+
+        queries = [
+            [self.brand_attribute.get_attribute_value(self.brand_values[brand_id].value) for brand_id in brand_ids] +
+            [self.topic_attribute.get_attribute_value(self.topic_values[topic_id].value) for topic_id in topic_ids]
+            for brand_ids, topic_ids in (
+                ((1,), ()), ((1, 3), ()), ((1, 2), ()), ((), (2,)), ((), (6,)), ((), (1,)), ((3,), (2, 6)), ((2,), (2,)),
+            )
+        ]
+        for query_attribute_values in queries:
+            # Same result as checking each value against each policy
+            self.assertEqual(
+                is_attribute_query_in_scope(query_attribute_values, Document, snapshot=snapshot),
+                any(all(value.is_in_policy_scope(policy) for value in query_attribute_values) for policy in policies),
+            )
+
+        # Scope values are taken from the snapshot, so only the ancestors of nested values are loaded, once per value
+        brand_values = [self.brand_attribute.get_attribute_value(value.value) for value in self.brand_values.values()]
+        with self.assertNumQueries(0):
+            is_attribute_query_in_scope(brand_values, Document, snapshot=snapshot)
+
+        topic_values = [self.topic_attribute.get_attribute_value(self.topic_values[topic_id].value)
+                        for topic_id in (2, 6)]
+        with CaptureQueriesContext(connection) as context:
+            for value in topic_values:
+                value.get_ancestors()
+        with self.assertNumQueries(len(context.captured_queries)):
+            is_attribute_query_in_scope(brand_values[:1] + topic_values, Document, snapshot=snapshot)
@@ -0,0 +1,44 @@
+from django.test import RequestFactory
+
+from exampleapp.models import Document
+from flex_abac.checkers import can_user_do, get_filter_for_valid_objects
+from flex_abac.context import get_authorization_context
+from flex_abac.tests.helpers import ExampleAppTestCase
+
+
+class AuthorizationContextTestCase(ExampleAppTestCase):
+    def test_authorization_context_is_shared_during_the_request(self):
+        request = RequestFactory().get("/")
+        request.user = self.user_default
+
+        context = get_authorization_context(request)
+        self.assertIs(get_authorization_context(request), context)
+
+        self.assertEqual(context.can_user_do("view"), can_user_do("view", user=self.user_default))
+        valid_filter = context.get_filter_for_valid_objects(Document, action_name="view")
+        self.assertEqual(
+            set(Document.objects.filter(valid_filter)),
+            set(Document.objects.filter(get_filter_for_valid_objects(self.user_default, Document, action_name="view"))),
+        )
+
+        with self.assertNumQueries(0):
+            context.can_user_do("view")
+            self.assertIs(context.get_filter_for_valid_objects(Document, action_name="view"), valid_filter)
+
+    def test_authorization_context_checks_lists_of_actions_and_objects(self):
+        request = RequestFactory().get("/")
+        request.user = self.user_admin
+        context = get_authorization_context(request)
+
+        for action_names in (["view", "edit"], ["edit", "view"], ["view", "unknown"]):
+            self.assertEqual(context.can_user_do(action_names), can_user_do(action_names, user=self.user_admin))
+            self.assertEqual(
+                set(Document.objects.filter(context.get_filter_for_valid_objects(Document, action_name=action_names))),
+                set(Document.objects.filter(get_filter_for_valid_objects(self.user_admin, Document,
+                                                                         action_name=action_names))),
+            )
+
+        decisions = [can_user_do("view", obj=document, user=self.user_admin) for document in Document.objects.all()]
+        self.assertIn(True, decisions)
+        self.assertIn(False, decisions)
+        self.assertEqual([context.can_user_do("view", obj=document) for document in Document.objects.all()], decisions)
@@ -0,0 +1,59 @@
+from django.contrib.contenttypes.models import ContentType
+
+from exampleapp.models import Document, ProxyDocument
+from flex_abac.checkers import can_user_do, get_filter_for_valid_objects, is_object_in_scope
+from flex_abac.models import ModelGenericAttribute
+from flex_abac.registry import get_attribute_metadata, get_attribute_registry
+from flex_abac.tests.helpers import ExampleAppTestCase
+
+
+class AttributeRegistryTestCase(ExampleAppTestCase):
+    def test_attribute_registry_is_reused_until_attributes_change(self):
+        registry = get_attribute_registry()
+
+        with self.assertNumQueries(0):
+            self.assertIs(get_attribute_registry(), registry)
+            field_paths = {registered_attribute.attribute_type: registered_attribute.field_path
+                           for registered_attribute in registry.get_registered_attributes(Document)}
+            self.assertEqual(field_paths[self.brand_attribute], "brand__name")
+            self.assertEqual(field_paths[self.datetime_attribute], "document_datetime")
+            self.assertEqual(field_paths[self.topic_attribute], "topics")
+
+        ModelGenericAttribute.objects.filter(attribute_type=self.desk_attribute).delete()
+
+        self.assertIsNot(get_attribute_registry(), registry)
+        self.assertNotIn(self.desk_attribute, get_attribute_registry().get_attribute_types(Document))
+
+    def test_proxy_models_are_checked_as_their_concrete_model(self):
+        self.assertEqual(get_attribute_registry().get_attribute_types(ProxyDocument),
+                         get_attribute_registry().get_attribute_types(Document))
+        self.assertEqual(get_filter_for_valid_objects(self.user_default, ProxyDocument),
+                         get_filter_for_valid_objects(self.user_default, Document))
+
+        out_of_scope_documents = Document.objects.exclude(brand_id__in=(1, 3))
+        self.assertTrue(out_of_scope_documents.exists())
+        for document in out_of_scope_documents:
+            proxy_document = ProxyDocument.objects.get(pk=document.pk)
+            self.assertFalse(is_object_in_scope(self.policy_default, proxy_document))
+            self.assertEqual(can_user_do("view", obj=proxy_document, user=self.user_default),
+                             can_user_do("view", obj=document, user=self.user_default))
+
+    def test_attribute_metadata_is_loaded_in_a_single_query(self):
+        attribute_types = [self.brand_attribute, self.desk_attribute, self.topic_attribute, self.datetime_attribute]
+
+        with self.assertNumQueries(1):
+            attribute_metadata = get_attribute_metadata()
+
+        with self.assertNumQueries(0):
+            self.assertIs(get_attribute_metadata(), attribute_metadata)
+            for attribute_type in attribute_types:
+                self.assertIs(attribute_type.get_model(), Document)
+                self.assertEqual(attribute_type.get_content_type(), ContentType.objects.get_for_model(Document))
+            self.assertEqual(self.brand_attribute.find_field_in_model(as_path=True), "brand__name")
+            self.assertEqual(self.datetime_attribute.find_field_in_model(as_path=False), "DateTimeField")
+
+        ModelGenericAttribute.objects.filter(attribute_type=self.desk_attribute).delete()
+
+        self.assertIsNot(get_attribute_metadata(), attribute_metadata)
+        with self.assertRaises(ModelGenericAttribute.DoesNotExist):
+            self.desk_attribute.get_model()
@@ -0,0 +1,108 @@
+from django.contrib.auth.models import AnonymousUser, User
+from django.db.models import Q
+
+from exampleapp.models import Document
+from flex_abac.checkers import can_user_do, can_user_do_many, get_filter_for_valid_objects, is_object_in_scope
+from flex_abac.factories.policyactionfactory import PolicyActionFactory
+from flex_abac.factories.userrolefactory import UserRoleFactory
+from flex_abac.models import UserRole
+from flex_abac.snapshot import get_authorization_snapshot, get_role_signature
+from flex_abac.tests.helpers import ExampleAppTestCase, create_user_with_policy
+
+
+class AuthorizationSnapshotTestCase(ExampleAppTestCase):
+    def test_authorization_snapshot_is_loaded_in_a_fixed_number_of_queries(self):
+        # Roles, policies, actions and one query per attribute type class
+        with self.assertNumQueries(7):
+            snapshot = get_authorization_snapshot(self.user_default)
+
+        self.assertEqual(snapshot.role_ids, {self.role_default.id, self.role_default2.id})
+        self.assertEqual([policy.id for policy in snapshot.get_policies("view")], [self.policy_default.id])
+        self.assertEqual(sorted(snapshot.get_policies("view")[0].get_scope_values(self.brand_attribute)),
+                         sorted([self.brand_values[1].value, self.brand_values[3].value]))
+
+    def test_authorization_snapshot_is_reused_until_permissions_change(self):
+        snapshot = get_authorization_snapshot(self.user_default)
+
+        with self.assertNumQueries(0):
+            self.assertIs(get_authorization_snapshot(self.user_default), snapshot)
+            self.assertEqual(can_user_do("view", user=self.user_default), True)
+
+        PolicyActionFactory.create(policy=self.policy_default, action=self.action_edit)
+
+        self.assertIsNot(get_authorization_snapshot(self.user_default), snapshot)
+        self.assertEqual(can_user_do("edit", user=self.user_default), True)
+
+    def test_compiled_policies_are_in_the_same_scope_as_policies(self):
+        compiled_policy = [policy for policy in get_authorization_snapshot(self.user_admin).get_policies()
+                           if policy.id == self.policy_admin.id][0]
+
+        for document in Document.objects.all():
+            self.assertEqual(is_object_in_scope(compiled_policy, document),
+                             is_object_in_scope(self.policy_admin, document))
+
+    def test_users_with_the_same_roles_share_their_snapshot(self):
+        user = User.objects.create(username="same_roles")
+        UserRoleFactory.create(user=user, role=self.role_default)
+        UserRoleFactory.create(user=user, role=self.role_default2)
+
+        self.assertEqual(get_role_signature(user), tuple(sorted([self.role_default.id, self.role_default2.id])))
+        self.assertEqual(get_role_signature(user), get_role_signature(self.user_default))
+
+        snapshot = get_authorization_snapshot(self.user_default)
+        self.assertIs(get_authorization_snapshot(user), snapshot)
+        self.assertIsNot(get_authorization_snapshot(self.user_admin), snapshot)
+        valid_filter = get_filter_for_valid_objects(self.user_default, Document, action_name="view")
+        with self.assertNumQueries(0):
+            self.assertIs(get_filter_for_valid_objects(user, Document, action_name="view"), valid_filter)
+
+        UserRoleFactory.create(user=user, role=self.role_admin)
+
+        self.assertNotEqual(get_role_signature(user), get_role_signature(self.user_default))
+        self.assertTrue(can_user_do("edit", user=user))
+        self.assertFalse(can_user_do("edit", user=self.user_default))
+
+    def test_unrestricted_policies_are_not_evaluated(self):
+        user = create_user_with_policy("unrestricted")
+
+        documents = list(Document.objects.all())
+        snapshot = get_authorization_snapshot(user)
+        self.assertTrue(snapshot.has_unrestricted_policy("view", Document))
+        self.assertFalse(get_authorization_snapshot(self.user_default).has_unrestricted_policy("view", Document))
+
+        # Neither the attribute values nor the objects are queried
+        with self.assertNumQueries(0):
+            self.assertTrue(all(can_user_do("view", document, user=user) for document in documents))
+            self.assertTrue(all(is_object_in_scope(snapshot.get_policies("view")[0], document)
+                                for document in documents))
+            self.assertEqual(can_user_do_many("view", documents, user=user), [True] * len(documents))
+            self.assertEqual(get_filter_for_valid_objects(user, Document, action_name="view"), Q())
+        self.assertFalse(can_user_do("edit", documents[0], user=user))
+
+    def test_anonymous_user_checks_do_not_query_the_database(self):
+        anonymous_user = AnonymousUser()
+        anonymous_role = UserRole.objects.create(user=None, role=self.role_default)
+        document = Document.objects.select_related("brand", "desk").get(
+            pk=[document.pk for document in Document.objects.all()
+                if can_user_do("view", document, user=self.user_default)][0]
+        )
+
+        self.assertEqual(get_role_signature(anonymous_user), (self.role_default.id,))
+        self.assertEqual(set(anonymous_user.get_roles()), {self.role_default})
+        self.assertEqual(set(anonymous_user.get_policies()), set(self.role_default.policies.all()))
+        self.assertEqual(set(anonymous_user.get_actions()), {self.action_view})
+        valid_filter = get_filter_for_valid_objects(anonymous_user, Document, action_name="view")
+        user_valid_filter = anonymous_user.get_filter_for_valid_objects(Document, "view")
+        can_user_do("view", document, user=anonymous_user)
+
+        with self.assertNumQueries(0):
+            self.assertIs(get_authorization_snapshot(anonymous_user), get_authorization_snapshot(AnonymousUser()))
+            self.assertTrue(can_user_do("view", user=anonymous_user))
+            self.assertFalse(can_user_do("edit", user=anonymous_user))
+            self.assertIs(get_filter_for_valid_objects(anonymous_user, Document, action_name="view"), valid_filter)
+            self.assertIs(anonymous_user.get_filter_for_valid_objects(Document, "view"), user_valid_filter)
+
+        anonymous_role.delete()
+
+        self.assertEqual(get_role_signature(anonymous_user), ())
+        self.assertFalse(can_user_do("view", user=anonymous_user))
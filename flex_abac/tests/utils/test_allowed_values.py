@@ -0,0 +1,35 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from exampleapp.models import Document
+from flex_abac.models import BaseAttribute
+from flex_abac.tests.helpers import ExampleAppTestCase, add_policy_to_role, create_user_with_role
+from flex_abac.utils.allowed_values import get_all_allowed_values_for_user
+from flex_abac.utils.helpers import get_subclasses
+
+
+class AllowedValuesTestCase(ExampleAppTestCase):
+    def test_all_allowed_values_for_user_are_loaded_in_a_fixed_number_of_queries(self):
+        user, role = create_user_with_role("allowed_values")
+        for idx, brand_id in enumerate((1, 2)):
+            add_policy_to_role(role, f"allowed values {idx}", [self.brand_values[brand_id], self.topic_values[1]])
+        content_types = [ContentType.objects.get_for_model(Document).pk]
+
+        # Two queries for the policies, plus (at most) two per attribute type class
+        with CaptureQueriesContext(connection) as context:
+            allowed_values, unrestricted_attribute_types = get_all_allowed_values_for_user(user, content_types,
+                                                                                           action_name="view")
+        self.assertLessEqual(len(context.captured_queries), 2 + 2 * len(list(get_subclasses(BaseAttribute))))
+
+        self.assertEqual(set(allowed_values), {self.brand_values[1], self.brand_values[2], self.topic_values[1]})
+        self.assertEqual(set(unrestricted_attribute_types),
+                         {self.desk_attribute, self.datetime_attribute, self.category_attribute})
+
+        # A policy without brands allows all of them
+        add_policy_to_role(role, "allowed values without brands", [self.topic_values[1]])
+
+        allowed_values, unrestricted_attribute_types = get_all_allowed_values_for_user(user.pk, content_types,
+                                                                                       action_name="view")
+        self.assertEqual(set(allowed_values), {self.topic_values[1]})
+        self.assertIn(self.brand_attribute, unrestricted_attribute_types)
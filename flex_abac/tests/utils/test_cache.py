@@ -0,0 +1,102 @@
+import tempfile
+import time
+from unittest import mock
+
+from django.test import RequestFactory, TestCase, override_settings
+
+from exampleapp.models import Brand, Desk, Document
+from flex_abac.checkers import can_user_do, is_attribute_query_in_scope_from_mapping
+from flex_abac.context import get_authorization_context
+from flex_abac.factories.policyactionfactory import PolicyActionFactory
+from flex_abac.snapshot import get_authorization_snapshot
+from flex_abac.tests.helpers import ExampleAppTestCase, create_user_with_policy
+from flex_abac.utils import cache
+from flex_abac.utils.cache import bump_permissions_generation, is_process_cache_enabled, \
+    pinned_permissions_generation
+
+
+class PermissionsGenerationTestCase(TestCase):
+    def setUp(self):
+        self.user = create_user_with_policy("user")
+        self.document = Document.objects.create(filename="doc", brand=Brand.objects.create(name="brand"),
+                                                desk=Desk.objects.create(name="desk"))
+
+    def test_generation_is_read_once_per_check(self):
+        with mock.patch.object(cache, "_read_permissions_generation",
+                               wraps=cache._read_permissions_generation) as read_generation:
+            self.assertTrue(can_user_do("view", self.document, self.user))
+            self.assertEqual(read_generation.call_count, 1)
+
+    def test_generation_is_read_once_per_request(self):
+        request = RequestFactory().get("/")
+        request.user = self.user
+        context = get_authorization_context(request)
+
+        with mock.patch.object(cache, "_read_permissions_generation",
+                               wraps=cache._read_permissions_generation) as read_generation:
+            self.assertTrue(context.can_user_do("view"))
+            self.assertTrue(context.can_user_do("view", self.document))
+            context.get_filter_for_valid_objects(Document, action_name="view")
+            self.assertEqual(read_generation.call_count, 1)
+
+    def test_process_cache_is_disabled_for_process_local_backends(self):
+        with override_settings(FLEX_ABAC_PROCESS_CACHE=None):
+            self.assertFalse(is_process_cache_enabled())
+
+            # Snapshots are only reused while the generation is pinned
+            self.assertIsNot(get_authorization_snapshot(self.user), get_authorization_snapshot(self.user))
+            with pinned_permissions_generation():
+                snapshot = get_authorization_snapshot(self.user)
+                with self.assertNumQueries(0):
+                    self.assertIs(get_authorization_snapshot(self.user), snapshot)
+
+        with override_settings(FLEX_ABAC_PROCESS_CACHE=True):
+            self.assertTrue(is_process_cache_enabled())
+
+    def test_process_cache_is_enabled_for_shared_backends(self):
+        with tempfile.TemporaryDirectory() as cache_dir, override_settings(
+                FLEX_ABAC_PROCESS_CACHE=None,
+                CACHES={"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                                    "LOCATION": cache_dir}}):
+            self.assertTrue(is_process_cache_enabled())
+
+            snapshot = get_authorization_snapshot(self.user)
+            self.assertIs(get_authorization_snapshot(self.user), snapshot)
+
+            bump_permissions_generation()
+            self.assertIsNot(get_authorization_snapshot(self.user), snapshot)
+
+
+class DecisionCacheTestCase(ExampleAppTestCase):
+    def test_decisions_are_cached_until_permissions_change(self):
+        document = [document for document in Document.objects.all()
+                    if can_user_do("view", document, user=self.user_default)][0]
+        attribute_mapping = {"brand__name": [document.brand.name]}
+
+        with self.settings(FLEX_ABAC_DECISION_CACHE=True):
+            self.assertFalse(can_user_do("edit", document, user=self.user_default))
+            self.assertTrue(is_attribute_query_in_scope_from_mapping(self.user_default, attribute_mapping, Document))
+
+            with self.assertNumQueries(0):
+                self.assertFalse(can_user_do("edit", document, user=self.user_default))
+                self.assertTrue(is_attribute_query_in_scope_from_mapping(self.user_default, attribute_mapping,
+                                                                         Document))
+
+            PolicyActionFactory.create(policy=self.policy_default, action=self.action_edit)
+
+            self.assertTrue(can_user_do("edit", document, user=self.user_default))
+
+    def test_decisions_expire_after_the_timeout(self):
+        allowed_document = [document for document in Document.objects.all()
+                            if can_user_do("view", document, user=self.user_default)][0]
+
+        with self.settings(FLEX_ABAC_DECISION_CACHE=True, FLEX_ABAC_DECISION_CACHE_TIMEOUT=60):
+            self.assertTrue(can_user_do("view", allowed_document, user=self.user_default))
+
+            # Changes in the checked objects do not change the permission graph
+            allowed_document.brand = Brand.objects.get(id=2)
+            allowed_document.save()
+            self.assertTrue(can_user_do("view", allowed_document, user=self.user_default))
+
+            with mock.patch("flex_abac.utils.cache.time.time", return_value=time.time() + 61):
+                self.assertFalse(can_user_do("view", allowed_document, user=self.user_default))
@@ -0,0 +1,29 @@
+from exampleapp.models import Document
+from flex_abac.snapshot import get_authorization_snapshot
+from flex_abac.tests.helpers import ExampleAppTestCase
+
+
+class EvaluatorsTestCase(ExampleAppTestCase):
+    def test_categorical_and_generic_attributes_are_matched_in_memory(self):
+        compiled_policies = get_authorization_snapshot(self.user_admin).get_policies() + \
+                            get_authorization_snapshot(self.user_default).get_policies()
+        documents = list(Document.objects.select_related("brand", "desk"))
+
+        for attribute_type in (self.brand_attribute, self.desk_attribute, self.datetime_attribute):
+            for policy in compiled_policies:
+                for document in documents:
+                    with self.assertNumQueries(0):
+                        in_memory_match = attribute_type.does_match(document, policy)
+
+                    scope_filter, _ = attribute_type.get_filter(policy)
+                    self.assertEqual(in_memory_match,
+                                     Document.objects.filter(pk=document.pk).filter(scope_filter).exists())
+
+    def test_attributes_are_matched_in_database_if_in_memory_evaluation_is_disabled(self):
+        compiled_policy = [policy for policy in get_authorization_snapshot(self.user_admin).get_policies()
+                           if policy.id == self.policy_admin.id][0]
+        document = Document.objects.select_related("brand").first()
+
+        with self.settings(FLEX_ABAC_EVALUATE_LOOKUPS_IN_MEMORY=False):
+            with self.assertNumQueries(1):
+                self.brand_attribute.does_match(document, compiled_policy)
@@ -0,0 +1,31 @@
+from django.test import RequestFactory
+
+from exampleapp.models import Document
+from exampleapp.views.example_view import MappingExample1ViewSet
+from flex_abac.models import ModelGenericAttribute
+from flex_abac.tests.helpers import ExampleAppTestCase
+from flex_abac.utils.mappings import DefaultAttributeMappingGenerator, get_mapping_from_viewset
+
+
+class AttributeMappingTestCase(ExampleAppTestCase):
+    def test_attribute_mapping_plan_is_reused_until_attributes_change(self):
+        plan = DefaultAttributeMappingGenerator.get_mapping_plan()
+
+        view = MappingExample1ViewSet(action="filter", kwargs={})
+        view.request = RequestFactory().get("/", {"unknown": "value"})
+        view.request.user = self.user_admin
+
+        # Requests without attribute query parameters do not query the database
+        with self.assertNumQueries(0):
+            self.assertIs(DefaultAttributeMappingGenerator.get_mapping_plan(), plan)
+            self.assertEqual(DefaultAttributeMappingGenerator.get_attribute_mapping(view), [])
+
+        view.request = RequestFactory().get("/", {"brand__name": "Brand 1", "unknown": "value"})
+        view.request.user = self.user_admin
+        self.assertEqual(get_mapping_from_viewset(view), {Document: {"brand__name": ["Brand 1"]}})
+
+        ModelGenericAttribute.objects.filter(attribute_type=self.desk_attribute).delete()
+
+        self.assertIsNot(DefaultAttributeMappingGenerator.get_mapping_plan(), plan)
+        self.assertIn("desk__name", plan.items_per_query_name)
+        self.assertNotIn("desk__name", DefaultAttributeMappingGenerator.get_mapping_plan().items_per_query_name)
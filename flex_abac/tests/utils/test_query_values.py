@@ -0,0 +1,31 @@
+from exampleapp.models import Document
+from flex_abac.checkers import _are_all_required_attribute_types_in_query, \
+    get_query_attribute_values_from_mapping, is_attribute_query_in_scope
+from flex_abac.snapshot import get_authorization_snapshot
+from flex_abac.tests.helpers import ExampleAppTestCase
+from flex_abac.utils.query_values import QueryAttributeValue
+
+
+class QueryAttributeValueTestCase(ExampleAppTestCase):
+    def test_query_attribute_values_are_not_model_instances(self):
+        snapshot = get_authorization_snapshot(self.user_default)
+
+        for attribute_mapping in (
+            {"brand__name": [self.brand_values[1].value, self.brand_values[3].value]},
+            {"brand__name": [self.brand_values[2].value]},
+            {"brand__name": [self.brand_values[1].value], "topics": [self.topic_values[6].value]},
+            {"topics": [self.topic_values[1].value]},
+        ):
+            query_values = get_query_attribute_values_from_mapping(attribute_mapping, Document)
+            self.assertTrue(all(isinstance(query_value, QueryAttributeValue) for query_value in query_values))
+            self.assertEqual(
+                is_attribute_query_in_scope(query_values, Document, snapshot=snapshot),
+                is_attribute_query_in_scope([query_value.to_filter() for query_value in query_values], Document,
+                                            snapshot=snapshot),
+            )
+
+        query_values = get_query_attribute_values_from_mapping({"brand__name": [self.brand_values[1].value]}, Document)
+        are_all_types_covered, missing_types = _are_all_required_attribute_types_in_query(query_values, Document)
+        self.assertFalse(are_all_types_covered)
+        self.assertNotIn(self.brand_attribute, missing_types)
+        self.assertIn(self.desk_attribute, missing_types)
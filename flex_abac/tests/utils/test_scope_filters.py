@@ -0,0 +1,142 @@
+import functools
+import re
+from datetime import datetime
+
+import pytz
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.models import Exists, Q
+from django.test import TestCase
+
+from exampleapp.models import Brand, Desk, Document, Evaluation
+from flex_abac.checkers import get_filter_for_valid_objects
+from flex_abac.factories.rolefactory import RoleFactory
+from flex_abac.models import CategoricalFilter
+from flex_abac.tests.helpers import ExampleAppTestCase, add_policy_to_role, create_user_with_role
+from flex_abac.utils.scope_filters import FILTER_STRATEGIES, FILTER_STRATEGY_EXISTS, FILTER_STRATEGY_IN, \
+    FILTER_STRATEGY_PK_SUBQUERY, compile_valid_objects_condition, filter_valid_objects, simplify_conditions
+
+
+class SimplifyConditionsTestCase(TestCase):
+    def test_equality_conditions_are_merged_per_field(self):
+        self.assertEqual(
+            simplify_conditions(Document, [Q(filename="a"), Q(desk__name="desk"), Q(filename__in=["b", "a"]),
+                                           Q(filename__contains="c")]),
+            [Q(filename__in=["a", "b"]), Q(desk__name="desk"), Q(filename__contains="c")],
+        )
+
+    def test_equal_values_of_different_types_are_kept(self):
+        self.assertEqual(simplify_conditions(Document, [Q(pk=1), Q(pk=True), Q(pk=1.0), Q(pk=1)]),
+                         [Q(pk__in=[1, True, 1.0])])
+
+
+class ValidObjectsFilterTestCase(ExampleAppTestCase):
+    def test_filter_for_valid_objects_is_simplified(self):
+        # Scaled dataset: many policies restricting the brand, some of them repeated
+        user, role = create_user_with_role("many_policies")
+
+        brand_names = []
+        for idx in range(60):
+            brand_name = f"Scaled brand {idx}"
+            brand_names.append(brand_name)
+            Document.objects.create(brand=Brand.objects.create(name=brand_name),
+                                    desk=Desk.objects.first(), document_datetime=datetime.now(pytz.utc))
+            brand_value = CategoricalFilter.objects.create(value=brand_name, attribute_type=self.brand_attribute)
+            for copy_idx in range(2):
+                add_policy_to_role(role, f"scaled {idx}.{copy_idx}", [brand_value])
+
+        valid_filter = get_filter_for_valid_objects(user, Document, action_name="view")
+        self.assertEqual(valid_filter, Q(brand__name__in=brand_names))
+
+        chained_filter = Q()
+        for brand_name in brand_names * 2:
+            chained_filter |= Q(brand__name=brand_name)
+
+        valid_documents = Document.objects.filter(valid_filter)
+        chained_documents = Document.objects.filter(chained_filter)
+        self.assertEqual(set(valid_documents), set(chained_documents))
+
+        # A single IN lookup, instead of one equality lookup per policy
+        conditions = valid_documents.query.where.children
+        self.assertEqual(len(conditions), 1)
+        self.assertEqual(conditions[0].lookup_name, "in")
+        self.assertEqual(list(conditions[0].rhs), brand_names)
+        self.assertEqual(len(chained_documents.query.where.children[0].children), len(brand_names) * 2)
+
+    def test_unrestricted_policies_widen_the_filter_for_valid_objects(self):
+        topic_name = self.topic_values[1].value
+
+        role = RoleFactory.create(name="topic and no topic")
+        policy = add_policy_to_role(role, "topic", [self.topic_values[1], self.brand_values[1]])
+        self.assertNotEqual(get_filter_for_valid_objects(policy, Document), Q())
+
+        # A policy without topics allows all of them, so the topic conditions are dropped
+        add_policy_to_role(role, "no topic", [self.brand_values[2]])
+
+        self.assertEqual(
+            get_filter_for_valid_objects(role, Document),
+            Q(brand__name__in=[self.brand_values[1].value, self.brand_values[2].value]),
+        )
+        self.assertEqual(
+            get_filter_for_valid_objects(role, Document, base_lookup_name="document"),
+            Q(document__brand__name__in=[self.brand_values[1].value, self.brand_values[2].value]),
+        )
+        self.assertNotIn(topic_name, str(get_filter_for_valid_objects(role, Document)))
+
+    def test_filter_strategies_select_the_same_objects(self):
+        for document in Document.objects.all():
+            Evaluation.objects.create(name=f"Evaluation of {document.filename}", document=document)
+
+        for user in (self.user_default, self.user_admin, AnonymousUser()):
+            get_filter = functools.partial(get_filter_for_valid_objects, user, Document, action_name="view")
+
+            valid_documents = set(Document.objects.filter(get_filter()))
+            valid_evaluations = set(Evaluation.objects.filter(get_filter(base_lookup_name="document")))
+
+            for strategy in FILTER_STRATEGIES:
+                self.assertEqual(
+                    set(filter_valid_objects(Document.objects.all(),
+                                             compile_valid_objects_condition(get_filter, Document, strategy=strategy))),
+                    valid_documents,
+                )
+                self.assertEqual(
+                    set(filter_valid_objects(Evaluation.objects.all(), compile_valid_objects_condition(
+                        get_filter, Document, base_lookup_name="document", strategy=strategy
+                    ))),
+                    valid_evaluations,
+                )
+
+        get_filter = functools.partial(get_filter_for_valid_objects, self.user_default, Document, action_name="view")
+        with self.settings(FLEX_ABAC_FILTER_STRATEGY="exists"):
+            self.assertIsInstance(compile_valid_objects_condition(get_filter, Document), Exists)
+        with self.assertRaises(ImproperlyConfigured):
+            compile_valid_objects_condition(get_filter, Document, strategy="unknown")
+
+    def test_filter_strategies_build_different_queries(self):
+        get_filter = functools.partial(get_filter_for_valid_objects, self.user_default, Document, action_name="view")
+        qn = connection.ops.quote_name
+        evaluation_table, document_table = qn(Evaluation._meta.db_table), qn(Document._meta.db_table)
+        document_column = f'{evaluation_table}.{qn("document_id")}'
+
+        def get_sql(strategy):
+            return str(filter_valid_objects(Evaluation.objects.all(), compile_valid_objects_condition(
+                get_filter, Document, base_lookup_name="document", strategy=strategy
+            )).query)
+
+        # The queryset is joined to the base model
+        sql = get_sql(FILTER_STRATEGY_IN)
+        self.assertIn(f"INNER JOIN {document_table} ON ({document_column} = {document_table}.{qn('id')})", sql)
+
+        # The base model is only checked in a subquery correlated with the queryset
+        sql = get_sql(FILTER_STRATEGY_EXISTS)
+        self.assertNotIn(f"INNER JOIN {document_table} ON ({document_column}", sql)
+        self.assertIn(f"FROM {evaluation_table} WHERE EXISTS(", sql)
+        self.assertIn(f'.{qn("id")} = {document_column}', sql)
+
+        # The base model is only checked in an uncorrelated subquery selecting its primary keys
+        sql = get_sql(FILTER_STRATEGY_PK_SUBQUERY)
+        self.assertNotIn(f"INNER JOIN {document_table} ON ({document_column}", sql)
+        self.assertRegex(sql, rf'{re.escape(document_column)} IN \(SELECT \w+\.{re.escape(qn("id"))} '
+                              rf'FROM {re.escape(document_table)} ')
+        self.assertNotIn(document_column, sql.split(" IN (SELECT ", 1)[1])
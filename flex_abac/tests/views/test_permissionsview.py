@@ -1,3 +1,4 @@
+import flex_abac.constants
 from exampleapp.models import (
     Brand, Document, Documenttopics, Desk, Topic, Region, Category, Documentregions
 )
@@ -0,0 +1,66 @@
+from django.contrib.auth.models import User
+
+from flex_abac.constants import SUPERADMIN_ROLE, GLOBAL_VIEWER_ROLE
+from flex_abac.models import BaseAttribute
+from flex_abac.utils.helpers import get_subclasses
+
+
+def get_all_allowed_values_for_user(user, content_types, action_name=None):
+    """
+    Batched version of ``get_all_values_for_user`` for all the attribute types of a set of models, in a fixed number
+    of queries.
+
+    :param user: The user (or its id).
+    :type user: django.contrib.auth.models.User, int
+
+    :param content_types: The ids of the content types of the models.
+    :type content_types: list<int>
+
+    :param action_name: Optional. Limits the values to the policies including this action.
+    :type action_name: str
+
+    :returns: tuple -- The list of allowed values (instances of the filter models), and the list of unrestricted
+              attribute types.
+    """
+    if not isinstance(user, User) and not getattr(user, "is_anonymous", False):
+        user = User.objects.get(pk=user)
+
+    user_policies = user.get_policies()
+
+    # Policies whose values are allowed
+    value_policy_ids = set(
+        (user_policies.filter(action__name=action_name) if action_name else user_policies).
+        values_list("pk", flat=True)
+    )
+    # Policies allowing all the values of the attribute types they have no values for
+    empty_scope_policy_ids = set(
+        user_policies.filter(action__name=action_name).exclude(role__name__in=(SUPERADMIN_ROLE, GLOBAL_VIEWER_ROLE)).
+        values_list("pk", flat=True)
+    )
+
+    allowed_values = {}
+    unrestricted_attribute_types = []
+    for attribute_type_model in get_subclasses(BaseAttribute):
+        attribute_types = list(attribute_type_model.get_all_attributes_from_content_types(content_types))
+        if not attribute_types:
+            continue
+
+        policy_filters = attribute_type_model.load_policy_filters(
+            value_policy_ids | empty_scope_policy_ids, [attribute_type.pk for attribute_type in attribute_types]
+        )
+
+        for attribute_type in attribute_types:
+            filters_per_policy = policy_filters.get(attribute_type.pk, {})
+
+            values = {}
+            if not empty_scope_policy_ids.difference(filters_per_policy.keys()):
+                for policy_id, filters in filters_per_policy.items():
+                    if policy_id in value_policy_ids:
+                        values.update((value.pk, value) for value in filters)
+
+            if values:
+                allowed_values.update(((type(value), pk), value) for pk, value in values.items())
+            else:
+                unrestricted_attribute_types.append(attribute_type)
+
+    return list(allowed_values.values()), unrestricted_attribute_types
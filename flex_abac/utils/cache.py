@@ -0,0 +1,256 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+
+PERMISSIONS_GENERATION_KEY = "flex_abac:permissions_generation"
+
+
+def get_cache():
+    """
+    Returns the Django cache backend used by flex-abac. It can be selected through the ``FLEX_ABAC_CACHE`` setting
+    (``default`` by default).
+    """
+    return caches[getattr(settings, "FLEX_ABAC_CACHE", "default")]
+
+
+def is_process_cache_enabled():
+    """
+    Checks whether the data derived from the permission graph can be cached in-process across requests. By default,
+    only if the cache backend is shared among processes.
+    """
+    enabled = getattr(settings, "FLEX_ABAC_PROCESS_CACHE", None)
+    if enabled is None:
+        return not isinstance(get_cache(), (LocMemCache, DummyCache))
+    return enabled
+
+
+class PinnedGeneration:
+    """
+    Permissions generation pinned for a check or a request, with the data derived from it.
+    """
+
+    def __init__(self, generation):
+        self.generation = generation
+        self.data = {}
+
+
+_pinned_generation = ContextVar("flex_abac_pinned_generation", default=None)
+
+
+@contextmanager
+def pinned_permissions_generation(pinned=None):
+    """
+    Pins the permissions generation, so it is read once for a whole check or request. It can be used as a decorator.
+
+    :param pinned: Optional. A generation pinned before (e.g. for the request). If not provided, the current generation
+                   is pinned.
+    :type pinned: flex_abac.utils.cache.PinnedGeneration
+
+    :returns: flex_abac.utils.cache.PinnedGeneration -- The pinned generation.
+    """
+    current = _pinned_generation.get()
+    if current is not None:
+        yield current
+        return
+
+    pinned = pinned or PinnedGeneration(_read_permissions_generation())
+    token = _pinned_generation.set(pinned)
+    try:
+        yield pinned
+    finally:
+        _pinned_generation.reset(token)
+
+
+def _initial_generation():
+    # Time-based, so a flushed cache never hands out a generation that was already used by a running process
+    return int(time.time() * 1000000)
+
+
+def get_permissions_generation():
+    """
+    Returns the current generation of the permission graph, which is increased by any change in roles, policies,
+    actions, attributes or filters.
+
+    :returns: int -- The current generation.
+    """
+    pinned = _pinned_generation.get()
+    if pinned is not None:
+        return pinned.generation
+
+    return _read_permissions_generation()
+
+
+def _read_permissions_generation():
+    cache = get_cache()
+    generation = cache.get(PERMISSIONS_GENERATION_KEY)
+    if generation is None:
+        cache.add(PERMISSIONS_GENERATION_KEY, _initial_generation(), timeout=None)
+        generation = cache.get(PERMISSIONS_GENERATION_KEY, _initial_generation())
+
+    return generation
+
+
+def bump_permissions_generation():
+    """
+    Increases the generation of the permission graph, invalidating any permission data cached by flex-abac. Call it
+    after changes which send no signals (e.g. ``QuerySet.update()``).
+    """
+    cache = get_cache()
+    try:
+        cache.incr(PERMISSIONS_GENERATION_KEY)
+    except ValueError:
+        cache.add(PERMISSIONS_GENERATION_KEY, _initial_generation(), timeout=None)
+
+
+def invalidate_permissions_cache(*args, **kwargs):
+    """
+    Bumps the permissions generation right away, and again once the current transaction is committed.
+    """
+    bump_permissions_generation()
+    transaction.on_commit(bump_permissions_generation)
+
+
+class LRUCache:
+    """
+    Bounded, thread-safe, in-process cache which discards the least recently used items first.
+    """
+
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def get_generation_data(store, key, build):
+    """
+    Returns data derived from the permission graph, built by ``build(generation)`` again when the generation changes.
+
+    :param store: The in-process store of the data.
+    :type store: flex_abac.utils.cache.LRUCache
+
+    :param key: The key of the data in the store.
+    :type key: object
+
+    :param build: Function building the data for a generation.
+    :type build: callable
+
+    :returns: The data.
+    """
+    generation = get_permissions_generation()
+
+    if not is_process_cache_enabled():
+        pinned = _pinned_generation.get()
+        if pinned is None:
+            return build(generation)
+
+        try:
+            return pinned.data[store, key]
+        except KeyError:
+            data = pinned.data[store, key] = build(generation)
+            return data
+
+    cached = store.get(key)
+    if cached is None or cached[0] != generation:
+        cached = (generation, build(generation))
+        store.set(key, cached)
+
+    return cached[1]
+
+
+DECISIONS_KEY_PREFIX = "flex_abac:decision"
+
+_decisions = LRUCache(maxsize=getattr(settings, "FLEX_ABAC_DECISION_CACHE_SIZE", 10000))
+
+
+def is_decision_cache_enabled():
+    """
+    Checks whether permission decisions should be cached, as configured in the ``FLEX_ABAC_DECISION_CACHE`` setting
+    (disabled by default).
+    """
+    return getattr(settings, "FLEX_ABAC_DECISION_CACHE", False)
+
+
+def get_decision_key(key_parts, generation=None):
+    """
+    Builds the cache key of a decision, including the permissions generation.
+
+    :param key_parts: Values identifying the decision (e.g. the function name, user, action and object). Their
+                      ``repr`` should be stable across processes.
+    :type key_parts: tuple
+
+    :param generation: Optional. The permissions generation. If not provided, the current one is used.
+    :type generation: int
+
+    :returns: str -- The key.
+    """
+    if generation is None:
+        generation = get_permissions_generation()
+
+    digest = hashlib.sha1(repr(key_parts).encode("utf-8")).hexdigest()
+    return f"{DECISIONS_KEY_PREFIX}:{generation}:{digest}"
+
+
+def get_cached_decision(key_parts, compute):
+    """
+    Returns a permission decision from the decision cache, computing and storing it if needed. Cached decisions can be
+    outdated until they expire (see the decision cache settings).
+
+    :param key_parts: Values identifying the decision (see :meth:`get_decision_key`).
+    :type key_parts: tuple
+
+    :param compute: Function without arguments which computes the decision.
+    :type compute: callable
+
+    :returns: The decision.
+    """
+    if not is_decision_cache_enabled():
+        return compute()
+
+    key = get_decision_key(key_parts)
+    now = time.time()
+
+    cached = _decisions.get(key)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+
+    cache = get_cache()
+    cached = cache.get(key)
+    if cached is None or cached[0] <= now:
+        timeout = getattr(settings, "FLEX_ABAC_DECISION_CACHE_TIMEOUT", 300)
+        cached = (now + timeout, compute())
+        cache.set(key, cached, timeout=timeout)
+
+    _decisions.set(key, cached)
+    return cached[1]
@@ -0,0 +1,236 @@
+import functools
+import operator
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ObjectDoesNotExist, ValidationError
+
+
+class UnsupportedLookup(Exception):
+    """
+    Raised when a lookup cannot be evaluated in Python, so it should be evaluated by the database instead.
+    """
+    pass
+
+
+def _contains(value, scope):
+    return scope in value
+
+
+def _icontains(value, scope):
+    return scope.lower() in value.lower()
+
+
+# Lookups which can be evaluated over already loaded values. Functions receive the value in the object and the value in
+# the scope, in that order. Semantics are the ones documented by Django (i.e. string comparisons are case-sensitive
+# unless the lookup name starts with "i").
+PYTHON_LOOKUPS = {
+    "exact": operator.eq,
+    "iexact": lambda value, scope: value.lower() == scope.lower(),
+    "fbne": operator.ne,
+    "in": lambda value, scope: value in scope,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+    "range": lambda value, scope: scope[0] <= value <= scope[1],
+    "contains": _contains,
+    "icontains": _icontains,
+    "startswith": lambda value, scope: value.startswith(scope),
+    "istartswith": lambda value, scope: value.lower().startswith(scope.lower()),
+    "endswith": lambda value, scope: value.endswith(scope),
+    "iendswith": lambda value, scope: value.lower().endswith(scope.lower()),
+    "isnull": lambda value, scope: (value is None) == bool(scope),
+}
+
+# Lookups over text, only evaluated if both the value and the scope are strings
+TEXT_LOOKUPS = {"iexact", "contains", "icontains", "startswith", "istartswith", "endswith", "iendswith"}
+
+# Lookups whose scope is a collection of values of the field type
+MULTIPLE_VALUES_LOOKUPS = {"in", "range"}
+
+# Kinds of steps when following a lookup path
+ATTRIBUTE, RELATED_ONE, RELATED_MANY = "attribute", "related_one", "related_many"
+
+
+class LookupPath:
+    """
+    A lookup string (e.g. ``brand__name__in``) resolved against a model: the steps to follow from an instance to reach
+    the values to compare, the model field holding these values, and the lookup to apply.
+    """
+
+    __slots__ = ("steps", "field", "lookup_name")
+
+    def __init__(self, steps, field, lookup_name):
+        self.steps = tuple(steps)
+        self.field = field
+        self.lookup_name = lookup_name
+
+    def get_values(self, obj):
+        """
+        Returns the values of the object for the field at the end of the path. Several values can be returned when
+        following multi-valued relations, and ``None`` is returned for missing relations.
+        """
+        instances = [obj]
+        for kind, name in self.steps:
+            next_instances = []
+            for instance in instances:
+                if instance is None:
+                    next_instances.append(None)
+                elif kind == RELATED_MANY:
+                    # Uses the prefetched objects, if any. As in a SQL join, no related objects behaves as a null value
+                    next_instances.extend(list(getattr(instance, name).all()) or [None])
+                else:
+                    try:
+                        next_instances.append(getattr(instance, name))
+                    except ObjectDoesNotExist:
+                        next_instances.append(None)
+            instances = next_instances
+
+        return instances
+
+    def prepare_scope(self, scope):
+        if self.lookup_name == "isnull":
+            return scope
+        if self.lookup_name in TEXT_LOOKUPS:
+            if not isinstance(scope, str):
+                raise UnsupportedLookup(f"Non-text scope value for {self.lookup_name}: {scope!r}")
+            return scope
+
+        try:
+            if self.lookup_name in MULTIPLE_VALUES_LOOKUPS:
+                return [self.field.to_python(item) for item in scope]
+            return self.field.to_python(scope)
+        except (ValidationError, TypeError) as e:
+            raise UnsupportedLookup(repr(e))
+
+    def matches(self, obj, scope_values):
+        """
+        Checks whether the object matches any of the scope values, as it would be done by filtering with
+        ``Q(**{lookup: scope_value_1}) | Q(**{lookup: scope_value_2}) | ...``.
+
+        :raises UnsupportedLookup: If some of the values cannot be compared in Python.
+        """
+        values = self.get_values(obj)
+        lookup_name = self.lookup_name
+        lookup_function = PYTHON_LOOKUPS[lookup_name]
+
+        for scope in scope_values:
+            if lookup_name == "exact" and scope is None:
+                # Django translates this into an isnull lookup
+                current_lookup_name, current_lookup_function, scope = "isnull", PYTHON_LOOKUPS["isnull"], True
+            else:
+                current_lookup_name, current_lookup_function = lookup_name, lookup_function
+                scope = self.prepare_scope(scope)
+
+            for value in values:
+                if value is None and current_lookup_name != "isnull":
+                    # NULL never matches a comparison in SQL
+                    continue
+                if current_lookup_name in TEXT_LOOKUPS and not isinstance(value, str):
+                    raise UnsupportedLookup(f"Non-text value for {current_lookup_name}: {value!r}")
+                try:
+                    if current_lookup_function(value, scope):
+                        return True
+                except TypeError as e:
+                    # e.g. comparing naive and aware datetimes, which the database might handle
+                    raise UnsupportedLookup(repr(e))
+
+        return False
+
+
+@functools.lru_cache(maxsize=getattr(settings, "FLEX_ABAC_LOOKUP_PATH_CACHE_SIZE", 1000))
+def resolve_lookup_path(model, lookup_string):
+    """
+    Resolves a lookup string against a model, so it can be evaluated over instances of that model. Resolved paths are
+    cached in a bounded LRU cache (``FLEX_ABAC_LOOKUP_PATH_CACHE_SIZE`` items, 1000 by default).
+
+    :param model: The model from which the lookup starts.
+    :type model: django.Model
+
+    :param lookup_string: The lookup (e.g. ``desk``, ``brand__name``, ``document_datetime__range``).
+    :type lookup_string: str
+
+    :returns: flex_abac.utils.evaluators.LookupPath -- The resolved path.
+
+    :raises UnsupportedLookup: If the lookup uses transforms or lookups which cannot be evaluated in Python.
+    """
+    parts = lookup_string.split("__")
+    steps = []
+    field = None
+
+    while parts:
+        try:
+            field = model._meta.pk if parts[0] == "pk" else model._meta.get_field(parts[0])
+        except FieldDoesNotExist:
+            # Not a field, so it is a lookup or a transform
+            break
+        parts.pop(0)
+
+        if not field.is_relation:
+            steps.append((ATTRIBUTE, field.attname))
+            break
+
+        related_model = field.related_model
+        if related_model is None:
+            raise UnsupportedLookup(f"Cannot follow generic relation {field.name} in {lookup_string}")
+
+        # Reverse relations are accessed through their accessor name
+        accessor_name = field.get_accessor_name() if field.auto_created and not field.concrete else field.name
+        if field.many_to_many or field.one_to_many:
+            steps.append((RELATED_MANY, accessor_name))
+        elif field.concrete:
+            next_part = parts[0] if parts else None
+            if next_part is None or next_part in ("pk", field.target_field.name) or \
+                    not _is_field(related_model, next_part):
+                # The foreign key column already holds the value, no need to fetch the related object
+                steps.append((ATTRIBUTE, field.attname))
+                if next_part in ("pk", field.target_field.name):
+                    parts.pop(0)
+                field = field.target_field
+                break
+            steps.append((RELATED_ONE, field.name))
+        else:
+            steps.append((RELATED_ONE, accessor_name))
+
+        model = related_model
+        if not parts:
+            # The lookup ends in a relation, so it is compared against the primary key of the related objects
+            field = model._meta.pk
+            steps.append((ATTRIBUTE, field.attname))
+
+    if len(parts) > 1 or (parts and parts[0] not in PYTHON_LOOKUPS):
+        raise UnsupportedLookup(f"Cannot evaluate {lookup_string} in Python")
+
+    return LookupPath(steps, field, parts[0] if parts else "exact")
+
+
+def _is_field(model, name):
+    try:
+        model._meta.get_field(name)
+        return True
+    except FieldDoesNotExist:
+        return name == "pk"
+
+
+def does_object_match(obj, lookup_string, scope_values):
+    """
+    Checks, without querying the database when possible, whether an object matches any of the provided scope values
+    for a lookup.
+
+    :param obj: The model object to check.
+    :type obj: django.Model
+
+    :param lookup_string: The lookup to evaluate (e.g. ``brand__name``).
+    :type lookup_string: str
+
+    :param scope_values: The values to compare with.
+    :type scope_values: list
+
+    :returns: bool -- True if the object matches any of the scope values. False, otherwise.
+
+    :raises UnsupportedLookup: If the lookup should be evaluated by the database.
+    """
+    if not getattr(settings, "FLEX_ABAC_EVALUATE_LOOKUPS_IN_MEMORY", True):
+        raise UnsupportedLookup("In-memory evaluation of lookups is disabled")
+
+    return resolve_lookup_path(type(obj), lookup_string).matches(obj, scope_values)
@@ -3,49 +3,136 @@ import functools
 
 from django.db import connection
 
-from django.core.exceptions import ValidationError, SuspiciousOperation
+from django.core.exceptions import ValidationError, SuspiciousOperation, ObjectDoesNotExist
 
 from flex_abac.models import BaseAttribute
 from flex_abac.utils.helpers import get_model_and_field_from_lookup_string
 from flex_abac.utils.action_names import get_action_name
 from flex_abac.checkers import get_filter_for_valid_objects
+from flex_abac.utils.cache import LRUCache, get_generation_data
 
 class AttributeMappingGenerator(object):
     @classmethod
     def get_attribute_mapping(cls, view):
         raise NotImplementedError
 
+class MappingPlanItem:
+    """
+    An attribute type which can be filtered through a query parameter, as resolved when building a mapping plan.
+    """
+
+    __slots__ = ("attribute_type_id", "obj_type", "field_name", "query_name", "values_type")
+
+    def __init__(self, attribute_type_id, obj_type, field_name, query_name, values_type):
+        self.attribute_type_id = attribute_type_id
+        self.obj_type = obj_type
+        self.field_name = field_name
+        self.query_name = query_name
+        self.values_type = values_type
+
+    def get_mapping_item(self):
+        return MappingItem(obj_type=self.obj_type, field_name=self.field_name,
+                           values_type=self.values_type,
+                           function_value=functools.partial(
+                               lambda view, field_name: view.request.GET.getlist(field_name),
+                               field_name=self.query_name))
+
+
+class MappingPlan:
+    """
+    The attribute types which can be filtered through query parameters, indexed by the name of the query parameter.
+    """
+
+    def __init__(self, generation, items):
+        self.generation = generation
+        self.items_per_query_name = {}
+        for position, item in enumerate(items):
+            self.items_per_query_name.setdefault(item.query_name, []).append((position, item))
+
+    @classmethod
+    def build(cls, aliases, generation=None):
+        """
+        Loads the plan from the database.
+
+        :param aliases: The names of the query parameters for the field names which do not use their own name.
+        :type aliases: dict
+
+        :param generation: The permissions generation at the moment of loading the data.
+        :type generation: int
+
+        :returns: flex_abac.utils.mappings.MappingPlan -- The plan.
+        """
+        items = []
+        for attribute_type in BaseAttribute.objects.order_by("pk"):
+            try:
+                base_model_name = attribute_type.get_model()
+            except ObjectDoesNotExist:
+                # Not registered for any model
+                continue
+
+            model_name, field_name = get_model_and_field_from_lookup_string(base_model_name, attribute_type.field_name)
+            cast_function = model_name._meta.get_field(field_name).to_python
+
+            items.append(MappingPlanItem(attribute_type_id=attribute_type.pk, obj_type=base_model_name,
+                                         field_name=attribute_type.field_name,
+                                         query_name=aliases.get(attribute_type.field_name, attribute_type.field_name),
+                                         values_type=cast_function))
+
+        return cls(generation, items)
+
+    def get_items(self, query_params):
+        """
+        Returns the items of the plan whose query parameters have values.
+
+        :param query_params: The query parameters of the request.
+        :type query_params: django.http.QueryDict
+
+        :returns: list<flex_abac.utils.mappings.MappingPlanItem> -- The items, in the same order as in the plan.
+        """
+        items = []
+        for query_name in query_params.keys():
+            if query_name in self.items_per_query_name and query_params.getlist(query_name):
+                items += self.items_per_query_name[query_name]
+
+        return [item for _, item in sorted(items, key=lambda position_item: position_item[0])]
+
+
+_mapping_plans = LRUCache(maxsize=100)
+
+
 class DefaultAttributeMappingGenerator(AttributeMappingGenerator):
 
     aliases = {}
 
+    @classmethod
+    def get_mapping_plan(cls):
+        """
+        Returns the mapping plan for the aliases of this class. It is cached in-process and rebuilt when the permission
+        graph changes (including the attribute types, see :meth:`flex_abac.utils.cache.get_permissions_generation`).
+
+        :returns: flex_abac.utils.mappings.MappingPlan -- The plan.
+        """
+        return get_generation_data(_mapping_plans, (cls, tuple(cls.aliases.items())),
+                                   lambda generation: MappingPlan.build(cls.aliases, generation))
+
     @classmethod
     def get_attribute_mapping(cls, view):
+        plan_items = cls.get_mapping_plan().get_items(view.request.GET)
+        if not plan_items:
+            return []
 
+        # Only the attribute types in the scope of the user can be mapped
         action_name = get_action_name(view)
         valid_objects_filter = get_filter_for_valid_objects(view.request.user, BaseAttribute,
                                                             action_name=action_name)
-        attribute_types = BaseAttribute.objects.filter(valid_objects_filter)
-
-        mappings = []
-        for attribute_type in attribute_types:
-            base_model_name = attribute_type.get_model()
-            model_name, field_name = get_model_and_field_from_lookup_string(base_model_name, attribute_type.field_name)
-
-            cast_function = model_name._meta.get_field(field_name).to_python
-
-            current_field_name = attribute_type.field_name
-            if current_field_name in cls.aliases.keys():
-                current_field_name = cls.aliases[current_field_name]
-
-            if view.request.GET.getlist(current_field_name):
-                mappings.append(MappingItem(obj_type=base_model_name, field_name=attribute_type.field_name,
-                                            values_type=cast_function,
-                                            function_value=functools.partial(
-                                                    lambda view, field_name: view.request.GET.getlist(field_name),
-                                                field_name=current_field_name)))
-
-        return mappings
+        if valid_objects_filter:
+            valid_attribute_type_ids = set(BaseAttribute.objects.filter(
+                valid_objects_filter, pk__in=[plan_item.attribute_type_id for plan_item in plan_items]
+            ).values_list("pk", flat=True))
+            plan_items = [plan_item for plan_item in plan_items
+                          if plan_item.attribute_type_id in valid_attribute_type_ids]
+
+        return [plan_item.get_mapping_item() for plan_item in plan_items]
 
 class MappingItem:
     def __init__(self, obj_type, field_name, values_type, function_value):
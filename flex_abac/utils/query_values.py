@@ -0,0 +1,26 @@
+class QueryAttributeValue:
+    """
+    A value of an attribute type used in a query (e.g. a REST API list filter), with the ``path`` of the value for
+    attribute types checked by position in a tree.
+    """
+
+    __slots__ = ("attribute_type", "value", "path")
+
+    def __init__(self, attribute_type, value, path=None):
+        self.attribute_type = attribute_type
+        self.value = value
+        self.path = path
+
+    def to_filter(self):
+        """
+        Builds the equivalent (unsaved) filter instance (see ``get_attribute_value`` in the attribute types).
+
+        :returns: flex_abac.models.BaseFilter -- The filter.
+        """
+        return self.attribute_type.get_attribute_value(self.value)
+
+    def is_in_policy_scope(self, policy):
+        return self.to_filter().is_in_policy_scope(policy)
+
+    def __repr__(self):
+        return '<QueryAttributeValue:{} ({})>'.format(self.value, self.attribute_type)
@@ -0,0 +1,309 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Exists, OuterRef, Subquery
+from django.db.models.query import Q
+
+from flex_abac.registry import get_attribute_types_for_model
+from flex_abac.utils.evaluators import UnsupportedLookup, resolve_lookup_path
+
+
+# Ways of applying the filter for the valid objects to a queryset (see compile_valid_objects_condition)
+FILTER_STRATEGY_IN = "in"
+FILTER_STRATEGY_EXISTS = "exists"
+FILTER_STRATEGY_PK_SUBQUERY = "pk_subquery"
+FILTER_STRATEGIES = (FILTER_STRATEGY_IN, FILTER_STRATEGY_EXISTS, FILTER_STRATEGY_PK_SUBQUERY)
+
+
+class AttributeFilter:
+    """
+    The conditions of several policies over the same attribute type, which are combined as an ``OR``. If any of the
+    policies does not restrict the attribute type (i.e. it allows all its values), the attribute type is unrestricted.
+    """
+
+    __slots__ = ("unrestricted", "conditions")
+
+    def __init__(self):
+        self.unrestricted = False
+        self.conditions = []
+
+    def add(self, condition, unrestricted=False):
+        if unrestricted:
+            # Other conditions are subsumed by this one
+            self.unrestricted = True
+            self.conditions = []
+        elif not self.unrestricted:
+            self.conditions.append(condition)
+
+
+class ScopeFilter:
+    """
+    Combines the filters of a set of policies over a model into a single, simplified filter (see :meth:`to_q`).
+
+    Example:
+
+    .. code-block:: python
+
+        scope_filter = ScopeFilter(Document)
+        for policy in policies:
+            scope_filter.add_policy(policy)
+
+        Document.objects.filter(scope_filter.to_q())
+    """
+
+    def __init__(self, model, attribute_types=None):
+        """
+        :param model: The model to be filtered.
+        :type model: django.Model
+
+        :param attribute_types: Optional. The attribute types to check. By default, the ones registered for the model.
+        :type attribute_types: list<flex_abac.models.BaseAttribute>
+        """
+        if attribute_types is None:
+            attribute_types = get_attribute_types_for_model(model)
+
+        self.model = model
+        self.attribute_types = list(attribute_types)
+        self.attribute_filters = {}
+
+    def add(self, attribute_type, condition, unrestricted=False):
+        """
+        Adds a condition over an attribute type, as an alternative to the ones already added for it.
+
+        :param attribute_type: The attribute type.
+        :type attribute_type: flex_abac.models.BaseAttribute
+
+        :param condition: The condition.
+        :type condition: django.db.models.Q
+
+        :param unrestricted: Whether all the values of the attribute type are allowed.
+        :type unrestricted: bool
+        """
+        key = (type(attribute_type), attribute_type.pk)
+        self.attribute_filters.setdefault(key, AttributeFilter()).add(condition, unrestricted)
+
+    def add_policy(self, policy):
+        """
+        Adds the conditions of a policy over all the attribute types.
+
+        :param policy: The policy.
+        :type policy: flex_abac.models.Policy, flex_abac.snapshot.CompiledPolicy
+        """
+        for attribute_type in self.attribute_types:
+            if attribute_type.is_unrestricted(policy):
+                self.add(attribute_type, None, unrestricted=True)
+                continue
+            condition, _ = attribute_type.get_filter(policy)
+            self.add(attribute_type, condition)
+
+    def to_q(self, base_lookup_name=None):
+        """
+        Builds the simplified filter.
+
+        :param base_lookup_name: Optional. Name of the foreign-key field which will be checked on an outer model to
+                                 reach the filtered model.
+        :type base_lookup_name: str
+
+        :returns: django.db.models.Q -- The filter.
+        """
+        and_filter = Q()
+        for attribute_filter in self.attribute_filters.values():
+            if attribute_filter.unrestricted:
+                continue
+
+            or_filter = Q()
+            for condition in simplify_conditions(self.model, attribute_filter.conditions):
+                or_filter |= add_lookup_prefix(condition, base_lookup_name)
+
+            and_filter &= or_filter
+
+        return and_filter
+
+
+def _flatten_alternatives(condition):
+    """
+    Yields the alternatives of a condition, i.e. the children of (nested) ``OR`` nodes.
+    """
+    if not isinstance(condition, Q):
+        yield condition
+    elif condition.negated or (condition.connector != Q.OR and len(condition.children) > 1):
+        yield condition
+    else:
+        for child in condition.children:
+            yield from _flatten_alternatives(child)
+
+
+def _get_equality_field(model, lookup, value):
+    """
+    Returns the lookup without the (explicit or implicit) ``exact`` or ``in`` lookup name, and the list of values it
+    is compared with, or ``(None, None)`` if the condition is not an equality (or inclusion) one.
+    """
+    if hasattr(value, "resolve_expression"):
+        # Expressions and querysets
+        return None, None
+
+    if lookup.endswith("__in"):
+        if not isinstance(value, (list, tuple, set, frozenset)):
+            return None, None
+        field_lookup, values = lookup[:-len("__in")], list(value)
+    else:
+        if value is None:
+            # Translated into an isnull lookup
+            return None, None
+        field_lookup, values = lookup, [value]
+        if field_lookup.endswith("__exact"):
+            field_lookup = field_lookup[:-len("__exact")]
+
+    try:
+        if resolve_lookup_path(model, field_lookup).lookup_name != "exact":
+            return None, None
+        hash(tuple(values))
+    except (UnsupportedLookup, TypeError):
+        return None, None
+
+    return field_lookup, values
+
+
+def simplify_conditions(model, conditions):
+    """
+    Simplifies a set of alternative conditions (i.e. to be combined as an ``OR``), merging the equality conditions over
+    the same field into a single ``__in`` condition and removing repeated conditions.
+
+    :param model: The model to be filtered.
+    :type model: django.Model
+
+    :param conditions: The conditions.
+    :type conditions: list<django.db.models.Q>
+
+    :returns: list<django.db.models.Q> -- The simplified conditions.
+    """
+    # Both keep the order in which conditions are found, so the filters are stable
+    values_per_field = {}
+    other_conditions = []
+
+    for condition in conditions:
+        for alternative in _flatten_alternatives(condition):
+            if isinstance(alternative, tuple):
+                field_lookup, values = _get_equality_field(model, *alternative)
+                if field_lookup is not None:
+                    # Keyed by type too, since equal values of different types (e.g. 1 and True) can match different
+                    # rows once converted by the database
+                    field_values = values_per_field.setdefault(field_lookup, {})
+                    field_values.update(((type(value), value), value) for value in values)
+                    continue
+                alternative = Q(alternative)
+
+            if alternative not in other_conditions:
+                other_conditions.append(alternative)
+
+    simplified_conditions = []
+    for field_lookup, values in values_per_field.items():
+        if len(values) == 1:
+            simplified_conditions.append(Q(**{field_lookup: next(iter(values.values()))}))
+        else:
+            simplified_conditions.append(Q(**{f"{field_lookup}__in": list(values.values())}))
+
+    return simplified_conditions + other_conditions
+
+
+def add_lookup_prefix(condition, prefix):
+    """
+    Prefixes all the lookups of a condition with the provided field name, so it can be applied from an outer model.
+
+    :param condition: The condition.
+    :type condition: django.db.models.Q
+
+    :param prefix: The name of the field. If not provided, the condition is returned as is.
+    :type prefix: str
+
+    :returns: django.db.models.Q -- The prefixed condition.
+    """
+    if not prefix:
+        return condition
+
+    prefixed_condition = Q()
+    prefixed_condition.connector = condition.connector
+    prefixed_condition.negated = condition.negated
+    prefixed_condition.children = [
+        add_lookup_prefix(child, prefix) if isinstance(child, Q) else (f"{prefix}__{child[0]}", child[1])
+        for child in condition.children
+    ]
+
+    return prefixed_condition
+
+
+def get_filter_strategy(strategy=None):
+    """
+    Returns the strategy to apply the filters for the valid objects: the provided one or, by default, the one set in
+    the ``FLEX_ABAC_FILTER_STRATEGY`` setting (``in`` by default).
+
+    :param strategy: Optional. The strategy, one of ``in``, ``exists`` or ``pk_subquery``.
+    :type strategy: str
+
+    :returns: str -- The strategy.
+
+    :raises ImproperlyConfigured: If the strategy is unknown.
+    """
+    strategy = strategy or getattr(settings, "FLEX_ABAC_FILTER_STRATEGY", FILTER_STRATEGY_IN)
+    if strategy not in FILTER_STRATEGIES:
+        raise ImproperlyConfigured(f"Unknown filter strategy: {strategy}. Use one of {', '.join(FILTER_STRATEGIES)}")
+
+    return strategy
+
+
+def compile_valid_objects_condition(get_filter, base_model, base_lookup_name=None, strategy=None):
+    """
+    Builds the condition selecting the valid objects of a queryset, following a strategy (``in``, ``exists`` or
+    ``pk_subquery``).
+
+    :param get_filter: Returns the filter for the valid objects of the base model, given the base lookup name (see
+                       :meth:`flex_abac.checkers.get_filter_for_valid_objects`).
+    :type get_filter: callable
+
+    :param base_model: The model whose objects are checked.
+    :type base_model: django.Model
+
+    :param base_lookup_name: Optional. Name of the foreign-key field which reaches the base model from the model of
+                             the queryset.
+    :type base_lookup_name: str
+
+    :param strategy: Optional. The strategy (see :meth:`get_filter_strategy`).
+    :type strategy: str
+
+    :returns: django.db.models.Q, django.db.models.Exists -- The condition, to be applied with
+              :meth:`filter_valid_objects`.
+    """
+    strategy = get_filter_strategy(strategy)
+
+    if strategy == FILTER_STRATEGY_IN:
+        return get_filter(base_lookup_name=base_lookup_name)
+
+    valid_filter = get_filter(base_lookup_name=None)
+    if not valid_filter:
+        # Every object is valid, nothing to join with
+        return valid_filter
+
+    outer_lookup_name = base_lookup_name or "pk"
+    valid_objects = base_model._default_manager.filter(valid_filter)
+
+    if strategy == FILTER_STRATEGY_EXISTS:
+        return Exists(valid_objects.filter(pk=OuterRef(outer_lookup_name)))
+
+    return Q(**{f"{outer_lookup_name}__in": Subquery(valid_objects.values("pk"))})
+
+
+def filter_valid_objects(queryset, condition):
+    """
+    Filters a queryset with a condition built by :meth:`compile_valid_objects_condition`.
+
+    :param queryset: The queryset to be filtered.
+    :type queryset: django.db.models.QuerySet
+
+    :param condition: The condition selecting the valid objects.
+    :type condition: django.db.models.Q, django.db.models.Exists
+
+    :returns: django.db.models.QuerySet -- The filtered queryset.
+    """
+    if isinstance(condition, Exists):
+        return queryset.annotate(flex_abac_is_valid=condition).filter(flex_abac_is_valid=True)
+
+    return queryset.filter(condition)
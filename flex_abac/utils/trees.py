@@ -0,0 +1,168 @@
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections, router
+from django.db.models import OuterRef, Subquery
+from django.db.models.expressions import RawSQL
+
+
+# Database vendors supporting recursive common table expressions inside subqueries
+RECURSIVE_QUERIES_VENDORS = {"sqlite", "postgresql"}
+
+
+def supports_recursive_queries(model, parent_field_name, nested_field_name):
+    """
+    Checks whether the descendants of the nodes of an adjacency list tree can be selected through a recursive query
+    (see :meth:`get_descendants_subquery`), given the settings, the database backend and the fields of the model.
+
+    :param model: The model representing the tree.
+    :type model: django.Model
+
+    :param parent_field_name: The name of the foreign key to the parent node.
+    :type parent_field_name: str
+
+    :param nested_field_name: The name of the field identifying the nodes (e.g. ``name``).
+    :type nested_field_name: str
+
+    :returns: bool -- True, if recursive queries can be used. False, otherwise.
+    """
+    if not getattr(settings, "FLEX_ABAC_USE_RECURSIVE_QUERIES", True):
+        return False
+
+    connection = connections[router.db_for_read(model)]
+    if connection.vendor not in RECURSIVE_QUERIES_VENDORS:
+        return False
+
+    try:
+        parent_field = model._meta.get_field(parent_field_name)
+        nested_field = model._meta.get_field(nested_field_name)
+    except FieldDoesNotExist:
+        # e.g. lookups spanning relations
+        return False
+
+    return parent_field.many_to_one and parent_field.related_model is model and \
+        parent_field.target_field == model._meta.pk and nested_field.concrete and not nested_field.is_relation
+
+
+def get_descendants_subquery(model, parent_field_name, nested_field_name, values):
+    """
+    Builds a recursive subquery selecting the primary keys of the nodes whose ``nested_field_name`` is in ``values``,
+    plus all their descendants.
+
+    :param model: The model representing the tree.
+    :type model: django.Model
+
+    :param parent_field_name: The name of the foreign key to the parent node.
+    :type parent_field_name: str
+
+    :param nested_field_name: The name of the field identifying the nodes (e.g. ``name``).
+    :type nested_field_name: str
+
+    :param values: The values of ``nested_field_name`` for the root nodes.
+    :type values: list
+
+    :returns: django.db.models.expressions.RawSQL -- The subquery, or ``None`` if it is not supported for this model
+              or database backend.
+    """
+    if not supports_recursive_queries(model, parent_field_name, nested_field_name):
+        return None
+
+    connection = connections[router.db_for_read(model)]
+    parent_field = model._meta.get_field(parent_field_name)
+    nested_field = model._meta.get_field(nested_field_name)
+
+    quote_name = connection.ops.quote_name
+    table = quote_name(model._meta.db_table)
+    pk_column = quote_name(model._meta.pk.column)
+    parent_column = quote_name(parent_field.column)
+    nested_column = quote_name(nested_field.column)
+    values = [nested_field.get_prep_value(value) for value in values]
+
+    if not values:
+        # Nothing matches an empty IN clause
+        return RawSQL(f"SELECT {pk_column} FROM {table} WHERE 1 = 0", [])
+
+    # UNION (instead of UNION ALL) discards repeated nodes, so the recursion ends even if the tree has cycles
+    sql = (
+        f"WITH RECURSIVE flex_abac_descendants(node_id) AS ("
+        f"SELECT {pk_column} FROM {table} WHERE {nested_column} IN ({', '.join(['%s'] * len(values))}) "
+        f"UNION "
+        f"SELECT child.{pk_column} FROM {table} child "
+        f"INNER JOIN flex_abac_descendants ON child.{parent_column} = flex_abac_descendants.node_id"
+        f") SELECT node_id FROM flex_abac_descendants"
+    )
+
+    return RawSQL(sql, values)
+
+
+def get_closure_tables():
+    """
+    Returns the nested models for which a closure table is maintained, as configured in the
+    ``FLEX_ABAC_CLOSURE_TABLES`` setting (e.g. ``{"exampleapp.Topic": "parent"}``).
+
+    :returns: dict -- ``{model: parent_field_name}``.
+    """
+    return {
+        apps.get_model(model_label): parent_field_name
+        for model_label, parent_field_name in getattr(settings, "FLEX_ABAC_CLOSURE_TABLES", {}).items()
+    }
+
+
+def has_closure_table(model, parent_field_name):
+    """
+    Checks whether a closure table is maintained for a nested model and parent field.
+    """
+    return get_closure_tables().get(model) == parent_field_name
+
+
+def get_closure_descendants_subquery(model, nested_field_name, values):
+    """
+    Builds a subquery selecting, from the closure table of a nested model, the primary keys of the nodes whose
+    ``nested_field_name`` is in ``values`` plus all their descendants. It can be used as the right-hand side of an
+    ``__in`` lookup.
+
+    :param model: The nested model, which should have a closure table (see :meth:`get_closure_tables`).
+    :type model: django.Model
+
+    :param nested_field_name: The name of the field identifying the nodes (e.g. ``name``).
+    :type nested_field_name: str
+
+    :param values: The values of ``nested_field_name`` for the root nodes.
+    :type values: list
+
+    :returns: django.db.models.QuerySet -- The subquery.
+    """
+    from flex_abac.models import NestedCategoricalClosure
+
+    return NestedCategoricalClosure.objects.filter(
+        content_type=ContentType.objects.get_for_model(model),
+        ancestor_id__in=model.objects.filter(**{f"{nested_field_name}__in": values}).values("pk"),
+    ).values("descendant_id")
+
+
+def get_closure_ancestors(model, nested_field_name, value):
+    """
+    Returns, in a single query, the ``nested_field_name`` of a node of a nested model and all its ancestors, from the
+    node itself up to the root.
+
+    :param model: The nested model, which should have a closure table (see :meth:`get_closure_tables`).
+    :type model: django.Model
+
+    :param nested_field_name: The name of the field identifying the nodes (e.g. ``name``).
+    :type nested_field_name: str
+
+    :param value: The value of ``nested_field_name`` for the node.
+
+    :returns: list -- The values of ``nested_field_name`` for the node and its ancestors.
+    """
+    from flex_abac.models import NestedCategoricalClosure
+
+    return list(
+        NestedCategoricalClosure.objects.filter(
+            content_type=ContentType.objects.get_for_model(model),
+            descendant_id__in=model.objects.filter(**{nested_field_name: value}).values("pk"),
+        ).order_by("depth").annotate(
+            ancestor_value=Subquery(model.objects.filter(pk=OuterRef("ancestor_id")).values(nested_field_name)[:1])
+        ).values_list("ancestor_value", flat=True)
+    )
@@ -14,7 +14,7 @@ from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 
 from flex_abac.models import BaseAttribute, ActionModel
-from flex_abac.utils.helpers import get_subclasses
+from flex_abac.utils.allowed_values import get_all_allowed_values_for_user
 from django.contrib.contenttypes.models import ContentType
 from flex_abac.serializers import PolymorphicFilterSerializer, PolymorphicPossibleValuesSerializer
 
@@ -91,18 +91,7 @@ class UserViewSet(viewsets.ModelViewSet):
                                 status=status.HTTP_400_BAD_REQUEST)
             content_types.append(content_type[0].id)
 
-        allowed_values = []
-        possible_values = []
-        for attribute_type_model in get_subclasses(BaseAttribute):
-            for attribute_type in attribute_type_model.get_all_attributes_from_content_types(content_types).all():
-                allowed_values_for_attribute = attribute_type.get_all_values_for_user(request.user)
-                if allowed_values_for_attribute.exists():
-                    allowed_values += allowed_values_for_attribute
-                else:
-                    possible_values += [attribute_type]
-
-        allowed_values = list(set(allowed_values))
-
+        allowed_values, possible_values = get_all_allowed_values_for_user(request.user, content_types)
 
         final_possible_values = []
         for item in PolymorphicPossibleValuesSerializer(possible_values, many=True).data: